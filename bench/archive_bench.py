@@ -0,0 +1,70 @@
+
+"""
+Archival – hot-query latency before/after archiving, and booking latency while the job runs
+
+    HMS_DB_PASSWORD=... python -m bench.archive_bench [scale]
+
+Archives the scratch database's old appointments for real; `bench.datagen`
+tops the hot table up again on the next run.
+"""
+import random
+import sys
+import threading
+import time
+from datetime import date
+from models import appointment as app, archive
+from . import datagen
+from .common import connect, timer
+
+CALLS = 2000
+
+def _hot_queries(db, doctor_ids):
+    rnd = random.Random(7)
+    picks = [rnd.choice(doctor_ids) for _ in range(CALLS)]
+    with timer("search_by_doctor (first page)", CALLS):
+        for did in picks:
+            app.search_by_doctor(db, did, limit=21)
+    with timer("search_by_doctor + history", CALLS):
+        for did in picks:
+            app.search_by_doctor(db, did, limit=21, include_history=True)
+    with timer("list_today (first page)", CALLS):
+        for _ in range(CALLS):
+            app.list_today(db, limit=21)
+
+def _book(db, patient_ids, doctor_ids, stop: threading.Event, latencies: list):
+    """Untimed bookings for today, as the front desk would make them during the job."""
+    rnd = random.Random(11)
+    while not stop.is_set():
+        row = {"patient_id": rnd.choice(patient_ids), "doctor_id": rnd.choice(doctor_ids),
+               "appointment_date": date.today(), "reason": "Walk-in", "status": "Pending"}
+        start = time.perf_counter()
+        app.add_appointment(db, row)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+def main():
+    scale = sys.argv[1] if len(sys.argv) > 1 else "100k"
+    db = connect(cache_size=0, pool_size=4)
+    datagen.load(db, scale)
+    patient_ids = list(datagen._ids(db, app.PATIENT_TABLE, "patient_id"))
+    doctor_ids = list(datagen._ids(db, app.DOCTOR_TABLE, "doctor_id"))
+    print("before:", archive.counts(db))
+    _hot_queries(db, doctor_ids)
+
+    stop, latencies = threading.Event(), []
+    booker = threading.Thread(target=_book, args=(db, patient_ids, doctor_ids, stop, latencies))
+    booker.start()
+    stats = archive.archive(db, older_than_days=180)
+    stop.set()
+    booker.join()
+    latencies.sort()
+    print(f"archived {stats['moved']:,} rows in {stats['batches']:,} batches, {stats['seconds']:.1f}s")
+    if latencies:
+        print(f"concurrent bookings: {len(latencies):,}, p50 {latencies[len(latencies) // 2]:.1f} ms, "
+              f"p99 {latencies[int(len(latencies) * 0.99)]:.1f} ms, max {latencies[-1]:.1f} ms")
+
+    print("after:", archive.counts(db))
+    _hot_queries(db, doctor_ids)
+    db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+
+"""
+Availability engine under concurrent booking load
+
+    HMS_DB_PASSWORD=... python -m bench.booking_bench [doctors] [threads]
+
+Seeds `doctors` cardiologists, then `threads` workers race to book random
+slots; afterwards no two live bookings of a doctor may overlap.
+"""
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from models import patient as pat, doctor as doc, appointment as app, availability, migrations
+from .common import connect, timer
+
+SPEC = "Cardiology-bench"
+ATTEMPTS = 4000
+
+def _seed(db, n: int) -> int:
+    have = db.execute(f"SELECT doctor_id FROM {doc.TABLE} WHERE specialization=%s", (SPEC,), fetch=True)
+    if len(have) < n:
+        doc.add_doctors(db, [{"full_name": f"Dr Bench {i}", "specialization": SPEC, "phone_number": "",
+                              "email": "", "year_of_experience": i % 30} for i in range(len(have), n)])
+    rows = db.execute(f"SELECT patient_id FROM {pat.TABLE} LIMIT 1", fetch=True)
+    if rows:
+        return rows[0]['patient_id']
+    return pat.add_patient(db, {"full_name": "Bench Booker", "date_of_birth": "1970-01-01",
+                                "gender": "Other", "address": "", "phone_number": "", "email": ""})
+
+def main():
+    n_doctors = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+    db = connect(pool_size=threads)
+    migrations.ensure_schema(db)
+    patient_id = _seed(db, n_doctors)
+    ids = [r['doctor_id'] for r in db.execute(
+        f"SELECT doctor_id FROM {doc.TABLE} WHERE specialization=%s", (SPEC,), fetch=True)]
+    monday = date.today() + timedelta(days=7 - date.today().weekday())
+    rnd = random.Random(11)
+    requests = [(rnd.choice(ids[:20]), monday + timedelta(days=rnd.randint(0, 4)),
+                 8 * 60 + 15 * rnd.randint(0, 34)) for _ in range(ATTEMPTS)]
+    outcome = {"booked": 0, "conflict": 0}
+    lock = threading.Lock()
+
+    def book(req):
+        did, day, start = req
+        try:
+            app.add_appointment(db, {"patient_id": patient_id, "doctor_id": did, "appointment_date": day,
+                                     "start_time": availability.clock(start), "reason": "bench",
+                                     "status": "Pending"})
+            result = "booked"
+        except availability.BookingConflict:
+            result = "conflict"
+        with lock:
+            outcome[result] += 1
+
+    with ThreadPoolExecutor(threads) as ex:
+        with timer(f"{ATTEMPTS} bookings, {threads} threads", ATTEMPTS):
+            list(ex.map(book, requests))
+    print(f"booked {outcome['booked']}, rejected {outcome['conflict']}")
+
+    overlaps = db.execute(f"""SELECT COUNT(*) AS n FROM {app.TABLE} a JOIN {app.TABLE} b
+                            ON a.doctor_id=b.doctor_id AND a.appointment_date=b.appointment_date
+                           AND a.appointment_id<b.appointment_id AND a.start_time<b.end_time
+                           AND b.start_time<a.end_time
+                           WHERE a.status<>'Cancelled' AND b.status<>'Cancelled'""", fetch=True)[0]['n']
+    print(f"overlapping bookings: {overlaps}")
+
+    samples = []
+    for _ in range(50):
+        start = time.perf_counter()
+        availability.next_free_slot(db, SPEC, after=datetime.combine(monday, datetime.min.time()))
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    print(f"next_free_slot over {len(ids)} doctors: p50 {samples[25] * 1000:.1f} ms, "
+          f"max {samples[-1] * 1000:.1f} ms")
+    db.close()
+
+if __name__ == "__main__":
+    main()
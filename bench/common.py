@@ -0,0 +1,25 @@
+
+"""
+Shared helpers for the benchmark scripts
+"""
+import os
+import time
+from contextlib import contextmanager
+from models.database import Database
+
+def creds_from_env():
+    return (os.environ.get("HMS_DB_HOST", "localhost"),
+            os.environ.get("HMS_DB_USER", "root"),
+            os.environ.get("HMS_DB_PASSWORD", ""),
+            os.environ.get("HMS_BENCH_DB", "hospital_bench"))
+
+def connect(**kwargs) -> Database:
+    return Database(*creds_from_env(), **kwargs)
+
+@contextmanager
+def timer(label: str, ops: int = 0):
+    start = time.perf_counter()
+    yield
+    elapsed = time.perf_counter() - start
+    rate = f"  {ops / elapsed:,.0f} ops/s" if ops else ""
+    print(f"{label:<40} {elapsed:8.3f}s{rate}")
@@ -0,0 +1,149 @@
+
+"""
+Seeded synthetic patients, doctors and appointments
+
+    HMS_DB_PASSWORD=... python -m bench.datagen [scale] [seed]
+
+Row i of each kind depends only on (seed, kind, i), so a load is
+reproducible and can be topped up later. Every row passes the importer's
+validation, and rows clashing with the identity keys are dropped with
+the model's own conflict check, just like `main.py import`.
+"""
+import random
+import sys
+from array import array
+from datetime import date, timedelta
+from typing import Any, Dict, Sequence
+from models import patient as pat, doctor as doc, appointment as app, migrations
+from models.database import Database
+from utils.enums import Gender, Status
+from utils.text import fold
+from .common import connect, timer
+
+# scale -> (patients, doctors, appointments)
+SCALES = {
+    "10k": (2_000, 50, 10_000),
+    "100k": (20_000, 200, 100_000),
+    "1m": (200_000, 1_000, 1_000_000),
+    "10m": (2_000_000, 5_000, 10_000_000),
+}
+BATCH = 5000
+
+SURNAMES = ["Nguyễn", "Trần", "Lê", "Phạm", "Hoàng", "Huỳnh", "Phan", "Vũ", "Võ", "Đặng",
+            "Bùi", "Đỗ", "Hồ", "Ngô", "Dương", "Lý", "Đinh", "Trịnh", "Mai", "Tô",
+            "Smith", "Johnson", "García", "Müller", "Kim", "Park", "Tanaka", "Rossi", "Dubois", "Novak"]
+MIDDLE = ["Văn", "Thị", "Hữu", "Minh", "Ngọc", "Thanh", "Quang", "Đức", "Xuân", "Thu",
+          "Hoài", "Gia", "Bảo", "Kim", "Anh", "", "", "", "", ""]
+GIVEN = ["An", "Bình", "Châu", "Dũng", "Giang", "Hà", "Hải", "Hạnh", "Hùng", "Khánh",
+         "Lan", "Linh", "Long", "Mai", "Nam", "Nga", "Phúc", "Quân", "Sơn", "Thảo",
+         "Trang", "Tuấn", "Việt", "Xuân", "Yến", "Cường", "Đạt", "Hiếu", "Huy", "Khoa",
+         "Loan", "My", "Nhi", "Oanh", "Phương", "Quỳnh", "Tâm", "Thắng", "Uyên", "Vy",
+         "Emma", "Oliver", "Sofia", "Lucas", "Mia", "Noah", "Ava", "Leo", "Chloe", "Ethan"]
+CITIES = ["Hà Nội", "TP Hồ Chí Minh", "Đà Nẵng", "Hải Phòng", "Cần Thơ", "Huế", "Nha Trang"]
+STREETS = ["Lê Lợi", "Trần Hưng Đạo", "Nguyễn Huệ", "Hai Bà Trưng", "Lý Thường Kiệt", "Điện Biên Phủ"]
+SPECIALIZATIONS = ["Cardiology", "Dermatology", "Neurology", "Pediatrics", "Orthopedics",
+                   "Oncology", "Psychiatry", "Radiology", "General Practice", "Ophthalmology"]
+REASONS = ["Check-up", "Follow-up", "Chest pain", "Headache", "Fever", "Back pain",
+           "Vaccination", "Skin rash", "Blood test results", "Prescription renewal"]
+
+HISTORY_DAYS = 3 * 365   # appointments span this far back ...
+FUTURE_DAYS = 30         # ... and this far ahead of `today`
+
+class Generator:
+    """Deterministic row factory; the same (seed, i) always gives the same row."""
+    def __init__(self, seed: int = 42, today: date = None):
+        self.seed = seed
+        self.today = today or date.today()
+
+    def _rnd(self, kind: str, i: int) -> random.Random:
+        return random.Random(f"{self.seed}:{kind}:{i}")
+
+    @staticmethod
+    def _name(rnd: random.Random) -> str:
+        return " ".join(p for p in (rnd.choice(SURNAMES), rnd.choice(MIDDLE), rnd.choice(GIVEN)) if p)
+
+    @staticmethod
+    def _email(name: str, tag: str) -> str:
+        return f"{fold(name).replace(' ', '.')}.{tag}@example.com"
+
+    def patient(self, i: int) -> Dict[str, Any]:
+        rnd = self._rnd("patient", i)
+        name = self._name(rnd)
+        born = self.today - timedelta(days=rnd.randint(0, 95 * 365))
+        return {"full_name": name, "date_of_birth": born.isoformat(),
+                "gender": rnd.choices(list(Gender), [49, 49, 2])[0].value,
+                "address": f"{rnd.randint(1, 400)} {rnd.choice(STREETS)}, {rnd.choice(CITIES)}",
+                "phone_number": f"09{i:08d}", "email": self._email(name, f"p{i}")}
+
+    def doctor(self, i: int) -> Dict[str, Any]:
+        rnd = self._rnd("doctor", i)
+        name = self._name(rnd)
+        return {"full_name": name, "specialization": SPECIALIZATIONS[i % len(SPECIALIZATIONS)],
+                "phone_number": f"08{i:08d}", "email": self._email(name, f"d{i}"),
+                "year_of_experience": rnd.randint(0, 40)}
+
+    def appointment(self, i: int, patient_ids: Sequence[int], doctor_ids: Sequence[int]) -> Dict[str, Any]:
+        rnd = self._rnd("appointment", i)
+        day = self.today + timedelta(days=rnd.randint(-HISTORY_DAYS, FUTURE_DAYS))
+        if day > self.today:
+            status = Status.Pending
+        else:
+            status = rnd.choices([Status.Done, Status.Cancelled, Status.Pending], [80, 15, 5])[0]
+        start = 8 * 60 + 15 * rnd.randint(0, 34)
+        return {"patient_id": rnd.choice(patient_ids), "doctor_id": rnd.choice(doctor_ids),
+                "appointment_date": day.isoformat(), "reason": rnd.choice(REASONS),
+                "status": status.value,
+                "start_time": f"{start // 60:02d}:{start % 60:02d}",
+                "end_time": f"{(start + 30) // 60:02d}:{(start + 30) % 60:02d}"}
+
+# ------------------------------- loading ------------------------------ #
+def _count(db: Database, table: str) -> int:
+    return db.execute(f"SELECT COUNT(*) AS n FROM {table}", fetch=True)[0]['n']
+
+def _ids(db: Database, table: str, key: str) -> array:
+    return array("i", (r[key] for r in db.stream(f"SELECT {key} FROM {table} ORDER BY {key}")))
+
+# kind -> (model module, batch insert, generator method)
+PEOPLE = {"patients": (pat, pat.add_patients, "patient"), "doctors": (doc, doc.add_doctors, "doctor")}
+
+def fill(db: Database, kind: str, target: int, seed: int = 42):
+    """Insert generated patients or doctors until the table holds `target`."""
+    module, insert, method = PEOPLE[kind]
+    make = getattr(Generator(seed), method)
+    have = _count(db, module.TABLE)
+    i = have
+    while have < target:
+        batch = [make(j) for j in range(i, i + min(BATCH, target - have))]
+        i += len(batch)
+        clashes = module.conflicts(db, batch)
+        good = [r for k, r in enumerate(batch) if k not in clashes]
+        insert(db, good)
+        have += len(good)
+
+def load(db: Database, scale: str, seed: int = 42) -> Dict[str, int]:
+    """Top the database up to `scale` rows; returns the final counts."""
+    n_patients, n_doctors, n_appts = SCALES[scale]
+    migrations.ensure_schema(db)
+    fill(db, "patients", n_patients, seed)
+    fill(db, "doctors", n_doctors, seed)
+    have = _count(db, app.TABLE)
+    if have < n_appts:
+        gen = Generator(seed)
+        patient_ids, doctor_ids = _ids(db, pat.TABLE, "patient_id"), _ids(db, doc.TABLE, "doctor_id")
+        for lo in range(have, n_appts, BATCH):
+            app.add_appointments(db, [gen.appointment(i, patient_ids, doctor_ids)
+                                      for i in range(lo, min(n_appts, lo + BATCH))])
+    return {"patients": _count(db, pat.TABLE), "doctors": _count(db, doc.TABLE),
+            "appointments": _count(db, app.TABLE)}
+
+def main():
+    scale = sys.argv[1] if len(sys.argv) > 1 else "10k"
+    seed = int(sys.argv[2]) if len(sys.argv) > 2 else 42
+    db = connect()
+    with timer(f"load scale {scale} (seed {seed})"):
+        counts = load(db, scale, seed)
+    print(", ".join(f"{n:,} {kind}" for kind, n in counts.items()))
+    db.close()
+
+if __name__ == "__main__":
+    main()
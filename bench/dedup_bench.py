@@ -0,0 +1,106 @@
+"""
+Patient de-duplication – scan time and accuracy at 100k / 1M patients
+
+    python -m bench.dedup_bench [100000 1000000] [--dup-rate 0.01] [--workers N] [--budget-min 5]
+
+No database is needed: patients come from bench.datagen and a share of
+them gets a near-duplicate – accents dropped, +84 phone format, extra
+spaces, swapped name parts, one mistyped letter, day/month swapped or
+contact details missing. The run reports time per stage, comparisons
+made, and precision/recall against the injected pairs, and exits 1 if
+a scan of the largest size takes longer than --budget-min.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from typing import Any, Dict
+from models import dedup
+from utils.text import fold
+from .datagen import Generator
+
+def _typo(name: str, rnd: random.Random) -> str:
+    i = rnd.randrange(len(name))
+    return name[:i] + rnd.choice("aeiounh") + name[i + 1:] if name[i].isalpha() else name
+
+def _variant(row: Dict[str, Any], rnd: random.Random) -> Dict[str, Any]:
+    """A second registration of the same person, as a receptionist might type it."""
+    row = dict(row)
+    name = row["full_name"]
+    for change in rnd.sample(["fold", "spaces", "swap", "typo", "phone", "no_email", "no_phone", "dob"], 2):
+        if change == "fold":
+            name = fold(name).title()
+        elif change == "spaces":
+            name = "  ".join(name.split()) + " "
+        elif change == "swap":
+            parts = name.split()
+            name = " ".join(parts[-1:] + parts[:-1])
+        elif change == "typo":
+            name = _typo(name, rnd)
+        elif change == "phone" and row["phone_number"]:
+            num = row["phone_number"]
+            row["phone_number"] = f"+84 {num[1:4]} {num[4:7]} {num[7:]}"
+        elif change == "no_email":
+            row["email"] = None
+        elif change == "no_phone":
+            row["phone_number"] = None
+        elif change == "dob":
+            y, m, d = row["date_of_birth"].split("-")
+            if int(d) <= 12:
+                row["date_of_birth"] = f"{y}-{d}-{m}"
+    row["full_name"] = name
+    return row
+
+def _population(n: int, dup_rate: float):
+    """n dedup.Records, the last n * dup_rate of them duplicates, and
+    duplicate id -> original id."""
+    gen, rnd = Generator(seed=7), random.Random(7)
+    originals = int(n / (1 + dup_rate))
+    records, source = [], {}
+    for i in range(originals):
+        records.append(dedup.record({"patient_id": i + 1, **gen.patient(i)}))
+    for pid in range(originals + 1, n + 1):
+        i = rnd.randrange(originals)
+        source[pid] = i + 1
+        records.append(dedup.record({"patient_id": pid, **_variant(gen.patient(i), rnd)}))
+    return records, source
+
+def _accuracy(proposals, source: Dict[int, int]):
+    """Recall: injected duplicates proposed for merging into their original.
+    Precision: proposed merges where both records are the same person."""
+    person = lambda pid: source.get(pid, pid)
+    merges = [(p["keep"], m) for p in proposals for m in p["merge"]]
+    right = sum(1 for keep, m in merges if person(keep) == person(m))
+    caught = sum(1 for keep, m in merges if source.get(m) == keep)
+    return caught / len(source) if source else 1.0, right / len(merges) if merges else 1.0
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("sizes", nargs="*", type=int, default=[100_000, 1_000_000])
+    parser.add_argument("--dup-rate", type=float, default=0.01)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--budget-min", type=float, default=5.0,
+                        help="fail when the largest scan takes longer (default 5 minutes)")
+    args = parser.parse_args()
+    elapsed = 0.0
+    for n in args.sizes:
+        start = time.perf_counter()
+        records, source = _population(n, args.dup_rate)
+        built = time.perf_counter() - start
+        start = time.perf_counter()
+        pairs, stats = dedup.find_pairs(records, workers=args.workers)
+        found = dedup.proposals(pairs)
+        elapsed = time.perf_counter() - start
+        recall, precision = _accuracy(found, source)
+        print(f"{n:>10,} patients  generate {built:6.1f}s  scan {elapsed:6.1f}s "
+              f"({args.workers} workers)  {stats['comparisons']:>10,} comparisons in {stats['blocks']:,} blocks "
+              f"({stats['oversized_blocks']} oversized)  {len(found):,} proposals  "
+              f"recall {recall:.1%}  precision {precision:.1%}")
+    if elapsed > args.budget_min * 60:
+        print(f"❌ scan of {args.sizes[-1]:,} patients took {elapsed / 60:.1f} min, "
+              f"over the {args.budget_min:g} min budget")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+
+"""
+Streaming export vs fetch-everything-then-write
+
+    HMS_DB_PASSWORD=... python -m bench.export_bench [rows]
+
+Tops the appointments table up to `rows`, then exports it with a buffered
+fetchall and with the streaming exporter in each format, reporting rows/s
+and the peak Python heap of each run.
+"""
+import csv
+import os
+import sys
+import tempfile
+import tracemalloc
+from contextlib import contextmanager
+from datetime import date, timedelta
+from cli import exporter
+from models import patient as pat, doctor as doc, appointment as app, migrations
+from .common import connect, timer
+
+@contextmanager
+def peak(label: str):
+    tracemalloc.start()
+    try:
+        yield
+    finally:
+        _, top = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"{'':<40} peak heap {top / 2**20:8.1f} MiB  ({label})")
+
+def _seed(db, n: int):
+    have = db.execute(f"SELECT COUNT(*) AS n FROM {app.TABLE}", fetch=True)[0]['n']
+    if have >= n:
+        return
+    pid = pat.add_patient(db, {"full_name": "Export Bench", "date_of_birth": "1970-01-01", "gender": "Other",
+                               "address": "", "phone_number": "", "email": ""})
+    did = doc.add_doctor(db, {"full_name": "Dr Export Bench", "specialization": "Bench", "phone_number": "",
+                              "email": "", "year_of_experience": 1})
+    start = date(2015, 1, 1)
+    for lo in range(have, n, 10000):
+        app.add_appointments(db, [{"patient_id": pid, "doctor_id": did, "reason": f"visit {i}",
+                                   "appointment_date": start + timedelta(days=i % 3650),
+                                   "status": ("Pending", "Done", "Cancelled")[i % 3]}
+                                  for i in range(lo, min(n, lo + 10000))])
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    db = connect()
+    migrations.ensure_schema(db)
+    _seed(db, n)
+    sql, _ = exporter.build_query("appointments")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "fetchall.csv")
+        with peak("fetchall"), timer(f"fetchall + csv ({n:,}+ rows)", n):
+            rows = db.execute(sql, fetch=True)
+            with open(path, "w", newline="", encoding="utf-8") as fh:
+                out = csv.writer(fh)
+                out.writerows([exporter._plain(v) for v in r.values()] for r in rows)
+            del rows
+        for name in ("appointments.csv", "appointments.ndjson.gz", "appointments.parquet"):
+            path = os.path.join(tmp, name)
+            try:
+                with peak(name), timer(f"stream -> {name}", n):
+                    stats = exporter.export(db, "appointments", path, echo=lambda _: None)
+            except RuntimeError as e:  # pyarrow not installed
+                print(f"{'stream -> ' + name:<40} skipped: {e}")
+                continue
+            print(f"{'':<40} {stats['rows']:,} rows, {stats['bytes'] / 2**20:,.1f} MiB on disk")
+    db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+
+"""
+Bulk import vs per-row inserts
+
+    HMS_DB_PASSWORD=... python -m bench.import_bench [rows]
+"""
+import csv
+import os
+import sys
+import tempfile
+from cli.importer import import_file, read_rows, _clean_patient
+from models import patient as pat
+from .common import connect, timer
+
+FIELDS = ["full_name", "date_of_birth", "gender", "address", "phone_number", "email"]
+
+def _write_csv(path: str, n: int):
+    with open(path, "w", newline="", encoding="utf-8") as fh:
+        out = csv.writer(fh)
+        out.writerow(FIELDS)
+        for i in range(n):
+            out.writerow([f"Import Patient {i}", "1985-06-15", "Female",
+                          f"{i} Le Loi, Hanoi", f"09{i:08d}", f"p{i}@example.com"])
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    db = connect()
+    pat.create_table(db)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "patients.csv")
+        _write_csv(path, n)
+        with timer(f"per-row add_patient ({n:,} rows)", n):
+            for raw in read_rows(path):
+                pat.add_patient(db, _clean_patient(raw)[0])
+        with timer(f"import_file batch=1000 ({n:,} rows)", n):
+            import_file(db, "patients", path, echo=lambda _: None)
+    db.close()
+
+if __name__ == "__main__":
+    main()
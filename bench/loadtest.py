@@ -0,0 +1,142 @@
+"""
+Service load test – requests/s and latency of `main.py serve` under many clients
+
+    HMS_DB_PASSWORD=... python -m bench.loadtest [--clients 50] [--seconds 10] [--pool-size 16]
+    python -m bench.loadtest --connect 127.0.0.1:8765   # an already running service
+
+Without --connect the service runs in a background thread of this
+process against the scratch database (load it with `python -m
+bench.datagen` first). Each client keeps one connection and sends a
+kiosk-like mix: patient lookups by id and name, a patient's
+appointments, next free slot, and some bookings. Booking conflicts are
+expected answers, not failures. Prints per-op and overall requests/s,
+p50 and p99 latency.
+"""
+import argparse
+import asyncio
+import json
+import random
+import threading
+import time
+from collections import defaultdict
+from datetime import date, timedelta
+from typing import Dict, List
+from cli import service
+from models import patient as pat, doctor as doc, migrations
+from .common import connect
+
+# op -> share of requests
+MIX = {"patient.search_by_id": 40, "patient.search_by_name": 15, "appointment.search_by_patient": 20,
+       "doctor.search_by_id": 10, "availability.next_free_slot": 10, "appointment.book": 5}
+
+def _args(op: str, rnd: random.Random, ids: Dict[str, List]) -> dict:
+    if op == "patient.search_by_id":
+        return {"pid": rnd.choice(ids["patients"])}
+    if op == "patient.search_by_name":
+        return {"name": rnd.choice(ids["names"]), "limit": 20}
+    if op == "appointment.search_by_patient":
+        return {"pid": rnd.choice(ids["patients"]), "limit": 20}
+    if op == "doctor.search_by_id":
+        return {"did": rnd.choice(ids["doctors"])}
+    if op == "availability.next_free_slot":
+        return {"specialization": rnd.choice(ids["specializations"])}
+    day = date.today() + timedelta(days=rnd.randint(1, 14))
+    return {"data": {"patient_id": rnd.choice(ids["patients"]), "doctor_id": rnd.choice(ids["doctors"]),
+                     "appointment_date": day.isoformat(), "reason": "load test",
+                     "start_time": f"{rnd.randint(8, 16):02d}:{rnd.choice((0, 15, 30, 45)):02d}"}}
+
+async def _client(host: str, port: int, seed: int, ids, deadline: float, latencies, failures):
+    rnd = random.Random(seed)
+    ops, weights = list(MIX), list(MIX.values())
+    reader, writer = await asyncio.open_connection(host, port, limit=service.MAX_LINE)
+    n = 0
+    while time.perf_counter() < deadline:
+        op = rnd.choices(ops, weights)[0]
+        start = time.perf_counter()
+        writer.write(json.dumps({"id": n, "op": op, "args": _args(op, rnd, ids)}).encode() + b"\n")
+        await writer.drain()
+        reply = json.loads(await reader.readline())
+        latencies[op].append((time.perf_counter() - start) * 1000)
+        if not reply["ok"] and reply.get("type") != "BookingConflict":
+            failures[op] += 1
+        n += 1
+    writer.close()
+
+def _line(label: str, values: List[float], seconds: float, failures: int) -> str:
+    values = sorted(values)
+    if not values:
+        return f"{label:<30} no requests"
+    return (f"{label:<30} {len(values):>8,}  {len(values) / seconds:>9,.0f} req/s  "
+            f"p50 {values[len(values) // 2]:7.1f} ms  p99 {values[int(len(values) * 0.99)]:7.1f} ms  "
+            f"errors {failures}")
+
+def _start_service(pool_size: int):
+    """Serve the scratch database from a thread with its own event loop."""
+    db = connect(pool_size=pool_size)
+    migrations.ensure_schema(db)
+    ready, box = threading.Event(), {}
+
+    def run():
+        loop = asyncio.new_event_loop()
+        server, adb = loop.run_until_complete(service.start(db, port=0))
+        box.update(port=server.sockets[0].getsockname()[1], loop=loop)
+        ready.set()
+        loop.run_forever()
+        server.close()
+        loop.run_until_complete(server.wait_closed())
+        adb.close()
+        db.close()
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    ready.wait()
+    return db, box["port"], lambda: (box["loop"].call_soon_threadsafe(box["loop"].stop), thread.join())
+
+def _sample_ids(db) -> Dict[str, List]:
+    patients = pat.list_all(db, limit=2000)
+    doctors = doc.list_all(db, limit=500)
+    if not patients or not doctors:
+        raise SystemExit("no data – load the scratch database with `python -m bench.datagen` first")
+    return {"patients": [p["patient_id"] for p in patients], "doctors": [d["doctor_id"] for d in doctors],
+            "names": sorted({p["full_name"].split()[-1] for p in patients}),
+            "specializations": sorted({d["specialization"] for d in doctors})}
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--pool-size", type=int, default=16)
+    parser.add_argument("--connect", metavar="HOST:PORT", help="load an already running service")
+    args = parser.parse_args()
+
+    if args.connect:
+        host, _, port = args.connect.rpartition(":")
+        port, stop = int(port), None
+        db = connect()
+        ids = _sample_ids(db)
+        db.close()
+    else:
+        host = "127.0.0.1"
+        db, port, stop = _start_service(args.pool_size)
+        ids = _sample_ids(db)
+
+    latencies, failures = defaultdict(list), defaultdict(int)
+
+    async def run():
+        deadline = time.perf_counter() + args.seconds
+        await asyncio.gather(*(_client(host, port, i, ids, deadline, latencies, failures)
+                               for i in range(args.clients)))
+
+    start = time.perf_counter()
+    asyncio.run(run())
+    elapsed = time.perf_counter() - start
+    if stop:
+        stop()
+    print(f"{args.clients} clients, {args.seconds:g}s"
+          + ("" if args.connect else f", pool of {args.pool_size} connections"))
+    for op in MIX:
+        print(_line(op, latencies[op], elapsed, failures[op]))
+    print(_line("all", [v for op in MIX for v in latencies[op]], elapsed, sum(failures.values())))
+
+if __name__ == "__main__":
+    main()
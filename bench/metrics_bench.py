@@ -0,0 +1,38 @@
+"""
+Instrumentation overhead – QueryMetrics.record() alone and point lookups with metrics on vs off
+
+    HMS_DB_PASSWORD=... python -m bench.metrics_bench
+"""
+import random
+import time
+from models import appointment as app, migrations, queries
+from models.metrics import QueryMetrics
+from .common import connect, timer
+
+CALLS = 20000
+
+def main():
+    metrics = QueryMetrics(slow_ms=float("inf"))
+    sql = queries.get(app.BY_ID)
+    start = time.perf_counter()
+    for _ in range(CALLS * 10):
+        metrics.record(sql, 0.0008, 1, 120)
+    per_call = (time.perf_counter() - start) / (CALLS * 10) * 1e6
+    print(f"{'QueryMetrics.record()':<40} {per_call:8.2f} µs/call")
+
+    db = connect(cache_size=0)
+    migrations.ensure_schema(db)
+    max_id = db.execute(f"SELECT MAX(appointment_id) AS m FROM {app.TABLE}", fetch=True)[0]['m'] or 1
+    rnd = random.Random(5)
+    ids = [rnd.randint(1, max_id) for _ in range(CALLS)]
+    for enabled in (False, True, False, True):  # interleaved to even out warm-up
+        db.metrics.enabled = enabled
+        with timer(f"appointment.search_by_id metrics={'on' if enabled else 'off'}", CALLS):
+            for i in ids:
+                app.search_by_id(db, i)
+    print()
+    print(db.metrics.report(top=5))
+    db.close()
+
+if __name__ == "__main__":
+    main()
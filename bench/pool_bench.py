@@ -0,0 +1,48 @@
+
+"""
+Concurrency benchmark – throughput of patient.search_by_id vs pool size
+
+    HMS_DB_PASSWORD=... python -m bench.pool_bench
+
+Runs against a scratch database (HMS_BENCH_DB, default hospital_bench).
+"""
+import random
+from concurrent.futures import ThreadPoolExecutor
+from models import patient as pat, doctor as doc, appointment as app
+from .common import connect, timer
+
+WORKERS = 16
+CALLS = 4000
+
+def _seed(db, n: int = 1000):
+    pat.create_table(db)
+    doc.create_table(db)
+    app.create_table(db)
+    if db.execute(f"SELECT COUNT(*) AS n FROM {pat.TABLE}", fetch=True)[0]['n'] >= n:
+        return
+    rows = [(f"Bench Patient {i}", "1990-01-01", "Other", "", "", "") for i in range(n)]
+    db.execute(f"""INSERT INTO {pat.TABLE}
+               (full_name, date_of_birth, gender, address, phone_number, email)
+               VALUES (%s, %s, %s, %s, %s, %s)""", rows, many=True)
+
+def run(pool_size: int, ids):
+    db = connect(pool_size=pool_size)
+    try:
+        with ThreadPoolExecutor(WORKERS) as ex:
+            with timer(f"pool_size={pool_size or 'single'}", CALLS):
+                list(ex.map(lambda pid: pat.search_by_id(db, pid), ids))
+    finally:
+        db.close()
+
+def main():
+    db = connect()
+    _seed(db)
+    max_id = db.execute(f"SELECT MAX(patient_id) AS m FROM {pat.TABLE}", fetch=True)[0]['m']
+    db.close()
+    rnd = random.Random(42)
+    ids = [rnd.randint(1, max_id) for _ in range(CALLS)]
+    for size in (0, 1, 2, 4, 8, 16):
+        run(size, ids)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+
+"""
+Micro-benchmark – text protocol vs cached server-side prepared statements
+
+    HMS_DB_PASSWORD=... python -m bench.prepared_bench
+"""
+import random
+import time
+from models import appointment as app, patient as pat, migrations, queries
+from .common import connect, timer
+
+CALLS = 20000
+
+def main():
+    db = connect(cache_size=0)
+    migrations.ensure_schema(db)
+    max_id = db.execute(f"SELECT MAX(appointment_id) AS m FROM {app.TABLE}", fetch=True)[0]['m'] or 1
+    rnd = random.Random(3)
+    ids = [rnd.randint(1, max_id) for _ in range(CALLS)]
+    for name in (pat.BY_ID, app.BY_ID):
+        sql = queries.get(name)
+        cpu = time.process_time()
+        with timer(f"{name} execute()", CALLS):
+            for i in ids:
+                db.execute(sql, (i,), fetch=True)
+        print(f"{'':<40} client CPU {time.process_time() - cpu:.3f}s")
+        cpu = time.process_time()
+        with timer(f"{name} query() prepared", CALLS):
+            for i in ids:
+                db.query(sql, (i,))
+        print(f"{'':<40} client CPU {time.process_time() - cpu:.3f}s")
+    # server side: statements parsed vs prepared executions
+    for row in db.execute("SHOW SESSION STATUS WHERE Variable_name IN "
+                          "('Com_select', 'Com_stmt_prepare', 'Com_stmt_execute')", fetch=True):
+        print(f"{row['Variable_name']:<40} {row['Value']}")
+    db.close()
+
+if __name__ == "__main__":
+    main()
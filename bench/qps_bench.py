@@ -0,0 +1,45 @@
+
+"""
+Queries per second of the read-only model functions, with and without a
+COMMIT after every statement (the pre-transaction behaviour)
+
+    HMS_DB_PASSWORD=... python -m bench.qps_bench
+"""
+import random
+from models import patient as pat, doctor as doc, appointment as app, migrations
+from models.database import Database
+from .common import connect, creds_from_env, timer
+
+CALLS = 5000
+
+class CommitEveryCall(Database):
+    """Replays the old execute(): an explicit COMMIT after every statement."""
+    def execute(self, sql, params=None, *, fetch=False, many=False):
+        rows = super().execute(sql, params, fetch=fetch, many=many)
+        with self._checkout() as conn:
+            conn.commit()
+        return rows
+
+def _workload(db, ids):
+    for pid in ids:
+        pat.search_by_id(db, pid)
+        doc.search_by_id(db, pid % 50 + 1)
+        app.search_by_patient(db, pid, limit=20)
+
+def main():
+    db = connect()
+    migrations.ensure_schema(db)
+    max_id = db.execute(f"SELECT MAX(patient_id) AS m FROM {pat.TABLE}", fetch=True)[0]['m'] or 1
+    db.close()
+    rnd = random.Random(1)
+    ids = [rnd.randint(1, max_id) for _ in range(CALLS // 3)]
+    for label, factory in (("commit after every statement", CommitEveryCall),
+                           ("autocommit reads", Database)):
+        # cache off so every call reaches MySQL
+        db = factory(*creds_from_env(), cache_size=0)
+        with timer(label, len(ids) * 3):
+            _workload(db, ids)
+        db.close()
+
+if __name__ == "__main__":
+    main()
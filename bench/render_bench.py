@@ -0,0 +1,61 @@
+
+"""
+Table rendering – tabulate "pretty" vs the streaming renderer
+
+    python -m bench.render_bench [10000 100000 1000000] [--tabulate-max N]
+
+Rows are synthetic patients, so no database is needed. tabulate gets a
+list, as Menu._print used to; the renderer gets a generator, as it does
+when streaming a listing. Both write to os.devnull.
+"""
+import argparse
+import os
+import time
+import tracemalloc
+from tabulate import tabulate
+from cli import render
+from .datagen import Generator
+
+def _rows(n: int):
+    gen = Generator(seed=1)
+    for i in range(n):
+        yield {"patient_id": i + 1, **gen.patient(i)}
+
+def _measure(label: str, fn):
+    tracemalloc.start()
+    start = time.perf_counter()
+    first = fn()
+    elapsed = time.perf_counter() - start
+    _, top = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    extra = f"  first line {first * 1000:7.1f} ms" if first is not None else ""
+    print(f"{label:<34} {elapsed:8.2f}s  peak heap {top / 2**20:8.1f} MiB{extra}")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("sizes", nargs="*", type=int, default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--tabulate-max", type=int, default=100_000,
+                        help="skip tabulate above this many rows (it needs minutes at 1M)")
+    args = parser.parse_args()
+    with open(os.devnull, "w", encoding="utf-8") as sink:
+        for n in args.sizes:
+            def streamed():
+                start, first = time.perf_counter(), None
+                for line in render.render(_rows(n)):
+                    sink.write(line + "\n")
+                    if first is None:
+                        first = time.perf_counter() - start
+                return first
+
+            def tabulated():
+                rows = list(_rows(n))
+                sink.write(tabulate(rows, headers="keys", tablefmt="pretty") + "\n")
+
+            if n <= args.tabulate_max:
+                _measure(f"tabulate pretty  {n:>9,} rows", tabulated)
+            else:
+                print(f"{'tabulate pretty  ' + format(n, '>9,') + ' rows':<34} skipped (--tabulate-max)")
+            _measure(f"render streaming {n:>9,} rows", streamed)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Read/write splitting – booking latency under reporting load, primary-only vs with replicas
+
+    HMS_DB_PASSWORD=... HMS_BENCH_REPLICAS=127.0.0.1:3307 python -m bench.replica_bench
+
+Two plain local servers work as stand-ins: the "replica" is not
+replicating, so it reports lag 0 – load the same data into both (e.g.
+`python -m bench.datagen` against each) before running. Reader threads
+page through appointment listings while one thread books appointments;
+the same run is repeated with the replicas switched on. Also checks that
+a writer reads its own booking back straight after making it.
+"""
+import os
+import random
+import threading
+import time
+from datetime import date
+from models import appointment as app, patient as pat, doctor as doc, migrations
+from .common import connect
+
+READERS = 8
+SECONDS = 10.0
+
+def _reader(db, stop: threading.Event, counts: list):
+    n = 0
+    while not stop.is_set():
+        rows = app.list_all(db, 'DESC', limit=200)
+        if rows:
+            app.list_all(db, 'DESC', after=rows[-1], limit=200)
+        n += 1
+    counts.append(n)
+
+def _run(db, label: str, patient_id: int, doctor_id: int):
+    stop, counts, latencies = threading.Event(), [], []
+    readers = [threading.Thread(target=_reader, args=(db, stop, counts)) for _ in range(READERS)]
+    for t in readers:
+        t.start()
+    rnd = random.Random(3)
+    deadline = time.perf_counter() + SECONDS
+    mismatches = 0
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        aid = app.add_appointment(db, {"patient_id": patient_id, "doctor_id": doctor_id,
+                                       "appointment_date": date.today(), "reason": f"bench {rnd.random()}",
+                                       "status": "Pending"})
+        latencies.append((time.perf_counter() - start) * 1000)
+        if not app.search_by_id(db, aid):  # read-your-writes
+            mismatches += 1
+    stop.set()
+    for t in readers:
+        t.join()
+    latencies.sort()
+    print(f"{label:<18} bookings {len(latencies):>6,}  p50 {latencies[len(latencies) // 2]:6.1f} ms  "
+          f"p99 {latencies[int(len(latencies) * 0.99)]:6.1f} ms  report pages/s {sum(counts) / SECONDS:8,.0f}  "
+          f"own-write misses {mismatches}")
+
+def main():
+    replicas = [h for h in os.environ.get("HMS_BENCH_REPLICAS", "").split(",") if h]
+    if not replicas:
+        raise SystemExit("set HMS_BENCH_REPLICAS=host[:port][,host[:port]...]")
+    for label, kwargs in (("primary only", {}), (f"{len(replicas)} replica(s)", {"replicas": replicas})):
+        db = connect(pool_size=READERS + 2, cache_size=0, **kwargs)
+        migrations.ensure_schema(db)
+        patient_id = pat.list_all(db, limit=1)[0]["patient_id"]
+        doctor_id = doc.list_all(db, limit=1)[0]["doctor_id"]
+        _run(db, label, patient_id, doctor_id)
+        print("   ", db.replicas.status())
+        db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+
+"""
+Name search latency – trigram index vs LIKE '%name%'
+
+    HMS_DB_PASSWORD=... python -m bench.search_bench [patients]
+"""
+import sys
+import time
+from models import patient as pat, migrations
+from . import datagen
+from .common import connect, timer
+
+QUERIES = ["Nguyễn Văn Hùng", "nguyen van hung", "Nguyn Van Hung", "Tran Thi Thao", "Phúc", "Muller"]
+
+def _seed(db, n: int):
+    have = db.execute(f"SELECT COUNT(*) AS n FROM {pat.TABLE}", fetch=True)[0]['n']
+    with timer(f"seed {max(n - have, 0):,} patients", max(n - have, 0)):
+        datagen.fill(db, "patients", n)
+
+def _latency(label: str, fn, runs: int = 20):
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    print(f"{label:<45} p50 {samples[len(samples) // 2] * 1000:8.1f} ms"
+          f"  max {samples[-1] * 1000:8.1f} ms")
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    db = connect()
+    migrations.ensure_schema(db)
+    _seed(db, n)
+    for q in QUERIES:
+        _latency(f"trigram  {q!r}", lambda: pat.search_by_name(db, q))
+        _latency(f"LIKE     {q!r}", lambda: db.execute(
+            f"SELECT * FROM {pat.TABLE} WHERE full_name LIKE %s ORDER BY full_name",
+            (f"%{q}%",), fetch=True), runs=3)
+    db.close()
+
+if __name__ == "__main__":
+    main()
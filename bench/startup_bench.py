@@ -0,0 +1,73 @@
+"""
+Cold start – wall time of fresh `main.py` processes, and what `import main` pulls in
+
+    python -m bench.startup_bench [--runs 20] [--budget-ms 150] [--no-db]
+
+Each run is a new interpreter, as for a scripted invocation. `--help`
+needs no database. `migrate` against an up-to-date schema is the
+connect + version check every scripted command pays; it uses the bench
+database from HMS_DB_HOST / HMS_DB_USER / HMS_DB_PASSWORD / HMS_BENCH_DB.
+Exits 1 if `import main` loads a deferred module, or if the median
+`--help` start-up exceeds --budget-ms, so CI catches regressions.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+# must not be imported until a command actually needs them
+DEFERRED = ("mysql", "tabulate", "cli.menu", "models.database")
+
+def _wall(argv, env=None) -> float:
+    start = time.perf_counter()
+    subprocess.run([sys.executable, *argv], cwd=ROOT, env=env, check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return (time.perf_counter() - start) * 1000
+
+def _report(label: str, times) -> float:
+    median = statistics.median(times)
+    print(f"{label:<40} median {median:7.1f} ms  min {min(times):7.1f} ms  max {max(times):7.1f} ms")
+    return median
+
+def _leaked_imports():
+    loaded = subprocess.run([sys.executable, "-c", "import sys, main; print('\\n'.join(sys.modules))"],
+                            cwd=ROOT, check=True, capture_output=True, text=True).stdout.split()
+    return sorted(m for m in loaded if any(m == d or m.startswith(d + ".") for d in DEFERRED))
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--budget-ms", type=float, default=150.0,
+                        help="fail when the median `main.py --help` start-up is slower")
+    parser.add_argument("--no-db", action="store_true", help="skip the runs that need MySQL")
+    args = parser.parse_args()
+
+    failed = False
+    leaked = _leaked_imports()
+    if leaked:
+        print(f"❌ import main loads deferred modules: {', '.join(leaked)}")
+        failed = True
+
+    _report("python -c pass (interpreter only)", [_wall(["-c", "pass"]) for _ in range(args.runs)])
+    _report("python -c 'import main'", [_wall(["-c", "import main"]) for _ in range(args.runs)])
+    help_ms = _report("main.py --help", [_wall(["main.py", "--help"]) for _ in range(args.runs)])
+    if help_ms > args.budget_ms:
+        print(f"❌ --help start-up {help_ms:.1f} ms is over the {args.budget_ms:.0f} ms budget")
+        failed = True
+
+    if not args.no_db:
+        from .common import creds_from_env
+        host, user, password, database = creds_from_env()
+        env = {**os.environ, "HMS_DB_HOST": host, "HMS_DB_USER": user,
+               "HMS_DB_PASSWORD": password, "HMS_DB_NAME": database}
+        _wall(["main.py", "migrate"], env)  # bring the schema up to date once
+        _report("main.py migrate (schema current)",
+                [_wall(["main.py", "migrate"], env) for _ in range(args.runs)])
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+
+"""
+Benchmark runner – times the public model functions at several data scales
+
+    HMS_DB_PASSWORD=... python -m bench.suite [--scales 10k 100k] [--baseline old.json]
+
+Each scale gets its own database (`$HMS_BENCH_DB_<scale>`), loaded once
+by bench.datagen and topped up on later runs. Results are written as
+JSON; with --baseline, any case whose median is more than --tolerance
+slower (and at least --floor-ms slower) is flagged and the exit code is 1.
+"""
+import argparse
+import inspect
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from datetime import date, datetime, timedelta
+from typing import Any, Callable, Dict, List, Tuple
+from models import patient as pat, doctor as doc, appointment as app, availability, reports, search
+from models.database import Database
+from models.paging import PAGE_SIZE
+from . import datagen
+from .common import creds_from_env
+
+MODULES = (pat, doc, app, availability, reports, search)
+# schema setup and index maintenance are covered by migrations / imports
+SKIP = {"create_table", "index_names", "index_name", "reindex", "record", "rebuild", "verify", "set_hours"}
+READ_RUNS, WRITE_RUNS = 20, 5
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+class Context:
+    """Sample ids and names drawn from the loaded data, plus pre-generated
+    new rows, so a case times only the call being measured."""
+    FRESH = 100_000_000  # generator index far past any scale: keys never clash
+
+    def __init__(self, db: Database, seed: int):
+        gen = datagen.Generator(seed)
+        pick = lambda sql: db.execute(sql, fetch=True)
+        self.patients = pick(f"SELECT patient_id, full_name, date_of_birth FROM {pat.TABLE} "
+                             f"ORDER BY patient_id LIMIT 50")
+        self.doctors = pick(f"SELECT doctor_id, full_name, specialization FROM {doc.TABLE} "
+                            f"ORDER BY doctor_id LIMIT 50")
+        self.appointments = [r['appointment_id'] for r in pick(
+            f"SELECT appointment_id FROM {app.TABLE} ORDER BY appointment_id DESC LIMIT 50")]
+        self.new_patients = [gen.patient(self.FRESH + i) for i in range(1000)]
+        self.new_doctors = [gen.doctor(self.FRESH + i) for i in range(100)]
+        # untimed, so inserting them never depends on free slots
+        self.new_appointments = [{**gen.appointment(self.FRESH + i, [p['patient_id'] for p in self.patients],
+                                                    [d['doctor_id'] for d in self.doctors]),
+                                  "start_time": None, "end_time": None} for i in range(1000)]
+        self.n = 0
+
+    def take(self, rows: List[Any]) -> Any:
+        self.n += 1
+        return rows[self.n % len(rows)]
+
+# name -> (is_write, fn(db, ctx)); writes are rolled back after each run
+Case = Tuple[bool, Callable[[Database, Context], Any]]
+
+CASES: Dict[str, Case] = {
+    "patient.list_all": (False, lambda db, c: pat.list_all(db, limit=PAGE_SIZE + 1)),
+    "patient.sort_by_dob": (False, lambda db, c: pat.sort_by_dob(db, 'DESC', limit=PAGE_SIZE + 1)),
+    "patient.search_by_id": (False, lambda db, c: pat.search_by_id(db, c.take(c.patients)['patient_id'])),
+    "patient.search_by_name": (False, lambda db, c: pat.search_by_name(db, c.take(c.patients)['full_name'])),
+    "patient.exists": (False, lambda db, c: _exists(db, c.take(c.patients))),
+    "patient.find_conflicts": (False, lambda db, c: pat.find_conflicts(db, c.take(c.new_patients))),
+    "patient.conflicts": (False, lambda db, c: pat.conflicts(db, c.new_patients)),
+    "patient.add_patient": (True, lambda db, c: pat.add_patient(db, c.take(c.new_patients))),
+    "patient.add_patients": (True, lambda db, c: pat.add_patients(db, c.new_patients)),
+
+    "doctor.list_all": (False, lambda db, c: doc.list_all(db, limit=PAGE_SIZE + 1)),
+    "doctor.sort_by_experience": (False, lambda db, c: doc.sort_by_experience(db, 'DESC', limit=PAGE_SIZE + 1)),
+    "doctor.search_by_id": (False, lambda db, c: doc.search_by_id(db, c.take(c.doctors)['doctor_id'])),
+    "doctor.search_by_name": (False, lambda db, c: doc.search_by_name(db, c.take(c.doctors)['full_name'])),
+    "doctor.exists": (False, lambda db, c: doc.exists(db, c.take(c.doctors)['full_name'])),
+    "doctor.find_conflicts": (False, lambda db, c: doc.find_conflicts(db, c.take(c.new_doctors))),
+    "doctor.conflicts": (False, lambda db, c: doc.conflicts(db, c.new_doctors)),
+    "doctor.add_doctor": (True, lambda db, c: doc.add_doctor(db, c.take(c.new_doctors))),
+    "doctor.add_doctors": (True, lambda db, c: doc.add_doctors(db, c.new_doctors)),
+
+    "appointment.list_all": (False, lambda db, c: app.list_all(db, 'DESC', limit=PAGE_SIZE + 1)),
+    "appointment.search_by_id": (False, lambda db, c: app.search_by_id(db, c.take(c.appointments))),
+    "appointment.search_by_patient": (False, lambda db, c: app.search_by_patient(
+        db, c.take(c.patients)['patient_id'], limit=PAGE_SIZE + 1)),
+    "appointment.search_by_doctor": (False, lambda db, c: app.search_by_doctor(
+        db, c.take(c.doctors)['doctor_id'], limit=PAGE_SIZE + 1)),
+    "appointment.list_today": (False, lambda db, c: app.list_today(db, limit=PAGE_SIZE + 1)),
+    "appointment.add_appointment": (True, lambda db, c: app.add_appointment(db, c.take(c.new_appointments))),
+    "appointment.add_appointments": (True, lambda db, c: app.add_appointments(db, c.new_appointments)),
+    "appointment.update_appointment": (True, lambda db, c: app.update_appointment(
+        db, c.take(c.appointments), {"status": ("Pending", "Done")[c.n % 2]})),
+    "appointment.set_status": (True, lambda db, c: app.set_status(
+        db, "Cancelled", since=date.today() - timedelta(days=30), until=date.today())),
+    "appointment.close_day": (True, lambda db, c: app.close_day(db, date.today())),
+    "appointment.reassign": (True, lambda db, c: _reassign(db, c)),
+    "appointment.add_series": (True, lambda db, c: app.add_series(db, c.take(c.new_appointments), count=52)),
+
+    "availability.working_hours": (False, lambda db, c: availability.working_hours(
+        db, [d['doctor_id'] for d in c.doctors])),
+    "availability.day_indexes": (False, lambda db, c: availability.day_indexes(
+        db, [d['doctor_id'] for d in c.doctors], date.today())),
+    "availability.next_free_slot": (False, lambda db, c: availability.next_free_slot(
+        db, c.take(c.doctors)['specialization'])),
+    "availability.check_slot": (False, lambda db, c: _check_slot(db, c)),
+    "availability.check_slots": (False, lambda db, c: _check_slots(db, c)),
+
+    "reports.doctor_day": (False, lambda db, c: reports.doctor_day(db, date.today())),
+    "reports.specialization_month": (False, lambda db, c: reports.specialization_month(db, date.today())),
+    "reports.monthly": (False, lambda db, c: reports.monthly(db, date.today().year)),
+    "reports.status_breakdown": (False, lambda db, c: reports.status_breakdown(db)),
+
+    "search.search": (False, lambda db, c: search.search(db, "patient", "Nguyen Van Hung")),
+}
+
+def _exists(db: Database, patient: Dict[str, Any]):
+    return pat.exists(db, patient['full_name'], patient['date_of_birth'])
+
+def _check_slot(db: Database, ctx: Context):
+    monday = date.today() + timedelta(days=7 - date.today().weekday())
+    with db.transaction():
+        try:
+            availability.check_slot(db, ctx.take(ctx.doctors)['doctor_id'], monday, "10:00", "10:30")
+        except availability.BookingConflict:
+            pass
+
+def _check_slots(db: Database, ctx: Context):
+    monday = date.today() + timedelta(days=7 - date.today().weekday())
+    with db.transaction():
+        try:
+            availability.check_slots(db, ctx.take(ctx.doctors)['doctor_id'],
+                                     [(monday + timedelta(days=7 * k), "10:00", "10:30") for k in range(52)])
+        except availability.BookingConflict:
+            pass
+
+def _reassign(db: Database, ctx: Context):
+    """A sick doctor's next week; a clash with the colleague still costs the full check."""
+    try:
+        app.reassign(db, ctx.take(ctx.doctors)['doctor_id'], ctx.take(ctx.doctors)['doctor_id'],
+                     since=date.today(), until=date.today() + timedelta(days=7))
+    except (availability.BookingConflict, ValueError):
+        pass
+
+def uncovered() -> List[str]:
+    """Public functions in MODULES that take a db but have no case."""
+    names = []
+    for module in MODULES:
+        short = module.__name__.rsplit(".", 1)[1]
+        for name, fn in inspect.getmembers(module, inspect.isfunction):
+            if (fn.__module__ == module.__name__ and not name.startswith("_") and name not in SKIP
+                    and next(iter(inspect.signature(fn).parameters), None) == "db"
+                    and f"{short}.{name}" not in CASES):
+                names.append(f"{short}.{name}")
+    return names
+
+# ------------------------------- running ------------------------------ #
+class _Discard(Exception):
+    pass
+
+def _once(db: Database, ctx: Context, fn: Callable, is_write: bool) -> float:
+    """One timed call. A write runs inside a transaction that is then rolled
+    back, so every run (and every later suite run) sees the same data; the
+    final COMMIT is therefore not part of the figure."""
+    start = time.perf_counter()
+    if not is_write:
+        fn(db, ctx)
+        return (time.perf_counter() - start) * 1000
+    try:
+        with db.transaction():
+            fn(db, ctx)
+            elapsed = (time.perf_counter() - start) * 1000
+            raise _Discard
+    except _Discard:
+        return elapsed
+
+def _time(db: Database, ctx: Context, fn: Callable, is_write: bool) -> Dict[str, float]:
+    _once(db, ctx, fn, is_write)  # warm-up: statement prepare, buffer pool
+    runs = WRITE_RUNS if is_write else READ_RUNS
+    samples = sorted(_once(db, ctx, fn, is_write) for _ in range(runs))
+    return {"runs": runs, "p50_ms": statistics.median(samples),
+            "p95_ms": samples[min(runs - 1, int(runs * 0.95))], "max_ms": samples[-1]}
+
+def run_scale(scale: str, seed: int, only: List[str]) -> Dict[str, Any]:
+    host, user, pwd, base = creds_from_env()
+    # no result cache: repeated runs must measure the database, not a dict lookup
+    db = Database(host, user, pwd, f"{base}_{scale}", cache_size=0)
+    try:
+        start = time.perf_counter()
+        counts = datagen.load(db, scale, seed)
+        print(f"[{scale}] data ready in {time.perf_counter() - start:.1f}s: "
+              + ", ".join(f"{n:,} {kind}" for kind, n in counts.items()))
+        ctx = Context(db, seed)
+        cases = {}
+        for name, (is_write, fn) in CASES.items():
+            if only and not any(name.startswith(o) for o in only):
+                continue
+            cases[name] = _time(db, ctx, fn, is_write)
+            print(f"[{scale}] {name:<36} p50 {cases[name]['p50_ms']:9.2f} ms"
+                  f"  p95 {cases[name]['p95_ms']:9.2f} ms")
+        return {"rows": counts, "cases": cases}
+    finally:
+        db.close()
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float,
+            floor_ms: float) -> List[str]:
+    """Cases whose median got slower than the baseline by both margins."""
+    flagged = []
+    for scale, current in results["scales"].items():
+        old_cases = baseline.get("scales", {}).get(scale, {}).get("cases", {})
+        for name, now in current["cases"].items():
+            old = old_cases.get(name)
+            if old and now["p50_ms"] > old["p50_ms"] * (1 + tolerance) \
+                    and now["p50_ms"] - old["p50_ms"] >= floor_ms:
+                flagged.append(f"{scale} {name}: p50 {old['p50_ms']:.2f} -> {now['p50_ms']:.2f} ms "
+                               f"(+{(now['p50_ms'] / old['p50_ms'] - 1) * 100:.0f}%)")
+    return flagged
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the model functions at several scales")
+    parser.add_argument("--scales", nargs="+", default=["10k", "100k"], choices=list(datagen.SCALES))
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--only", nargs="*", default=[], help="case name prefixes, e.g. patient. reports.")
+    parser.add_argument("--out", help="result file (default bench/results/<timestamp>.json)")
+    parser.add_argument("--baseline", help="earlier result file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown, 0.25 = 25%%")
+    parser.add_argument("--floor-ms", type=float, default=1.0, help="ignore slowdowns smaller than this")
+    args = parser.parse_args()
+
+    missing = uncovered()
+    if missing:
+        print("⚠️ no benchmark case for: " + ", ".join(missing))
+    results = {"created": datetime.now().isoformat(timespec="seconds"), "seed": args.seed,
+               "python": platform.python_version(), "host": platform.node(),
+               "scales": {scale: run_scale(scale, args.seed, args.only) for scale in args.scales}}
+    out = args.out or os.path.join(RESULTS_DIR, f"{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as fh:
+        json.dump(results, fh, indent=2)
+    print(f"results written to {out}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as fh:
+            flagged = compare(results, json.load(fh), args.tolerance, args.floor_ms)
+        for line in flagged:
+            print(f"❌ regression {line}")
+        if flagged:
+            sys.exit(1)
+        print("✅ no regressions against the baseline")
+
+if __name__ == "__main__":
+    main()
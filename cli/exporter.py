@@ -0,0 +1,205 @@
+"""
+Bulk export – stream tables or the appointment join to CSV / NDJSON / Parquet
+"""
+import csv
+import gzip
+import io
+import json
+import os
+import sys
+import time
+from datetime import date, datetime, timedelta
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from models import patient as pat, doctor as doc, appointment as app
+from models.database import Database, replica_read
+
+BATCH_SIZE = 5000       # rows pulled per round trip and written per chunk
+PROGRESS_EVERY = 100_000
+
+# column -> Parquet type; the order is the output column order
+Columns = List[Tuple[str, str]]
+
+_PATIENT_COLS: Columns = [("patient_id", "int32"), ("full_name", "string"), ("date_of_birth", "date32"),
+                          ("gender", "string"), ("address", "string"), ("phone_number", "string"),
+                          ("email", "string")]
+_DOCTOR_COLS: Columns = [("doctor_id", "int32"), ("full_name", "string"), ("specialization", "string"),
+                         ("phone_number", "string"), ("email", "string"), ("year_of_experience", "int32")]
+_APPT_COLS: Columns = [("appointment_id", "int32"), ("patient_id", "int32"), ("doctor_id", "int32"),
+                       ("appointment_date", "date32"), ("start_time", "string"), ("end_time", "string"),
+                       ("reason", "string"), ("status", "string")]
+_VISIT_COLS: Columns = _APPT_COLS + [("patient_name", "string"), ("doctor_name", "string"),
+                                     ("specialization", "string")]
+
+def _select(source: str, cols: Columns, exprs: Optional[Dict[str, str]] = None) -> str:
+    """SELECT the columns (qualified by the first alias unless given in `exprs`) from `source`."""
+    alias = source.split()[1]
+    exprs = exprs or {}
+    picked = [f"{exprs[c]} AS {c}" if c in exprs else f"{alias}.{c}" for c, _ in cols]
+    return f"SELECT {', '.join(picked)} FROM {source}"
+
+def _visits(table: str) -> str:
+    # doctors can be deleted (doctor_id SET NULL), hence the outer joins
+    return _select(f"""{table} a
+                      LEFT JOIN {app.PATIENT_TABLE} p ON a.patient_id=p.patient_id
+                      LEFT JOIN {app.DOCTOR_TABLE} d ON a.doctor_id=d.doctor_id""",
+                   _VISIT_COLS, {"patient_name": "p.full_name", "doctor_name": "d.full_name",
+                                 "specialization": "d.specialization"})
+
+# kind -> (SELECT, columns, accepts appointment filters)
+SOURCES: Dict[str, Tuple[str, Columns, bool]] = {
+    "patients": (_select(f"{pat.TABLE} p", _PATIENT_COLS), _PATIENT_COLS, False),
+    "doctors": (_select(f"{doc.TABLE} d", _DOCTOR_COLS), _DOCTOR_COLS, False),
+    "appointments": (_select(f"{app.TABLE} a", _APPT_COLS), _APPT_COLS, True),
+    "visits": (_visits(app.TABLE), _VISIT_COLS, True),
+}
+# kind -> the same SELECT over the rows models.archive moved out
+HISTORY_SOURCES: Dict[str, str] = {
+    "appointments": _select(f"{app.HISTORY_TABLE} a", _APPT_COLS),
+    "visits": _visits(app.HISTORY_TABLE),
+}
+
+def build_query(kind: str, *, since: Optional[date] = None, until: Optional[date] = None,
+                doctor_id: Optional[int] = None, status: Optional[str] = None,
+                include_history: bool = False) -> Tuple[str, tuple]:
+    """SELECT and params for `kind`; the filters apply to appointment kinds
+    only. include_history adds the archived appointments with UNION ALL,
+    filtered the same way."""
+    sql, _, filterable = SOURCES[kind]
+    where, params = [], []
+    for clause, value in (("a.appointment_date >= %s", since), ("a.appointment_date <= %s", until),
+                          ("a.doctor_id = %s", doctor_id), ("a.status = %s", status)):
+        if value is not None:
+            where.append(clause)
+            params.append(value)
+    if where and not filterable:
+        raise ValueError(f"{kind} cannot be filtered by date, doctor or status")
+    if include_history and kind not in HISTORY_SOURCES:
+        raise ValueError(f"{kind} have no archived history")
+    where_sql = " WHERE " + " AND ".join(where) if where else ""
+    sql += where_sql
+    if include_history:
+        sql += f" UNION ALL {HISTORY_SOURCES[kind]}{where_sql}"
+        params += params
+    return sql, tuple(params)
+
+# ------------------------------ writers ------------------------------- #
+def _plain(value: Any) -> Any:
+    """TIME columns arrive as timedelta; render them and dates as text."""
+    if isinstance(value, timedelta):
+        secs = int(value.total_seconds())
+        return f"{secs // 3600:02d}:{secs // 60 % 60:02d}:{secs % 60:02d}"
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+def _open_text(path: str):
+    if path == "-":
+        return io.TextIOWrapper(sys.stdout.buffer, encoding="utf-8", newline="")
+    if path.endswith(".gz"):
+        return gzip.open(path, "wt", encoding="utf-8", newline="", compresslevel=6)
+    return open(path, "w", encoding="utf-8", newline="")
+
+class _TextWriter:
+    def __init__(self, path: str, cols: Columns):
+        self.path = path
+        self.fh = _open_text(path)
+        self.names = [c for c, _ in cols]
+
+    def close(self):
+        if self.path == "-":
+            self.fh.flush()
+            self.fh.detach()  # leave sys.stdout open
+        else:
+            self.fh.close()
+
+class _CsvWriter(_TextWriter):
+    def __init__(self, path: str, cols: Columns):
+        super().__init__(path, cols)
+        self.out = csv.writer(self.fh)
+        self.out.writerow(self.names)
+
+    def write(self, rows: List[Dict[str, Any]]):
+        self.out.writerows([_plain(r[c]) for c in self.names] for r in rows)
+
+class _NdjsonWriter(_TextWriter):
+    def write(self, rows: List[Dict[str, Any]]):
+        self.fh.write("".join(json.dumps({c: _plain(r[c]) for c in self.names}, ensure_ascii=False) + "\n"
+                              for r in rows))
+
+class _ParquetWriter:
+    """One row group per chunk, zstd-compressed; needs the optional pyarrow."""
+    def __init__(self, path: str, cols: Columns):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("Parquet export needs pyarrow (pip install pyarrow)") from None
+        if path == "-":
+            raise ValueError("Parquet cannot be written to stdout")
+        self.pa = pa
+        self.names = [c for c, _ in cols]
+        self.schema = pa.schema([(c, getattr(pa, t)()) for c, t in cols])
+        self.out = pq.ParquetWriter(path, self.schema, compression="zstd")
+
+    def write(self, rows: List[Dict[str, Any]]):
+        # dates stay dates (date32); only TIME values need converting
+        columns = {c: [_plain(v) if isinstance(v, timedelta) else v for v in (r[c] for r in rows)]
+                   for c in self.names}
+        self.out.write_table(self.pa.Table.from_pydict(columns, schema=self.schema))
+
+    def close(self):
+        self.out.close()
+
+WRITERS = {"csv": _CsvWriter, "ndjson": _NdjsonWriter, "parquet": _ParquetWriter}
+
+def guess_format(path: str) -> str:
+    name = path[:-3] if path.endswith(".gz") else path
+    if name.endswith(".parquet"):
+        return "parquet"
+    return "ndjson" if name.endswith((".ndjson", ".jsonl")) else "csv"
+
+# ------------------------------- driver ------------------------------- #
+def _chunks(rows: Iterable[Dict[str, Any]], size: int) -> Iterable[List[Dict[str, Any]]]:
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+@replica_read
+def export(db: Database, kind: str, path: str, *, fmt: Optional[str] = None,
+           since: Optional[date] = None, until: Optional[date] = None,
+           doctor_id: Optional[int] = None, status: Optional[str] = None, include_history: bool = False,
+           batch_size: int = BATCH_SIZE, echo: Callable[[str], None] = print) -> Dict[str, Any]:
+    """Write every `kind` row matching the filters to `path` ('-' = stdout).
+
+    Rows come off an unbuffered server-side cursor `batch_size` at a time
+    and each chunk is written before the next is read, so memory holds one
+    chunk whatever the row count; with replicas configured they serve it.
+    A `.gz` suffix gzips CSV / NDJSON. Archived appointments (see
+    models.archive) are only included with include_history=True.
+    Rows are in no particular order.
+    """
+    sql, params = build_query(kind, since=since, until=until, doctor_id=doctor_id, status=status,
+                              include_history=include_history)
+    writer = WRITERS[fmt or guess_format(path)](path, SOURCES[kind][1])
+    stats = {"rows": 0, "seconds": 0.0, "bytes": 0}
+    rows = db.stream(sql, params, fetch_size=batch_size)
+    start = time.perf_counter()
+    try:
+        for chunk in _chunks(rows, batch_size):
+            writer.write(chunk)
+            before = stats["rows"]
+            stats["rows"] += len(chunk)
+            if stats["rows"] // PROGRESS_EVERY > before // PROGRESS_EVERY:
+                elapsed = time.perf_counter() - start
+                echo(f"  {stats['rows']:>12,} rows  {stats['rows'] / elapsed:>10,.0f} rows/s")
+    finally:
+        rows.close()  # releases the connection even if a write failed
+        writer.close()
+    stats["seconds"] = time.perf_counter() - start
+    if path != "-":
+        stats["bytes"] = os.path.getsize(path)
+    return stats
@@ -0,0 +1,227 @@
+
+"""
+Bulk import – stream CSV / NDJSON files into the database in batches
+"""
+import csv
+import hashlib
+import json
+import os
+import time
+from itertools import islice
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from models import patient as pat, doctor as doc, appointment as app
+from models.availability import DAY_MINUTES, DEFAULT_DURATION, minutes
+from models.database import Database
+from utils.enums import Gender, Status
+from utils import validators as val
+
+BATCH_SIZE = 1000
+
+# ------------------------------ readers ------------------------------- #
+def read_rows(path: str, fmt: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """Yield one dict per record without loading the file."""
+    fmt = fmt or ("ndjson" if path.endswith((".ndjson", ".jsonl")) else "csv")
+    with open(path, newline="", encoding="utf-8") as fh:
+        if fmt == "csv":
+            yield from csv.DictReader(fh)
+        else:
+            for line in fh:
+                if line.strip():
+                    yield json.loads(line)
+
+# ----------------------------- validation ----------------------------- #
+def _contact_errors(row: Dict[str, Any]) -> List[str]:
+    errors = []
+    if row.get("phone_number") and not val.validate_phone(row["phone_number"]):
+        errors.append("invalid phone_number")
+    if row.get("email") and not val.validate_email(row["email"]):
+        errors.append("invalid email")
+    return errors
+
+def _clean_patient(row):
+    data = {f: (row.get(f) or "").strip() for f in
+            ("full_name", "date_of_birth", "gender", "address", "phone_number", "email")}
+    data["gender"] = data["gender"].title()
+    errors = _contact_errors(data)
+    if not data["full_name"]:
+        errors.append("missing full_name")
+    if not val.valid_date(data["date_of_birth"]):
+        errors.append("invalid date_of_birth")
+    if data["gender"] not in Gender.__members__:
+        errors.append("invalid gender")
+    return data, errors
+
+def _clean_doctor(row):
+    data = {f: (row.get(f) or "").strip() for f in
+            ("full_name", "specialization", "phone_number", "email")}
+    errors = _contact_errors(data)
+    if not data["full_name"]:
+        errors.append("missing full_name")
+    try:
+        data["year_of_experience"] = int(row.get("year_of_experience") or 0)
+    except ValueError:
+        errors.append("invalid year_of_experience")
+    return data, errors
+
+def _clean_appointment(row):
+    data = {"appointment_date": str(row.get("appointment_date") or "").strip(),
+            "reason": (row.get("reason") or "").strip(),
+            "status": (row.get("status") or "Pending").strip().title()}
+    errors = []
+    for field in ("patient_id", "doctor_id"):
+        try:
+            data[field] = int(row.get(field))
+        except (TypeError, ValueError):
+            errors.append(f"invalid {field}")
+    # historical data is allowed, so only the format is checked here
+    if not val.valid_date(data["appointment_date"]):
+        errors.append("invalid appointment_date")
+    if data["status"] not in Status.__members__:
+        errors.append("invalid status")
+    for field in ("start_time", "end_time"):
+        value = str(row.get(field) or "").strip()
+        if value and not val.valid_time(value):
+            errors.append(f"invalid {field}")
+        data[field] = value or None
+    start, end = data["start_time"], data["end_time"]
+    if end and not start:
+        errors.append("end_time without start_time")
+    elif start and end and val.valid_time(start) and val.valid_time(end) and minutes(end) <= minutes(start):
+        errors.append("end_time must be after start_time")
+    elif start and not end and val.valid_time(start) and minutes(start) + DEFAULT_DURATION > DAY_MINUTES:
+        errors.append("start_time too late for the default length")
+    return data, errors
+
+def _duplicates(conflicts: Callable) -> Callable:
+    """Identity clashes with stored rows as reject errors."""
+    def errors(db: Database, rows: List[Dict[str, Any]]) -> Dict[int, List[str]]:
+        return {i: [f"duplicate {label}" for label in labels] for i, labels in conflicts(db, rows).items()}
+    return errors
+
+def _appointment_errors(db: Database, rows: List[Dict[str, Any]]) -> Dict[int, List[str]]:
+    """Rows whose patient or doctor does not exist (one IN lookup per
+    table, rows share-locked until the insert commits, so one bad id no
+    longer fails the whole INSERT), then booking_errors for the rest."""
+    errors: Dict[int, List[str]] = {}
+    for table, col in ((app.PATIENT_TABLE, "patient_id"), (app.DOCTOR_TABLE, "doctor_id")):
+        ids = sorted({r[col] for r in rows})
+        found = {r[col] for r in db.execute(f"""SELECT {col} FROM {table} WHERE {col} IN
+                                              ({', '.join(['%s'] * len(ids))}) LOCK IN SHARE MODE""",
+                                            tuple(ids), fetch=True)}
+        for i, r in enumerate(rows):
+            if r[col] not in found:
+                errors.setdefault(i, []).append(f"no {col[:-3]} with id {r[col]}")
+    ok = [i for i in range(len(rows)) if i not in errors]
+    for k, message in app.booking_errors(db, [rows[i] for i in ok]).items():
+        errors[ok[k]] = [message]
+    return errors
+
+# kind -> (clean, insert, errors against stored rows); the last one runs
+# in the batch's transaction
+KINDS: Dict[str, Tuple[Callable, Callable, Callable]] = {
+    "patients": (_clean_patient, pat.add_patients, _duplicates(pat.conflicts)),
+    "doctors": (_clean_doctor, doc.add_doctors, _duplicates(doc.conflicts)),
+    "appointments": (_clean_appointment, app.add_appointments, _appointment_errors),
+}
+
+# ----------------------------- checkpoint ----------------------------- #
+# rows consumed per (file, kind), committed together with each batch so a
+# crash can never leave a batch inserted but not recorded
+CHECKPOINT_TABLE = "import_checkpoints"
+
+def create_table(db: Database):
+    db.execute(f"""
+    CREATE TABLE IF NOT EXISTS {CHECKPOINT_TABLE}(
+        source_key CHAR(40) PRIMARY KEY,
+        source     VARCHAR(1024) NOT NULL,
+        kind       VARCHAR(20) NOT NULL,
+        rows_done  BIGINT NOT NULL,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+    )
+    """)
+
+def _source_key(path: str, kind: str) -> str:
+    return hashlib.sha1(f"{kind}:{os.path.abspath(path)}".encode()).hexdigest()
+
+def _load_checkpoint(db: Database, key: str) -> int:
+    rows = db.execute(f"SELECT rows_done FROM {CHECKPOINT_TABLE} WHERE source_key=%s", (key,), fetch=True)
+    return int(rows[0]["rows_done"]) if rows else 0
+
+def _save_checkpoint(db: Database, key: str, path: str, kind: str, rows: int):
+    db.execute(f"""INSERT INTO {CHECKPOINT_TABLE} (source_key, source, kind, rows_done) VALUES (%s, %s, %s, %s)
+                  ON DUPLICATE KEY UPDATE rows_done=VALUES(rows_done)""",
+               (key, os.path.abspath(path), kind, rows))
+
+def _trim_rejects(path: str, done: int):
+    """Drop rejects past the checkpoint; their batch was never committed
+    and is about to be read again."""
+    if not os.path.exists(path):
+        return
+    tmp = path + ".tmp"
+    with open(path, encoding="utf-8") as src, open(tmp, "w", encoding="utf-8") as dst:
+        for line in src:
+            try:
+                if json.loads(line)["row"] <= done:
+                    dst.write(line)
+            except (ValueError, KeyError):
+                pass  # a line cut short by the crash
+    os.replace(tmp, path)
+
+# ------------------------------- driver ------------------------------- #
+def import_file(db: Database, kind: str, path: str, *, fmt: Optional[str] = None,
+                batch_size: int = BATCH_SIZE, resume: bool = True,
+                echo: Callable[[str], None] = print) -> Dict[str, Any]:
+    """Import `path` into the `kind` table.
+
+    Every batch is validated, written with one multi-row INSERT and
+    committed once, together with the number of input rows consumed
+    (CHECKPOINT_TABLE), so a rerun after a failure skips exactly what was
+    committed. Rejected rows – invalid, or clashing with an existing
+    record's identity keys, or future bookings clashing with the doctor's
+    hours or other bookings – are appended to `<path>.rejects` with their
+    errors.
+    """
+    clean, insert, stored_errors = KINDS[kind]
+    rejects_path, key = path + ".rejects", _source_key(path, kind)
+    create_table(db)
+    done = _load_checkpoint(db, key) if resume else 0
+    if done:
+        echo(f"Resuming after row {done}")
+        _trim_rejects(rejects_path, done)
+    elif os.path.exists(rejects_path):
+        os.remove(rejects_path)
+    rows = islice(read_rows(path, fmt), done, None)
+    stats = {"inserted": 0, "rejected": 0, "seconds": 0.0}
+    start = time.perf_counter()
+    with open(rejects_path, "a", encoding="utf-8") as rejects:
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                break
+            good, good_rows = [], []
+            for offset, raw in enumerate(batch, start=done + 1):
+                data, errors = clean(raw)
+                if errors:
+                    rejects.write(json.dumps({"row": offset, "errors": errors, "data": raw}) + "\n")
+                    stats["rejected"] += 1
+                else:
+                    good.append(data)
+                    good_rows.append((offset, raw))
+            with db.transaction():
+                failed = stored_errors(db, good) if good else {}
+                for i in sorted(failed):
+                    offset, raw = good_rows[i]
+                    rejects.write(json.dumps({"row": offset, "errors": failed[i], "data": raw}) + "\n")
+                stats["rejected"] += len(failed)
+                good = [d for i, d in enumerate(good) if i not in failed]
+                insert(db, good)
+                _save_checkpoint(db, key, path, kind, done + len(batch))
+            done += len(batch)
+            stats["inserted"] += len(good)
+            elapsed = time.perf_counter() - start
+            echo(f"  {done:>10,} rows read  {stats['inserted'] / elapsed:>10,.0f} rows/s")
+    stats["seconds"] = time.perf_counter() - start
+    db.execute(f"DELETE FROM {CHECKPOINT_TABLE} WHERE source_key=%s", (key,))
+    if not stats["rejected"] and os.path.exists(rejects_path) and not os.path.getsize(rejects_path):
+        os.remove(rejects_path)
+    return stats
@@ -2,31 +2,94 @@
 """
 Menu system – Home & submenus
 """
-from tabulate import tabulate
-from datetime import datetime
-from typing import Any, Dict, List
-from models import patient as pat, doctor as doc, appointment as app
+import re
+from contextlib import nullcontext
+from datetime import date, datetime
+from functools import partial
+from typing import Any, Callable, Dict, Iterator, List
+from models import patient as pat, doctor as doc, appointment as app, migrations
+from models import availability as avail, reports as rep
 from utils.enums import Gender, Status
 from utils import validators as val
-from models.database import Database
+from models.database import Database, DuplicateError
+from models.paging import PAGE_SIZE
+from cli import render
+
+STREAM_CHUNK = 1000  # rows per keyset query when streaming a whole listing
 
 class Menu:
     def __init__(self, db: Database):
         self.db = db
-        # make tables
-        pat.create_table(db)
-        doc.create_table(db)
-        app.create_table(db)
+        self._widths: Dict[str, Dict[str, int]] = {}  # table -> declared column lengths
+        # make tables and apply pending migrations
+        migrations.ensure_schema(db)
 
     # ------------------------------ utils ----------------------------- #
     @staticmethod
     def _print(rows: List[Dict[str, Any]], title: str = ""):
-        if rows:
-            if title:
-                print(f"\n{title}")
-            print(tabulate(rows, headers="keys", tablefmt="pretty"))
-        else:
-            print("No data found.")
+        if rows and title:
+            print(f"\n{title}")
+        # small results keep tabulate's output; big ones stream through a pager
+        render.show(rows)
+
+    def _action(self, menu: str, ch: str):
+        """Time the chosen menu entry (wall and SQL time) in db.metrics."""
+        title = re.search(r"=+ (.+?) Menu =+", menu)
+        entry = re.search(rf"\t{re.escape(ch)}\. (.+)", menu) if ch else None
+        if not entry or entry.group(1).startswith("Back"):
+            return nullcontext()
+        return self.db.metrics.action(f"{title.group(1)}: {entry.group(1)}")
+
+    @staticmethod
+    def _ask_date(prompt: str, default: date = None) -> date:
+        """Prompt until a valid YYYY-MM-DD is typed; blank gives `default` if set."""
+        while True:
+            text = input(f"{prompt} (YYYY-MM-DD){f' [{default}]' if default else ''}: ").strip()
+            if not text and default:
+                return default
+            day = val.valid_date(text)
+            if day:
+                return day
+            print("⚠️ Invalid date, use YYYY-MM-DD.")
+
+    @staticmethod
+    def _with_history() -> bool:
+        return input("Include archived history? [y/N]: ").strip().lower() == "y"
+
+    @staticmethod
+    def _rest(fetch: Callable[..., List[Dict[str, Any]]], after) -> Iterator[Dict[str, Any]]:
+        """Every row after `after`, fetched in keyset chunks so memory stays flat."""
+        while True:
+            rows = fetch(after=after, limit=STREAM_CHUNK)
+            yield from rows
+            if len(rows) < STREAM_CHUNK:
+                return
+            after = rows[-1]
+
+    def _paged(self, fetch: Callable[..., List[Dict[str, Any]]], table: str):
+        """Page through fetch(after=..., limit=...) with next/previous,
+        or stream everything from the current page on, with columns sized
+        from `table`'s declared lengths."""
+        starts = [None]  # the `after` row that produced each visited page
+        while True:
+            rows = fetch(after=starts[-1], limit=PAGE_SIZE + 1)
+            has_next = len(rows) > PAGE_SIZE
+            rows = rows[:PAGE_SIZE]
+            self._print(rows)
+            if not has_next and len(starts) == 1:
+                return
+            nav = input(f"Page {len(starts)} – [n]ext, [p]revious, [a]ll, Enter to stop » ").strip().lower()
+            if nav == "a":
+                if table not in self._widths:
+                    self._widths[table] = render.schema_widths(self.db, table)
+                render.show(self._rest(fetch, starts[-1]), hints=self._widths[table])
+                return
+            if nav == "n" and has_next:
+                starts.append(rows[-1])
+            elif nav == "p" and len(starts) > 1:
+                starts.pop()
+            elif nav in ("", "q"):
+                return
 
     # ------------------------------ flows ----------------------------- #
     def home(self):
@@ -35,14 +98,18 @@ class Menu:
 \t1. View Doctors
 \t2. View Patients
 \t3. View Appointments
-\t4. Exit
+\t4. Reports
+\t5. Query statistics
+\t6. Exit
 ====================================================================""")
             choice = input("Select » ").strip()
             match choice:
                 case "1": self.doctors_menu()
                 case "2": self.patients_menu()
                 case "3": self.appointments_menu()
-                case "4":
+                case "4": self.reports_menu()
+                case "5": print("\n" + self.db.metrics.report())
+                case "6":
                     print("\n👋 Thank you for using the Hospital Management System!")
                     break
                 case _: print("⚠️ Invalid choice. Please enter a number between 1-8.")
@@ -50,7 +117,7 @@ class Menu:
     # ------------------- Doctors ------------------------------------- #
     def doctors_menu(self):
         while True:
-            print("""\n==================== Doctors Menu ====================
+            menu = """\n==================== Doctors Menu ====================
 \t1. Add new doctor
 \t2. Search doctor by Id
 \t3. Search doctor by name
@@ -58,40 +125,45 @@ class Menu:
 \t5. Sort doctors by name (DESC)
 \t6. Sort doctors by experience (ASC)
 \t7. Sort doctors by experience (DESC)
-\t8. Back to Home
-======================================================""")
+\t8. Set working hours
+\t9. Back to Home
+======================================================"""
+            print(menu)
             ch = input("Select » ").strip()
-            if ch == "1":
-                self._add_doctor()
-            elif ch == "2":
-                did = int(input("Doctor ID: "))
-                print(f'\n👩‍⚕️ Doctors with id of \"{did}\"')
-                self._print(doc.search_by_id(self.db, did))
-            elif ch == "3":
-                name = input("Name contains: ")
-                print(f'\n👩‍⚕️ Doctors with name of \"{name}\"')
-                self._print(doc.search_by_name(self.db, name))
-            elif ch == "4":
-                print(f'\n👩‍⚕️ Doctors (names sorted ASC)')
-                self._print(doc.list_all(self.db, 'ASC'))
-            elif ch == "5":
-                print(f'\n👩‍⚕️ Doctors (names sorted DESC)')
-                self._print(doc.list_all(self.db, 'DESC'))
-            elif ch == "6":
-                print(f'\n👩‍⚕️ Doctors (experience sorted ASC)')
-                self._print(doc.sort_by_experience(self.db, 'ASC'))
-            elif ch == "7":
-                print(f'\n👩‍⚕️ Doctors (experience sorted DESC)')
-                self._print(doc.sort_by_experience(self.db, 'DESC'))
-            elif ch == "8":
-                break
-            else:
-                print("Invalid choice")
+            with self._action(menu, ch):
+                if ch == "1":
+                    self._add_doctor()
+                elif ch == "2":
+                    did = int(input("Doctor ID: "))
+                    print(f'\n👩‍⚕️ Doctors with id of \"{did}\"')
+                    self._print(doc.search_by_id(self.db, did))
+                elif ch == "3":
+                    name = input("Name (typos/accents OK): ")
+                    print(f'\n👩‍⚕️ Doctors with name of \"{name}\"')
+                    self._print(doc.search_by_name(self.db, name))
+                elif ch == "4":
+                    print(f'\n👩‍⚕️ Doctors (names sorted ASC)')
+                    self._paged(partial(doc.list_all, self.db, 'ASC'), doc.TABLE)
+                elif ch == "5":
+                    print(f'\n👩‍⚕️ Doctors (names sorted DESC)')
+                    self._paged(partial(doc.list_all, self.db, 'DESC'), doc.TABLE)
+                elif ch == "6":
+                    print(f'\n👩‍⚕️ Doctors (experience sorted ASC)')
+                    self._paged(partial(doc.sort_by_experience, self.db, 'ASC'), doc.TABLE)
+                elif ch == "7":
+                    print(f'\n👩‍⚕️ Doctors (experience sorted DESC)')
+                    self._paged(partial(doc.sort_by_experience, self.db, 'DESC'), doc.TABLE)
+                elif ch == "8":
+                    self._set_hours()
+                elif ch == "9":
+                    break
+                else:
+                    print("Invalid choice")
 
     # ------------------- Patients ------------------------------------ #
     def patients_menu(self):
         while True:
-            print("""\n==================== Patients Menu ====================
+            menu = """\n==================== Patients Menu ====================
 \t1. Add new patient
 \t2. Search patient by Id
 \t3. Search patient by name
@@ -100,39 +172,39 @@ class Menu:
 \t6. Sort patients by DOB (ASC)
 \t7. Sort patients by DOB (DESC)
 \t8. Back to Home
-=======================================================""")
+======================================================="""
+            print(menu)
             
             ch = input("Select » ").strip()
-            if ch == "1": self._add_patient()
-            elif ch == "2":
-                pid = int(input("Patient ID: "))
-                print(f'\n👳‍♂️ Patient with id of \"{pid}\"')
-                self._print(pat.search_by_id(self.db, pid))
-            elif ch == "3":
-                name = input("Name contains: ")
-                print(f'\n👳‍♂️ Patients with name of \"{name}\"')
-                self._print(pat.search_by_name(self.db, name))
-            elif ch == "4":
-                print(f'\n👳‍♂️ Patients (names sorted ASC)')
-                self._print(pat.list_all(self.db, 'ASC'))
-            elif ch == "5":
-                print(f'\n👳‍♂️ Patients (names sorted DESC)')
-                self._print(pat.list_all(self.db, 'DESC'))
-            elif ch == "6":
-                rows = self.db.execute(f"SELECT * FROM {pat.TABLE} ORDER BY date_of_birth ASC", fetch=True)
-                print(f'\n👳‍♂️ Patients (DOB sorted ASC)')
-                self._print(rows)
-            elif ch == "7":
-                rows = self.db.execute(f"SELECT * FROM {pat.TABLE} ORDER BY date_of_birth DESC", fetch=True)
-                print(f'\n👳‍♂️ Patients (DOB sorted DESC)')
-                self._print(rows)
-            elif ch == "8": break
-            else: print("Invalid choice")
+            with self._action(menu, ch):
+                if ch == "1": self._add_patient()
+                elif ch == "2":
+                    pid = int(input("Patient ID: "))
+                    print(f'\n👳‍♂️ Patient with id of \"{pid}\"')
+                    self._print(pat.search_by_id(self.db, pid))
+                elif ch == "3":
+                    name = input("Name (typos/accents OK): ")
+                    print(f'\n👳‍♂️ Patients with name of \"{name}\"')
+                    self._print(pat.search_by_name(self.db, name))
+                elif ch == "4":
+                    print(f'\n👳‍♂️ Patients (names sorted ASC)')
+                    self._paged(partial(pat.list_all, self.db, 'ASC'), pat.TABLE)
+                elif ch == "5":
+                    print(f'\n👳‍♂️ Patients (names sorted DESC)')
+                    self._paged(partial(pat.list_all, self.db, 'DESC'), pat.TABLE)
+                elif ch == "6":
+                    print(f'\n👳‍♂️ Patients (DOB sorted ASC)')
+                    self._paged(partial(pat.sort_by_dob, self.db, 'ASC'), pat.TABLE)
+                elif ch == "7":
+                    print(f'\n👳‍♂️ Patients (DOB sorted DESC)')
+                    self._paged(partial(pat.sort_by_dob, self.db, 'DESC'), pat.TABLE)
+                elif ch == "8": break
+                else: print("Invalid choice")
 
     # ------------------- Appointments -------------------------------- #
     def appointments_menu(self):
         while True:
-            print("""\n==================== Appointments Menu ====================
+            menu = """\n==================== Appointments Menu ====================
 \t1. Add new appointment
 \t2. Search appointment by ID
 \t3. Search appointments by Patient ID
@@ -141,42 +213,89 @@ class Menu:
 \t6. Sort appointments by date (ASC)
 \t7. Sort appointments by date (DESC)
 \t8. Update appointment
-\t9. Back to Home
-===========================================================""")
+\t9. Find next free slot by specialization
+\t10. Close out a day (Pending -> Done/Cancelled)
+\t11. Reassign a doctor's appointments
+\t12. Book a recurring series
+\t13. Back to Home
+==========================================================="""
+            print(menu)
             
             ch = input("Select » ").strip()
-            if ch == "1": self._add_appointment()
-            elif ch == "2":
-                aid = int(input("Appointment ID: "))
-                print(f'\n📅 Appointment with id of \"{aid}\"')
-                self._print(app.search_by_id(self.db, aid))
-            elif ch == "3":
-                pid = int(input("Patient ID: "))
-                print(f'\n📅 Appointment with Patient ID of \"{pid}\"')
-                self._print(app.search_by_patient(self.db, pid))
-            elif ch == "4":
-                did = int(input("Doctor ID: "))
-                print(f'\n📅 Appointment with Doctor ID of \"{did}\"')
-                self._print(app.search_by_doctor(self.db, did))
-            elif ch == "5":
-                print(f'\n📅 Appointment for Today')
-                self._print(app.list_today(self.db))
-            elif ch == "6":
-                print(f'\n📅 Appointments (date sorted ASC)')
-                self._print(app.list_all(self.db, 'ASC'))
-            elif ch == "7":
-                print(f'\n📅 Appointments (date sorted DESC)')
-                self._print(app.list_all(self.db, 'DESC'))
-            elif ch == "8":
-                self._update_appointment()
-            elif ch == "9": break
-            else: print("Invalid choice")
+            with self._action(menu, ch):
+                if ch == "1": self._add_appointment()
+                elif ch == "2":
+                    aid = int(input("Appointment ID: "))
+                    history = self._with_history()
+                    print(f'\n📅 Appointment with id of \"{aid}\"')
+                    self._print(app.search_by_id(self.db, aid, include_history=history))
+                elif ch == "3":
+                    pid = int(input("Patient ID: "))
+                    history = self._with_history()
+                    print(f'\n📅 Appointment with Patient ID of \"{pid}\"')
+                    self._paged(partial(app.search_by_patient, self.db, pid, include_history=history), app.TABLE)
+                elif ch == "4":
+                    did = int(input("Doctor ID: "))
+                    history = self._with_history()
+                    print(f'\n📅 Appointment with Doctor ID of \"{did}\"')
+                    self._paged(partial(app.search_by_doctor, self.db, did, include_history=history), app.TABLE)
+                elif ch == "5":
+                    print(f'\n📅 Appointment for Today')
+                    self._paged(partial(app.list_today, self.db), app.TABLE)
+                elif ch == "6":
+                    print(f'\n📅 Appointments (date sorted ASC)')
+                    self._paged(partial(app.list_all, self.db, 'ASC'), app.TABLE)
+                elif ch == "7":
+                    print(f'\n📅 Appointments (date sorted DESC)')
+                    self._paged(partial(app.list_all, self.db, 'DESC'), app.TABLE)
+                elif ch == "8":
+                    self._update_appointment()
+                elif ch == "9": self._next_free_slot()
+                elif ch == "10": self._close_day()
+                elif ch == "11": self._reassign()
+                elif ch == "12": self._add_series()
+                elif ch == "13": break
+                else: print("Invalid choice")
+
+    # ------------------- Reports ------------------------------------- #
+    def reports_menu(self):
+        while True:
+            menu = """\n==================== Reports Menu ====================
+\t1. Appointments per doctor for a day
+\t2. Appointments per specialization for a month
+\t3. Appointments per month for a year
+\t4. Status breakdown (all time)
+\t5. Back to Home
+======================================================"""
+            print(menu)
+
+            ch = input("Select » ").strip()
+            with self._action(menu, ch):
+                if ch == "1":
+                    day = val.valid_date(input("Date (YYYY-MM-DD) [today]: ").strip() or str(date.today()))
+                    if not day:
+                        print("Invalid date"); continue
+                    print(f'\n📊 Appointments per doctor on {day}')
+                    self._print(rep.doctor_day(self.db, day))
+                elif ch == "2":
+                    month = val.valid_date((input("Month (YYYY-MM) [this month]: ").strip()
+                                            or date.today().strftime("%Y-%m")) + "-01")
+                    if not month:
+                        print("Invalid month"); continue
+                    print(f'\n📊 Appointments per specialization in {month:%Y-%m}')
+                    self._print(rep.specialization_month(self.db, month))
+                elif ch == "3":
+                    year = int(input(f"Year [{date.today().year}]: ") or date.today().year)
+                    print(f'\n📊 Appointments per month in {year}')
+                    self._print(rep.monthly(self.db, year))
+                elif ch == "4":
+                    print('\n📊 Appointments by status')
+                    self._print(rep.status_breakdown(self.db))
+                elif ch == "5": break
+                else: print("Invalid choice")
 
     # ===================== helpers to add ============================ #
     def _add_doctor(self):
-        existing = doc.existing_names(self.db)
-        if existing:
-            print("Existing doctors:", ', '.join(existing))
         data = {
             'full_name': input("Full name: ").strip(),
             'specialization': input("Specialization: ").strip(),
@@ -184,16 +303,14 @@ class Menu:
             'email': input("Email: ").strip(),
             'year_of_experience': int(input("Years of experience: ") or 0)
         }
-        if data['full_name'] in existing:
-            print("Doctor already exists!")
+        try:
+            doc.add_doctor(self.db, data)
+        except DuplicateError as err:
+            print(f"Doctor already exists (same {doc.IDENTITY.get(err.key, (err.key,))[0]})!")
             return
-        doc.add_doctor(self.db, data)
         print("✅ Doctor added successfully!\n")
 
     def _add_patient(self):
-        existing = pat.existing_names(self.db)
-        if existing:
-            print("Existing patients:", ', '.join(existing))
         data = {
             'full_name': input("Full name: ").strip(),
             'date_of_birth': input("DOB (YYYY-MM-DD): ").strip(),
@@ -202,35 +319,46 @@ class Menu:
             'phone_number': input("Phone: ").strip(),
             'email': input("Email: ").strip(),
         }
-        if data['full_name'] in existing:
-            print("Patient already exists!")
+        try:
+            pat.add_patient(self.db, data)
+        except DuplicateError as err:
+            print(f"Patient already exists (same {pat.IDENTITY.get(err.key, (err.key,))[0]})!")
             return
-        pat.add_patient(self.db, data)
         print("✅ Patient added successfully!\n.")
 
     def _add_appointment(self):
         print(f'\n👳‍♂️ Patients (names sorted ASC)')
-        self._print(pat.list_all(self.db, 'ASC'))
+        self._paged(partial(pat.list_all, self.db, 'ASC'), pat.TABLE)
         patient_id = int(input("Enter Patient ID from the list above: "))
 
         print(f'\n👩‍⚕️ Doctors (names sorted ASC)')
-        self._print(doc.list_all(self.db, 'ASC'))
+        self._paged(partial(doc.list_all, self.db, 'ASC'), doc.TABLE)
         doctor_id = int(input("Enter Doctor ID from the list above: "))
-        app_date = input("Appointment Date (YYYY-MM-DD): ")
+        app_date = self._ask_date("Appointment Date")
+        start = input("Start time (HH:MM, blank for none): ").strip() or None
+        end = None
+        if start:
+            end = input(f"End time (HH:MM) [+{avail.DEFAULT_DURATION} min]: ").strip() or None
         reason = input("Reason: ")
         status = input("Status (Pending/Done/Cancelled): ").strip().title() or 'Pending'
-        app.add_appointment(self.db, {
-            'patient_id': patient_id,
-            'doctor_id': doctor_id,
-            'appointment_date': app_date,
-            'reason': reason,
-            'status': status
-        })
+        try:
+            app.add_appointment(self.db, {
+                'patient_id': patient_id,
+                'doctor_id': doctor_id,
+                'appointment_date': app_date,
+                'start_time': start,
+                'end_time': end,
+                'reason': reason,
+                'status': status
+            })
+        except (avail.BookingConflict, ValueError) as err:
+            print(f"❌ Cannot book: {err}")
+            return
         print("✅ Appointment added successfully!")
 
     def _update_appointment(self):
         print(f'\n📅 Appointments (date sorted ASC)')
-        self._print(app.list_all(self.db, 'ASC'))
+        self._paged(partial(app.list_all, self.db, 'ASC'), app.TABLE)
         aid = int(input("Enter Appointment ID from the above list to update: "))
         record = app.search_by_id(self.db, aid)
         if not record:
@@ -239,12 +367,88 @@ class Menu:
         record = record[0]
         print("Leave blank to keep current value")
         data = {}
-        for field in ['patient_id','doctor_id','appointment_date','reason','status']:
+        for field in ['patient_id','doctor_id','appointment_date','start_time','end_time','reason','status']:
             new_val = input(f"{field} [{record[field]}]: ")
             if new_val:
                 data[field] = new_val if field != 'patient_id' and field != 'doctor_id' else int(new_val)
         if data:
-            app.update_appointment(self.db, aid, data)
+            try:
+                app.update_appointment(self.db, aid, data)
+            except (avail.BookingConflict, ValueError) as err:
+                print(f"❌ Cannot update: {err}")
+                return
             print("✅ Appointment updated successfully!")
         else:
             print("Nothing changed.")
+
+    # ===================== bulk operations =========================== #
+    def _close_day(self):
+        day = self._ask_date("Date", date.today())
+        status = ""
+        while status not in ("Done", "Cancelled"):
+            status = input("Mark Pending as (Done/Cancelled) [Done]: ").strip().title() or 'Done'
+        did = input("Doctor ID (blank for all): ").strip()
+        while did and not did.isdigit():
+            did = input("⚠️ Enter a number, or blank for all: ").strip()
+        try:
+            n = app.close_day(self.db, day, status, doctor_id=int(did) if did else None)
+        except ValueError as err:
+            print(f"❌ Nothing changed: {err}")
+            return
+        print(f"✅ {n} appointment(s) marked {status}")
+
+    def _reassign(self):
+        from_doctor = int(input("From Doctor ID: "))
+        to_doctor = int(input("To Doctor ID: "))
+        since = self._ask_date("From date", date.today())
+        until = self._ask_date("To date", since)
+        try:
+            n = app.reassign(self.db, from_doctor, to_doctor, since=since, until=until)
+        except (avail.BookingConflict, ValueError) as err:
+            print(f"❌ Nothing moved: {err}")
+            return
+        print(f"✅ {n} appointment(s) moved to doctor {to_doctor}")
+
+    def _add_series(self):
+        patient_id = int(input("Patient ID: "))
+        doctor_id = int(input("Doctor ID: "))
+        first = self._ask_date("First date")
+        start = input("Start time (HH:MM, blank for none): ").strip() or None
+        every = int(input("Repeat every N days [7]: ") or 7)
+        count = int(input("Number of appointments: "))
+        reason = input("Reason: ")
+        try:
+            n = app.add_series(self.db, {'patient_id': patient_id, 'doctor_id': doctor_id,
+                                         'appointment_date': first, 'start_time': start,
+                                         'reason': reason, 'status': 'Pending'},
+                               count=count, every_days=every)
+        except (avail.BookingConflict, ValueError) as err:
+            print(f"❌ Series not booked: {err}")
+            return
+        print(f"✅ {n} appointment(s) booked")
+
+    # ===================== scheduling ================================ #
+    def _set_hours(self):
+        did = int(input("Doctor ID: "))
+        days = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+        print("Shifts as HH:MM-HH:MM, comma separated; '-' for a day off; blank to keep")
+        for weekday, name in enumerate(days):
+            spec = input(f"{name}: ").strip()
+            if not spec:
+                continue
+            shifts = [] if spec == "-" else [tuple(part.strip().split("-")) for part in spec.split(",")]
+            try:
+                avail.set_hours(self.db, did, weekday, shifts)
+            except ValueError as err:
+                print(f"❌ {name} not changed: {err}")
+        print("✅ Working hours saved!")
+
+    def _next_free_slot(self):
+        spec = input("Specialization: ").strip()
+        duration = int(input(f"Duration in minutes [{avail.DEFAULT_DURATION}]: ") or avail.DEFAULT_DURATION)
+        slot = avail.next_free_slot(self.db, spec, duration=duration)
+        if slot:
+            print(f'\n📅 Next free {spec} slot')
+            self._print([slot])
+        else:
+            print(f"No free {spec} slot in the next {avail.HORIZON_DAYS} days.")
@@ -0,0 +1,116 @@
+"""
+Streaming table renderer – tabulate's "pretty" look without measuring every cell first
+"""
+import os
+import shlex
+import subprocess
+import sys
+from itertools import chain, islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional, TextIO
+
+SMALL = 200        # results up to this many rows still go through tabulate
+SAMPLE = 200       # rows looked at to size the columns
+MAX_WIDTH = 40     # longer cells are cut and end in "…"
+PAGER = "less -FRSX"
+
+Row = Dict[str, Any]
+
+def _text(value: Any) -> str:
+    if value is None:
+        return ""
+    return str(value).replace("\r", " ").replace("\n", " ")
+
+def _fit(text: str, width: int) -> str:
+    return text if len(text) <= width else text[:width - 1] + "…"
+
+def column_widths(sample: List[Row], columns: List[str], max_width: int = MAX_WIDTH,
+                  hints: Optional[Dict[str, int]] = None) -> Dict[str, int]:
+    """Width per column from the header and the sampled cells.
+
+    `hints` (e.g. VARCHAR lengths from schema_widths) act as a floor, so
+    a long value arriving after the sample is less likely to be cut.
+    """
+    hints = hints or {}
+    widths = {}
+    for col in columns:
+        seen = max((len(_text(r.get(col))) for r in sample), default=0)
+        widths[col] = max(len(col), min(max(seen, hints.get(col, 0)), max_width))
+    return widths
+
+def schema_widths(db, table: str) -> Dict[str, int]:
+    """Declared character lengths of `table`'s columns (VARCHAR(100) -> 100)."""
+    rows = db.execute("""SELECT column_name AS name, character_maximum_length AS len
+                         FROM information_schema.columns
+                         WHERE table_schema = DATABASE() AND table_name = %s""", (table,), fetch=True)
+    return {r['name']: int(r['len']) for r in rows if r['len']}
+
+def render(rows: Iterable[Row], *, sample: int = SAMPLE, max_width: int = MAX_WIDTH,
+           hints: Optional[Dict[str, int]] = None) -> Iterator[str]:
+    """Yield the lines of a bordered table as rows arrive.
+
+    Only the first `sample` rows are held to size the columns; the rest
+    stream straight through, so memory stays flat and the first line
+    appears at once.
+    """
+    rows = iter(rows)
+    head = list(islice(rows, sample))
+    if not head:
+        return
+    columns = list(head[0])
+    widths = column_widths(head, columns, max_width, hints)
+    border = "+" + "+".join("-" * (widths[c] + 2) for c in columns) + "+"
+    yield border
+    yield "|" + "|".join(f" {c.center(widths[c])} " for c in columns) + "|"
+    yield border
+    for row in chain(head, rows):
+        yield "|" + "|".join(f" {_fit(_text(row.get(c)), widths[c]).center(widths[c])} "
+                             for c in columns) + "|"
+    yield border
+
+# ------------------------------- output ------------------------------- #
+def _write(lines: Iterable[str], out: TextIO):
+    for line in lines:
+        out.write(line + "\n")
+
+def page(lines: Iterable[str], *, out: Optional[TextIO] = None):
+    """Send lines to $PAGER (default `less -FRSX`) on a terminal, else to `out`.
+
+    Quitting the pager stops the iteration, which also stops whatever
+    feeds `lines` (e.g. a database cursor).
+    """
+    out = out or sys.stdout
+    command = os.environ.get("PAGER", PAGER)
+    if not (out is sys.stdout and out.isatty() and command):
+        _write(lines, out)
+        return
+    try:
+        proc = subprocess.Popen(shlex.split(command), stdin=subprocess.PIPE, text=True, encoding="utf-8")
+    except OSError:
+        _write(lines, out)
+        return
+    try:
+        _write(lines, proc.stdin)
+        proc.stdin.close()
+    except BrokenPipeError:
+        pass  # the user quit the pager early
+    finally:
+        if hasattr(lines, "close"):
+            lines.close()
+        proc.wait()
+
+def show(rows: Iterable[Row], *, pager: bool = True, hints: Optional[Dict[str, int]] = None):
+    """Print rows: small lists with tabulate's pretty format, anything else streamed."""
+    if isinstance(rows, list) and len(rows) <= SMALL:
+        from tabulate import tabulate  # imported on first use; it adds to every start-up otherwise
+        print(tabulate(rows, headers="keys", tablefmt="pretty") if rows else "No data found.")
+        return
+    rows = iter(rows)
+    first = next(rows, None)
+    if first is None:
+        print("No data found.")
+        return
+    lines = render(chain([first], rows), hints=hints)
+    if pager:
+        page(lines)
+    else:
+        _write(lines, sys.stdout)
@@ -0,0 +1,186 @@
+"""
+Headless JSON service – newline-delimited JSON requests on a local socket
+
+One request per line, one response line per request, in order:
+
+    {"id": 1, "op": "patient.search_by_id", "args": {"pid": 42}}
+    {"id": 1, "ok": true, "result": [{"patient_id": 42, ...}]}
+    {"id": 2, "op": "appointment.book", "args": {"data": {...}}}
+    {"id": 2, "ok": false, "error": "overlaps appointment 17", "type": "BookingConflict"}
+
+`args` are the model function's keyword arguments (see OPS). Reads
+return a list of rows (empty when nothing matches), next_free_slot one
+object or null, and writes an object with the new or changed id. Dates and
+times travel as ISO strings. Each connection is served in order, many
+connections at once, through models.aio on a pooled Database.
+"""
+import asyncio
+import json
+import logging
+import os
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+from models import availability
+from models.aio import AsyncDatabase
+from models.database import Database, DuplicateError
+from utils.enums import Status
+from .importer import KINDS
+
+log = logging.getLogger("hms.service")
+
+MAX_LIMIT = 500          # rows per listing request
+MAX_LINE = 1 << 20       # bytes per request line
+
+class RequestError(Exception):
+    """Malformed request; reported to the client, never logged."""
+
+# ------------------------------- handlers ----------------------------- #
+def _read(module: str, name: str, paged: bool = False):
+    """Handler calling a model read with the request's arguments; listings
+    always get a limit, since without one they return every row."""
+    async def handler(adb: AsyncDatabase, args: Dict[str, Any]):
+        if args.get("limit") or paged:
+            args = {**args, "limit": min(int(args.get("limit") or MAX_LIMIT), MAX_LIMIT)}
+        return await getattr(getattr(adb, module), name)(**args)
+    return handler
+
+def _clean(kind: str, data: Any) -> Dict[str, Any]:
+    if not isinstance(data, dict):
+        raise RequestError("data must be an object")
+    clean, errors = KINDS[kind][0](data)
+    if errors:
+        raise RequestError(", ".join(errors))
+    return clean
+
+async def _add_patient(adb: AsyncDatabase, args: Dict[str, Any]):
+    return {"patient_id": await adb.patient.add_patient(_clean("patients", args.get("data")))}
+
+async def _book(adb: AsyncDatabase, args: Dict[str, Any]):
+    data = _clean("appointments", args.get("data"))
+    if availability.as_date(data["appointment_date"]) < date.today():
+        raise RequestError("appointment_date is in the past")
+    return {"appointment_id": await adb.appointment.add_appointment(data)}
+
+async def _set_status(adb: AsyncDatabase, args: Dict[str, Any]):
+    status = str(args.get("status", "")).title()
+    if status not in Status.__members__:
+        raise RequestError(f"invalid status {args.get('status')!r}")
+    if args.get("appointment_id") is None:
+        raise RequestError("missing appointment_id")
+    aid = int(args["appointment_id"])
+    await adb.appointment.update_appointment(aid, {"status": status})
+    return {"appointment_id": aid, "status": status}
+
+async def _next_free_slot(adb: AsyncDatabase, args: Dict[str, Any]):
+    if args.get("after"):
+        args = {**args, "after": datetime.fromisoformat(args["after"])}
+    return await adb.availability.next_free_slot(**args)
+
+async def _ping(adb: AsyncDatabase, args: Dict[str, Any]):
+    return {"workers": adb.workers}
+
+Handler = Callable[[AsyncDatabase, Dict[str, Any]], Awaitable[Any]]
+# the whole surface; writes are validated like `main.py import` rows
+OPS: Dict[str, Handler] = {
+    "ping": _ping,
+    "patient.search_by_id": _read("patient", "search_by_id"),
+    "patient.search_by_name": _read("patient", "search_by_name"),
+    "patient.list_all": _read("patient", "list_all", paged=True),
+    "patient.add": _add_patient,
+    "doctor.search_by_id": _read("doctor", "search_by_id"),
+    "doctor.search_by_name": _read("doctor", "search_by_name"),
+    "doctor.list_all": _read("doctor", "list_all", paged=True),
+    "appointment.search_by_id": _read("appointment", "search_by_id"),
+    "appointment.search_by_patient": _read("appointment", "search_by_patient", paged=True),
+    "appointment.search_by_doctor": _read("appointment", "search_by_doctor", paged=True),
+    "appointment.list_today": _read("appointment", "list_today", paged=True),
+    "appointment.book": _book,
+    "appointment.set_status": _set_status,
+    "availability.next_free_slot": _next_free_slot,
+}
+
+# ------------------------------ protocol ------------------------------ #
+def _plain(value: Any) -> Any:
+    if isinstance(value, timedelta):
+        return availability.clock(availability.minutes(value))
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+async def handle(adb: AsyncDatabase, line: bytes) -> Dict[str, Any]:
+    """One request line -> its response object."""
+    rid = None
+    try:
+        request = json.loads(line)
+        if not isinstance(request, dict):
+            raise RequestError("request must be an object")
+        rid, args = request.get("id"), request.get("args") or {}
+        handler = OPS.get(request.get("op"))
+        if handler is None:
+            raise RequestError(f"unknown op {request.get('op')!r}")
+        if not isinstance(args, dict):
+            raise RequestError("args must be an object")
+        return {"id": rid, "ok": True, "result": await handler(adb, args)}
+    except (RequestError, availability.BookingConflict, ValueError, TypeError) as e:
+        # bad arguments surface as TypeError/ValueError from the model call
+        return {"id": rid, "ok": False, "error": str(e), "type": type(e).__name__}
+    except DuplicateError as e:
+        return {"id": rid, "ok": False, "error": f"duplicate {e.key}", "type": "DuplicateError"}
+    except Exception as e:
+        log.exception("request %r failed", rid)
+        return {"id": rid, "ok": False, "error": "internal error", "type": type(e).__name__}
+
+async def _serve_client(adb: AsyncDatabase, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    try:
+        while True:
+            try:
+                line = await reader.readline()
+            except ValueError:  # longer than MAX_LINE
+                writer.write(b'{"id": null, "ok": false, "error": "request too long"}\n')
+                break
+            if not line:
+                break
+            if not line.strip():
+                continue
+            response = await handle(adb, line)
+            writer.write(json.dumps(response, default=_plain, ensure_ascii=False).encode() + b"\n")
+            await writer.drain()
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+async def start(db: Database, *, host: str = "127.0.0.1", port: int = 8765,
+                socket_path: Optional[str] = None) -> Tuple[asyncio.AbstractServer, AsyncDatabase]:
+    """Listen on host:port, or on a Unix socket when socket_path is given.
+    Close the AsyncDatabase after the server."""
+    adb = AsyncDatabase(db)
+    client = lambda r, w: _serve_client(adb, r, w)
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        server = await asyncio.start_unix_server(client, socket_path, limit=MAX_LINE)
+    else:
+        server = await asyncio.start_server(client, host, port, limit=MAX_LINE)
+    return server, adb
+
+def serve(db: Database, *, host: str = "127.0.0.1", port: int = 8765,
+          socket_path: Optional[str] = None, echo: Callable[[str], None] = print):
+    """Run the service until interrupted."""
+    async def main():
+        server, adb = await start(db, host=host, port=port, socket_path=socket_path)
+        where = socket_path or ", ".join(f"{s.getsockname()[0]}:{s.getsockname()[1]}" for s in server.sockets)
+        echo(f"🔌 Serving on {where} with {adb.workers} database thread(s) – Ctrl+C to stop")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            adb.close()
+
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        echo("Stopped.")
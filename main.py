@@ -1,10 +1,18 @@
 
 from getpass import getpass
-from models.database import Database
-from cli.menu import Menu
-from mysql.connector import Error
+import argparse
+import logging
+import os
+from datetime import date
+from functools import partial
+from typing import TYPE_CHECKING
 import sys
 
+# the driver, the models and the menu load only once a command needs a
+# database, so `--help` and argument errors return immediately
+if TYPE_CHECKING:
+    from models.database import Database
+
 def prompt_creds():
     host = input("Host [localhost]: ").strip() or "localhost"
     user = input("User [root]: ").strip() or "root"
@@ -12,12 +20,238 @@ def prompt_creds():
     db   = input("Database [hospital_db]: ").strip() or "hospital_db"
     return host, user, pwd, db
 
+def arg_creds(args):
+    pwd = os.environ.get("HMS_DB_PASSWORD")
+    if pwd is None:
+        pwd = getpass("Password: ") or "Bao@1234"
+    return args.host, args.user, pwd, args.database
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Hospital Management System")
+    parser.add_argument("--host", default=os.environ.get("HMS_DB_HOST", "localhost"))
+    parser.add_argument("--user", default=os.environ.get("HMS_DB_USER", "root"))
+    parser.add_argument("--database", default=os.environ.get("HMS_DB_NAME", "hospital_db"))
+    parser.add_argument("--slow-ms", type=float, default=float(os.environ.get("HMS_SLOW_QUERY_MS", 200)),
+                        help="log statements slower than this (default 200)")
+    parser.add_argument("--slow-log", default=os.environ.get("HMS_SLOW_LOG"),
+                        help="slow-query log file (default stderr)")
+    parser.add_argument("--stats", action="store_true", help="print query statistics on exit")
+    parser.add_argument("--replica", action="append", metavar="HOST[:PORT]",
+                        help="read replica for listings, searches, reports and exports "
+                             "(repeatable; default HMS_DB_REPLICAS, comma-separated)")
+    parser.add_argument("--max-replica-lag", type=float, default=5.0, metavar="SECONDS",
+                        help="read from the primary while a replica lags more (default 5)")
+    sub = parser.add_subparsers(dest="command")
+
+    imp = sub.add_parser("import", help="bulk import a CSV / NDJSON file")
+    imp.add_argument("kind", choices=["patients", "doctors", "appointments"])
+    imp.add_argument("path")
+    imp.add_argument("--format", choices=["csv", "ndjson"])
+    imp.add_argument("--batch-size", type=int, default=1000)
+    imp.add_argument("--restart", action="store_true", help="ignore an existing checkpoint")
+
+    exp = sub.add_parser("export", help="stream rows to CSV / NDJSON / Parquet ('-' = stdout)")
+    exp.add_argument("kind", choices=["patients", "doctors", "appointments", "visits"],
+                     help="visits = appointments with patient/doctor names")
+    exp.add_argument("path")
+    exp.add_argument("--format", choices=["csv", "ndjson", "parquet"])
+    exp.add_argument("--from", dest="since", type=date.fromisoformat, metavar="YYYY-MM-DD")
+    exp.add_argument("--to", dest="until", type=date.fromisoformat, metavar="YYYY-MM-DD")
+    exp.add_argument("--doctor", type=int)
+    exp.add_argument("--status", choices=["Pending", "Done", "Cancelled"])
+    exp.add_argument("--include-history", action="store_true",
+                     help="also export archived appointments (appointments / visits)")
+    exp.add_argument("--batch-size", type=int, default=5000)
+
+    sub.add_parser("migrate", help="create tables and apply pending schema migrations")
+    sub.add_parser("check-plans", help="EXPLAIN the hot queries; exit 1 on full scans")
+
+    rpt = sub.add_parser("reports", help="maintain the reporting aggregates")
+    rpt.add_argument("action", choices=["rebuild", "verify"])
+
+    close = sub.add_parser("close-day", help="mark a day's Pending appointments Done or Cancelled")
+    close.add_argument("--date", dest="day", type=date.fromisoformat, default=date.today(),
+                       metavar="YYYY-MM-DD", help="default today")
+    close.add_argument("--status", choices=["Done", "Cancelled"], default="Done")
+    close.add_argument("--doctor", type=int, help="only this doctor's appointments")
+
+    move = sub.add_parser("reassign", help="move a doctor's Pending appointments to a colleague")
+    move.add_argument("from_doctor", type=int)
+    move.add_argument("to_doctor", type=int)
+    move.add_argument("--from", dest="since", type=date.fromisoformat, default=date.today(),
+                      metavar="YYYY-MM-DD", help="default today")
+    move.add_argument("--to", dest="until", type=date.fromisoformat, metavar="YYYY-MM-DD",
+                      help="default the --from date")
+
+    arc = sub.add_parser("archive", help="move old Done/Cancelled appointments to the history table")
+    arc.add_argument("--older-than", type=int, default=365, metavar="DAYS",
+                     help="archive appointments dated more than DAYS ago (default 365)")
+    arc.add_argument("--batch-size", type=int, default=500)
+    arc.add_argument("--pause", type=float, default=0.0, metavar="SECONDS",
+                     help="sleep between batches")
+
+    dup = sub.add_parser("dedup", help="find likely duplicate patients, or merge reviewed proposals")
+    dup.add_argument("--threshold", type=float, default=0.85,
+                     help="minimum pair score, 0-1 (default 0.85)")
+    dup.add_argument("--workers", type=int, help="scoring processes (default one per CPU)")
+    dup.add_argument("--out", default="-", help="write proposals as NDJSON here (default stdout)")
+    dup.add_argument("--apply", metavar="PATH",
+                     help="merge the proposals in this NDJSON file instead of scanning")
+
+    srv = sub.add_parser("serve", help="headless JSON-lines service for kiosks and integrations")
+    srv.add_argument("--listen", default="127.0.0.1:8765", metavar="HOST:PORT",
+                     help="TCP address (default 127.0.0.1:8765)")
+    srv.add_argument("--socket", metavar="PATH", help="listen on this Unix socket instead")
+    srv.add_argument("--pool-size", type=int, default=16,
+                     help="database connections, and so requests in flight (default 16)")
+    return parser
+
+def db_options(args):
+    replicas = args.replica or [h for h in os.environ.get("HMS_DB_REPLICAS", "").split(",") if h]
+    options = {"slow_query_ms": args.slow_ms, "replicas": replicas,
+               "max_replica_lag": args.max_replica_lag}
+    if args.command == "serve":
+        options["pool_size"] = max(1, args.pool_size)
+    return options
+
+def setup_logging(path):
+    handler = logging.FileHandler(path, encoding="utf-8") if path else logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(asctime)s %(name)s %(levelname)s %(message)s"))
+    logger = logging.getLogger("hms")
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+
+def dump_stats(args, db: "Database"):
+    if args.stats:
+        print("\n" + db.metrics.report(), file=sys.stderr)
+
+def run_command(args, db: "Database"):
+    if args.command in ("import", "export", "migrate", "check-plans", "reports", "archive",
+                        "close-day", "reassign", "dedup", "serve"):
+        from models import migrations
+        applied = migrations.ensure_schema(db)
+        if args.command == "migrate":
+            print(f"✅ Schema at version {migrations.current_version(db)}"
+                  + (f" (applied {', '.join(map(str, applied))})" if applied else ""))
+    if args.command == "check-plans":
+        problems = migrations.check_plans(db)
+        for problem in problems:
+            print(f"❌ {problem}")
+        if problems:
+            sys.exit(1)
+        print("✅ All hot queries use indexes")
+    elif args.command == "reports":
+        from models import reports
+        if args.action == "rebuild":
+            reports.rebuild(db)
+            print("✅ Reporting aggregates rebuilt")
+        else:
+            problems = reports.verify(db)
+            for problem in problems:
+                print(f"❌ {problem}")
+            if problems:
+                sys.exit(1)
+            print("✅ Reporting aggregates match the appointments")
+    elif args.command == "close-day":
+        from models import appointment as app
+        n = app.close_day(db, args.day, args.status, doctor_id=args.doctor)
+        print(f"✅ {n:,} appointment(s) on {args.day} marked {args.status}")
+    elif args.command == "reassign":
+        from models import appointment as app, availability
+        try:
+            n = app.reassign(db, args.from_doctor, args.to_doctor, since=args.since,
+                             until=args.until or args.since)
+        except (availability.BookingConflict, ValueError) as e:
+            print(f"❌ Nothing moved: {e}")
+            sys.exit(1)
+        print(f"✅ {n:,} appointment(s) moved from doctor {args.from_doctor} to {args.to_doctor}")
+    elif args.command == "archive":
+        from models import archive
+        stats = archive.archive(db, older_than_days=args.older_than, batch_size=args.batch_size,
+                                pause=args.pause, echo=print)
+        sizes = archive.counts(db)
+        print(f"✅ Archived {stats['moved']:,} appointments in {stats['batches']:,} batches "
+              f"({stats['seconds']:.1f}s) – {sizes['hot']:,} hot, {sizes['history']:,} in history")
+    elif args.command == "dedup":
+        run_dedup(args, db)
+    elif args.command == "serve":
+        from cli import service
+        host, _, port = args.listen.rpartition(":")
+        service.serve(db, host=host or "127.0.0.1", port=int(port), socket_path=args.socket)
+    elif args.command == "export":
+        from cli.exporter import export
+        # keep stdout clean when the rows themselves go there
+        echo = partial(print, file=sys.stderr) if args.path == "-" else print
+        try:
+            stats = export(db, args.kind, args.path, fmt=args.format, since=args.since,
+                           until=args.until, doctor_id=args.doctor, status=args.status,
+                           include_history=args.include_history, batch_size=args.batch_size, echo=echo)
+        except (ValueError, RuntimeError) as e:
+            print(f"❌ export failed: {e}", file=sys.stderr)
+            sys.exit(1)
+        rate = stats["rows"] / stats["seconds"] if stats["seconds"] else 0
+        size = f", {stats['bytes'] / 2**20:,.1f} MiB" if stats["bytes"] else ""
+        echo(f"✅ Exported {stats['rows']:,} {args.kind} in {stats['seconds']:.1f}s – "
+             f"{rate:,.0f} rows/s{size}")
+    elif args.command == "import":
+        from cli.importer import import_file
+        stats = import_file(db, args.kind, args.path, fmt=args.format,
+                            batch_size=args.batch_size, resume=not args.restart)
+        rate = stats["inserted"] / stats["seconds"] if stats["seconds"] else 0
+        print(f"✅ Imported {stats['inserted']:,} {args.kind} "
+              f"({stats['rejected']:,} rejected) in {stats['seconds']:.1f}s – {rate:,.0f} rows/s")
+
+def run_dedup(args, db: "Database"):
+    import json
+    from models import dedup
+    if args.apply:
+        merged = moved = 0
+        with open(args.apply, encoding="utf-8") as f:
+            for line in filter(str.strip, f):
+                proposal = json.loads(line)
+                try:
+                    moved += dedup.merge(db, proposal["keep"], proposal["merge"])
+                except ValueError as e:
+                    print(f"❌ Skipped {proposal['merge']}: {e}")
+                    continue
+                merged += len(proposal["merge"])
+        print(f"✅ Merged {merged:,} duplicate patient(s), {moved:,} appointment(s) reassigned")
+        return
+    found, stats = dedup.scan(db, threshold=args.threshold, workers=args.workers)
+    out = sys.stdout if args.out == "-" else open(args.out, "w", encoding="utf-8")
+    try:
+        for proposal in found:
+            out.write(json.dumps(proposal) + "\n")
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print(f"✅ {stats['records']:,} patients, {stats['comparisons']:,} comparisons in "
+          f"{stats['blocks']:,} blocks – {stats['proposals']:,} merge proposal(s); "
+          f"review them, then run `dedup --apply FILE`", file=sys.stderr)
+
 def main():
+    args = build_parser().parse_args()
+    setup_logging(args.slow_log)
+    from mysql.connector import Error
+    from models.database import Database
+    if args.command:
+        db = Database(*arg_creds(args), **db_options(args))
+        try:
+            run_command(args, db)
+        except Error as e:
+            print(f"❌ {args.command} failed: {e}")
+            sys.exit(1)
+        finally:
+            dump_stats(args, db)
+            db.close()
+        return
+
     print("\n🏥 Hospital Management System Setup")
     print("Configure your database connection (press Enter for defaults)\n")
 
     creds = prompt_creds()
-    db = Database(*creds)
+    db = Database(*creds, **db_options(args))
+    from cli.menu import Menu
     try:
         Menu(db).home()
     except KeyboardInterrupt:
@@ -26,6 +260,7 @@ def main():
         print(f"❌ Failed to initialize database: {e}")
         sys.exit(1)
     finally:
+        dump_stats(args, db)
         db.close()
 
 if __name__ == "__main__":
@@ -0,0 +1,80 @@
+
+"""
+Async data access – the model functions on a bounded thread pool
+"""
+import asyncio
+import contextvars
+import inspect
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from types import ModuleType
+from typing import Any, Callable, Dict
+from .database import Database
+from . import patient, doctor, appointment, availability
+
+MODULES = (patient, doctor, appointment, availability)
+SKIP = {"create_table"}
+
+# read-your-writes deadline (see Database.invalidate). It lives in a
+# thread-local there, but pool threads serve every task in turn, so here
+# it travels with the asyncio task instead.
+_sticky_until = contextvars.ContextVar("hms_sticky_until", default=0.0)
+
+def _model_functions(module: ModuleType) -> Dict[str, Callable]:
+    """Public `fn(db, ...)` functions defined in `module`."""
+    return {name: fn for name, fn in inspect.getmembers(module, inspect.isfunction)
+            if fn.__module__ == module.__name__ and not name.startswith("_") and name not in SKIP
+            and next(iter(inspect.signature(fn).parameters), None) == "db"}
+
+class _Module:
+    """Awaitable twins of one model module's functions, minus the db argument."""
+    def __init__(self, adb: "AsyncDatabase", module: ModuleType):
+        for name, fn in _model_functions(module).items():
+            setattr(self, name, self._bind(adb, fn))
+
+    @staticmethod
+    def _bind(adb: "AsyncDatabase", fn: Callable):
+        async def call(*args, **kwargs):
+            return await adb.run(fn, *args, **kwargs)
+        call.__name__, call.__qualname__, call.__doc__ = fn.__name__, fn.__qualname__, fn.__doc__
+        return call
+
+class AsyncDatabase:
+    """A Database for asyncio code.
+
+        adb = AsyncDatabase(Database(..., pool_size=16))
+        row = await adb.patient.search_by_id(5)
+        aid = await adb.appointment.add_appointment(data)
+
+    Calls run on a thread pool no bigger than the connection pool, so
+    the event loop never waits on MySQL and at most pool_size statements
+    are in flight; callers beyond that queue for a thread. A single-
+    connection Database gets one thread. Each call is its own unit of
+    work – for several statements in one transaction, run() a function
+    that opens it.
+    """
+    def __init__(self, db: Database, max_workers: int = 0):
+        self.db = db
+        workers = min(max_workers or db.pool_size, db.pool_size) or 1
+        self._executor = ThreadPoolExecutor(workers, thread_name_prefix="hms-db")
+        self.workers = workers
+        for module in MODULES:
+            setattr(self, module.__name__.rsplit(".", 1)[1], _Module(self, module))
+
+    async def run(self, fn: Callable, *args, **kwargs) -> Any:
+        """await fn(db, *args, **kwargs) on the pool."""
+        loop = asyncio.get_running_loop()
+        result, sticky = await loop.run_in_executor(
+            self._executor, partial(self._call, _sticky_until.get(), fn, args, kwargs))
+        if sticky > _sticky_until.get():
+            _sticky_until.set(sticky)
+        return result
+
+    def _call(self, sticky: float, fn: Callable, args: tuple, kwargs: dict):
+        local = self.db._local
+        local.sticky_until = sticky
+        return fn(self.db, *args, **kwargs), local.sticky_until
+
+    def close(self):
+        """Wait for running calls and stop the threads; the Database stays open."""
+        self._executor.shutdown(wait=True)
@@ -2,14 +2,20 @@
 """
 Appointment CRUD operations
 """
-from datetime import date
-from typing import List, Dict, Any
-from tabulate import tabulate
-from .database import Database
+import heapq
+from collections import Counter
+from datetime import date, timedelta
+from typing import List, Dict, Any, Optional, Sequence, Tuple
+from utils.enums import Status
+from .database import Database, replica_read
+from . import paging, queries, availability, reports
+from .cache import freeze
 
 TABLE = "appointments"
 PATIENT_TABLE = "patients"
 DOCTOR_TABLE = "doctors"
+HISTORY_TABLE = "appointments_history"  # filled by models.archive
+COLUMNS = "appointment_id, patient_id, doctor_id, appointment_date, start_time, end_time, reason, status"
 
 def create_table(db: Database):
     db.execute(f"""
@@ -26,57 +32,273 @@ def create_table(db: Database):
     """)
 
 # ---------------------------------------------------------------------- #
-def list_all(db: Database, order: str='ASC'):
-    return db.execute(f"""SELECT a.*, p.full_name as patient_name, d.full_name as doctor_name
+SELECT_JOINED = f"""SELECT a.*, p.full_name as patient_name, d.full_name as doctor_name
                         FROM {TABLE} a
                         JOIN {PATIENT_TABLE} p ON a.patient_id=p.patient_id
-                        JOIN {DOCTOR_TABLE} d ON a.doctor_id=d.doctor_id
-                        ORDER BY appointment_date {order}""", fetch=True)
+                        JOIN {DOCTOR_TABLE} d ON a.doctor_id=d.doctor_id"""
 
-def search_by_id(db: Database, aid: int):
-    return db.execute(f"""SELECT a.*, p.full_name as patient_name, d.full_name as doctor_name
-                        FROM {TABLE} a
+SELECT_HISTORY = f"""SELECT a.*, p.full_name as patient_name, d.full_name as doctor_name
+                        FROM {HISTORY_TABLE} a
                         JOIN {PATIENT_TABLE} p ON a.patient_id=p.patient_id
-                        JOIN {DOCTOR_TABLE} d ON a.doctor_id=d.doctor_id
-                        WHERE appointment_id=%s""", (aid,), fetch=True)
+                        JOIN {DOCTOR_TABLE} d ON a.doctor_id=d.doctor_id"""
 
-def search_by_patient(db: Database, pid: int):
-    return db.execute(f"""SELECT a.*, p.full_name as patient_name, d.full_name as doctor_name
-                        FROM {TABLE} a
-                        JOIN {PATIENT_TABLE} p ON a.patient_id=p.patient_id
-                        JOIN {DOCTOR_TABLE} d ON a.doctor_id=d.doctor_id
-                        WHERE a.patient_id=%s
-                        ORDER BY appointment_date""", (pid,), fetch=True)
+# the joined rows carry patient and doctor names, so writes to any of
+# the three tables invalidate them
+JOIN_TABLES = (TABLE, PATIENT_TABLE, DOCTOR_TABLE)
 
-def search_by_doctor(db: Database, did: int):
-    return db.execute(f"""SELECT a.*, p.full_name as patient_name, d.full_name as doctor_name
-                        FROM {TABLE} a
-                        JOIN {PATIENT_TABLE} p ON a.patient_id=p.patient_id
-                        JOIN {DOCTOR_TABLE} d ON a.doctor_id=d.doctor_id
-                        WHERE a.doctor_id=%s
-                        ORDER BY appointment_date""", (did,), fetch=True)
+def _cached(db: Database, key: tuple, limit, loader):
+    """Cache point lookups and screen-sized pages; full listings and the
+    big chunks of a streamed listing bypass the cache."""
+    if limit is None or limit > paging.PAGE_SIZE + 1:
+        return loader()
+    return db.cache.fetch(tuple(freeze(k) for k in key), JOIN_TABLES, loader)
+
+@replica_read
+def list_all(db: Database, order: str='ASC', *, after=None, limit=None):
+    return _cached(db, ("appointment.list_all", order, after, limit), limit, lambda: paging.fetch(
+        db, SELECT_JOINED, "a.appointment_date", "a.appointment_id", order,
+        after=after, limit=limit))
+
+BY_ID = queries.register("appointment.search_by_id",
+                         f"{SELECT_JOINED}\n                        WHERE a.appointment_id=%s")
+BY_ID_WITH_HISTORY = queries.register("appointment.search_by_id+history",
+                                      f"{SELECT_JOINED}\n                        WHERE a.appointment_id=%s"
+                                      f"\n                        UNION ALL {SELECT_HISTORY}"
+                                      f"\n                        WHERE a.appointment_id=%s")
+
+@replica_read
+def search_by_id(db: Database, aid: int, *, include_history: bool = False):
+    if include_history:
+        return _cached(db, (BY_ID_WITH_HISTORY, aid), 1,
+                       lambda: queries.run(db, BY_ID_WITH_HISTORY, (aid, aid)))
+    return _cached(db, (BY_ID, aid), 1, lambda: queries.run(db, BY_ID, (aid,)))
 
-def list_today(db: Database):
+def _date_order(row: Dict[str, Any]):
+    # MySQL's ASC order: NULL dates first, then by (date, id)
+    return (row["appointment_date"] is not None, row["appointment_date"] or date.min, row["appointment_id"])
+
+def _pages(db: Database, where: str, params: tuple, after, limit, include_history: bool):
+    """One keyset page from the hot table, or the merge of the hot and
+    history pages – each side is read through its own index, so asking
+    for history costs a second indexed query rather than a UNION sort."""
+    page = lambda select: paging.fetch(db, select, "a.appointment_date", "a.appointment_id",
+                                       where=where, params=params, after=after, limit=limit)
+    if not include_history:
+        return page(SELECT_JOINED)
+    rows = list(heapq.merge(page(SELECT_JOINED), page(SELECT_HISTORY), key=_date_order))
+    return rows if limit is None else rows[:limit]
+
+@replica_read
+def search_by_patient(db: Database, pid: int, *, after=None, limit=None, include_history: bool = False):
+    return _cached(db, ("appointment.search_by_patient", pid, after, limit, include_history), limit,
+                   lambda: _pages(db, "a.patient_id=%s", (pid,), after, limit, include_history))
+
+@replica_read
+def search_by_doctor(db: Database, did: int, *, after=None, limit=None, include_history: bool = False):
+    return _cached(db, ("appointment.search_by_doctor", did, after, limit, include_history), limit,
+                   lambda: _pages(db, "a.doctor_id=%s", (did,), after, limit, include_history))
+
+@replica_read
+def list_today(db: Database, *, after=None, limit=None):
     today = date.today()
-    return db.execute(f"""SELECT a.*, p.full_name as patient_name, d.full_name as doctor_name
-                        FROM {TABLE} a
-                        JOIN {PATIENT_TABLE} p ON a.patient_id=p.patient_id
-                        JOIN {DOCTOR_TABLE} d ON a.doctor_id=d.doctor_id
-                        WHERE appointment_date=%s
-                        ORDER BY appointment_date""", (today,), fetch=True)
+    return _cached(db, ("appointment.list_today", today, after, limit), limit, lambda: paging.fetch(
+        db, SELECT_JOINED, "a.appointment_date", "a.appointment_id",
+        where="a.appointment_date=%s", params=(today,), after=after, limit=limit))
+
+INSERT_SQL = f"""INSERT INTO {TABLE}
+            (patient_id, doctor_id, appointment_date, start_time, end_time, reason, status)
+            VALUES (%(patient_id)s, %(doctor_id)s, %(appointment_date)s, %(start_time)s, %(end_time)s,
+                    %(reason)s, %(status)s)"""
+
+# fields whose change can make a booking collide with another
+SLOT_FIELDS = ("doctor_id", "appointment_date", "start_time", "end_time", "status")
+# fields the reporting aggregates are keyed on
+REPORT_FIELDS = ("doctor_id", "appointment_date", "status")
 
-def add_appointment(db: Database, data: dict):
-    sql = f"""INSERT INTO {TABLE}
-            (patient_id, doctor_id, appointment_date, reason, status)
-            VALUES (%(patient_id)s, %(doctor_id)s, %(appointment_date)s, %(reason)s, %(status)s)"""
-    db.execute(sql, data)
+def _with_times(data: dict) -> dict:
+    """Fill optional start/end times; a start without an end gets the default length."""
+    data = {"start_time": None, "end_time": None, **data}
+    if data["start_time"] and not data["end_time"]:
+        end = availability.minutes(data["start_time"]) + availability.DEFAULT_DURATION
+        data["end_time"] = availability.clock(end)
+    return data
+
+def _occupies_slot(data: dict) -> bool:
+    # an untimed appointment is a walk-in: it holds no slot, so no
+    # booking check applies to it
+    return bool(data.get("start_time")) and data.get("status") != "Cancelled"
+
+def add_appointment(db: Database, data: dict) -> int:
+    """Insert one appointment. A timed booking is checked against the
+    doctor's hours and other bookings under a row lock held until the
+    insert commits; a clash raises availability.BookingConflict."""
+    data = _with_times(data)
+    with db.transaction():
+        if _occupies_slot(data):
+            availability.check_slot(db, data["doctor_id"], data["appointment_date"],
+                                    data["start_time"], data["end_time"])
+        aid = db.insert(INSERT_SQL, data)
+        reports.record(db, [(data, +1)])
+    db.invalidate(TABLE)
+    return aid
+
+def add_appointments(db: Database, rows: List[dict]):
+    """Insert a batch as one multi-row INSERT and a single commit.
+    Slots are not checked here: run booking_errors in the same
+    transaction first and leave out the rows it reports."""
+    if rows:
+        with db.transaction():
+            db.execute(INSERT_SQL, [_with_times(r) for r in rows], many=True)
+            reports.record(db, [(r, +1) for r in rows])
+        db.invalidate(TABLE)
+
+def _moved_slot(current: dict, data: dict) -> dict:
+    """current + data with the times filled in. A new start without an
+    end keeps the booking's length (or gets the default one), and an
+    untimed booking has no end either."""
+    merged = {**current, **data}
+    if "start_time" in data and "end_time" not in data:
+        merged["end_time"] = None
+        if merged["start_time"] and current.get("start_time") is not None and current.get("end_time") is not None:
+            length = availability.minutes(current["end_time"]) - availability.minutes(current["start_time"])
+            merged["end_time"] = availability.clock(availability.minutes(merged["start_time"]) + length)
+    if not merged.get("start_time"):
+        merged["end_time"] = None
+    return _with_times(merged)
 
 def update_appointment(db: Database, appointment_id: int, data: dict):
-    sets = []
-    params = []
-    for field, value in data.items():
-        sets.append(f"{field}=%s")
-        params.append(value)
-    params.append(appointment_id)
-    sql = f"UPDATE {TABLE} SET {', '.join(sets)} WHERE appointment_id=%s"
-    db.execute(sql, tuple(params))
+    with db.transaction():
+        current = merged = None
+        if any(f in data for f in SLOT_FIELDS):
+            rows = db.execute(f"""SELECT doctor_id, appointment_date, start_time, end_time, status
+                                FROM {TABLE} WHERE appointment_id=%s FOR UPDATE""",
+                              (appointment_id,), fetch=True)
+            if rows:
+                current, merged = rows[0], _moved_slot(rows[0], data)
+            if merged and _occupies_slot(merged):
+                availability.check_slot(db, merged["doctor_id"], merged["appointment_date"],
+                                        merged["start_time"], merged["end_time"],
+                                        exclude_id=appointment_id)
+        if merged and ("start_time" in data or "end_time" in data):
+            # write the times that were checked, not just the ones given
+            data = {**data, "start_time": merged["start_time"], "end_time": merged["end_time"]}
+        sets = ", ".join(f"{field}=%s" for field in data)
+        db.execute(f"UPDATE {TABLE} SET {sets} WHERE appointment_id=%s", (*data.values(), appointment_id))
+        if current and any(f in data for f in REPORT_FIELDS):
+            # status transitions and reassignments move one count between buckets
+            reports.record(db, [(current, -1), (merged, +1)])
+    db.invalidate(TABLE)
+
+def booking_errors(db: Database, rows: List[dict]) -> Dict[int, str]:
+    """Why add_appointments must not insert some of `rows`, by position.
+
+    Timed bookings from today on are checked like add_appointment's
+    (availability.slot_errors, against the stored bookings and each
+    other); past ones are history and pass. Run it inside the inserting
+    transaction so the doctor locks cover the insert.
+    """
+    today = date.today()
+    live = [(i, r) for i, r in enumerate(_with_times(r) for r in rows)
+            if _occupies_slot(r) and availability.as_date(r["appointment_date"]) >= today]
+    errors = availability.slot_errors(db, [(r["doctor_id"], r["appointment_date"], r["start_time"],
+                                            r["end_time"]) for _, r in live])
+    return {live[k][0]: message for k, message in errors.items()}
+
+# ------------------------------ bulk ops ------------------------------ #
+MAX_SERIES = 520  # ten years of weekly follow-ups
+
+def _bulk_where(since, until, doctor_id, statuses) -> Tuple[str, tuple]:
+    """WHERE over a date range, served by the (date, status) or (doctor, date) index."""
+    if since is None or until is None:
+        raise ValueError("bulk operations need a date range")
+    where, params = ["appointment_date BETWEEN %s AND %s"], [since, until]
+    if doctor_id is not None:
+        where.append("doctor_id=%s")
+        params.append(doctor_id)
+    where.append(f"status IN ({', '.join(['%s'] * len(statuses))})")
+    params.extend(statuses)
+    return " AND ".join(where), tuple(params)
+
+def set_status(db: Database, status: str, *, since: date, until: date, doctor_id: Optional[int] = None,
+               current: Sequence[str] = (Status.Pending.value,)) -> int:
+    """Set every appointment in [since, until] (optionally one doctor's)
+    whose status is in `current` to `status`; returns the rows changed.
+
+    One locking GROUP BY gives the per-bucket counts for the reports, one
+    UPDATE changes the rows – two statements and one commit whatever the
+    count. Cancelled rows cannot be revived here: that needs the slot
+    check update_appointment does.
+    """
+    status = Status(status).value
+    current = tuple(Status(s).value for s in current)
+    if Status.Cancelled.value in current and status != Status.Cancelled.value:
+        raise ValueError("bulk updates cannot revive cancelled appointments")
+    where, params = _bulk_where(since, until, doctor_id, current)
+    with db.transaction():
+        groups = db.execute(f"""SELECT doctor_id, appointment_date, status, COUNT(*) AS n FROM {TABLE}
+                              WHERE {where} GROUP BY doctor_id, appointment_date, status FOR UPDATE""",
+                            params, fetch=True)
+        if not groups:
+            return 0
+        db.execute(f"UPDATE {TABLE} SET status=%s WHERE {where}", (status, *params))
+        reports.record(db, [change for g in groups
+                            for change in ((g, -g['n']), ({**g, "status": status}, g['n']))])
+    db.invalidate(TABLE)
+    return sum(g['n'] for g in groups)
+
+def close_day(db: Database, day: date, status: str = Status.Done.value, *,
+              doctor_id: Optional[int] = None) -> int:
+    """End-of-day close-out: every Pending appointment on `day` becomes `status`."""
+    return set_status(db, status, since=day, until=day, doctor_id=doctor_id)
+
+def reassign(db: Database, from_doctor: int, to_doctor: int, *, since: date, until: date,
+             statuses: Sequence[str] = (Status.Pending.value,)) -> int:
+    """Move `from_doctor`'s appointments in [since, until] to `to_doctor`.
+
+    The rows are locked with one index range read, every timed booking is
+    checked against the new doctor's hours and bookings in one pass
+    (availability.check_slots; a clash raises BookingConflict and nothing
+    moves), then a single UPDATE moves them. Returns the rows moved.
+    """
+    if from_doctor == to_doctor:
+        raise ValueError("pick a different doctor")
+    statuses = tuple(Status(s).value for s in statuses)
+    where, params = _bulk_where(since, until, from_doctor, statuses)
+    with db.transaction():
+        moving = db.execute(f"""SELECT appointment_date, start_time, end_time, status FROM {TABLE}
+                              WHERE {where} FOR UPDATE""", params, fetch=True)
+        availability.check_slots(db, to_doctor, [(r['appointment_date'], r['start_time'], r['end_time'])
+                                                 for r in moving if _occupies_slot(r)])
+        if not moving:
+            return 0
+        db.execute(f"UPDATE {TABLE} SET doctor_id=%s WHERE {where}", (to_doctor, *params))
+        buckets = Counter((r['appointment_date'], r['status']) for r in moving)
+        reports.record(db, [change for (day, status), n in buckets.items() for change in (
+            ({"doctor_id": from_doctor, "appointment_date": day, "status": status}, -n),
+            ({"doctor_id": to_doctor, "appointment_date": day, "status": status}, n))])
+    db.invalidate(TABLE)
+    return len(moving)
+
+def add_series(db: Database, data: dict, *, count: int, every_days: int = 7) -> int:
+    """Book `count` copies of `data`, the first on its appointment_date and
+    then every `every_days` days (recurring follow-ups).
+
+    All dates are checked in one pass and inserted with one multi-row
+    INSERT in one transaction: either the whole series is booked or,
+    on a BookingConflict, none of it. Returns the rows inserted.
+    """
+    if not 1 <= count <= MAX_SERIES:
+        raise ValueError(f"count must be between 1 and {MAX_SERIES}")
+    if every_days < 1:
+        raise ValueError("every_days must be at least 1")
+    first = availability.as_date(data["appointment_date"])
+    rows = [_with_times({**data, "appointment_date": first + timedelta(days=every_days * k)})
+            for k in range(count)]
+    with db.transaction():
+        if _occupies_slot(rows[0]):
+            availability.check_slots(db, rows[0]["doctor_id"], [(r["appointment_date"], r["start_time"],
+                                                                  r["end_time"]) for r in rows])
+        db.execute(INSERT_SQL, rows, many=True)
+        reports.record(db, [(r, +1) for r in rows])
+    db.invalidate(TABLE)
+    return len(rows)
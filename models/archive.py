@@ -0,0 +1,125 @@
+
+"""
+Archival of finished appointments into a year-partitioned history table
+"""
+import time
+from datetime import date, timedelta
+from typing import Callable, Dict, List, Optional
+from utils.enums import Status
+from .database import Database
+from . import appointment as app
+
+HISTORY_TABLE = app.HISTORY_TABLE
+ARCHIVE_AFTER_DAYS = 365   # Done / Cancelled appointments older than this move out
+BATCH_SIZE = 500           # rows moved per transaction
+YEARS_AHEAD = 1            # empty partitions kept ready past the current year
+FINISHED = (Status.Done.value, Status.Cancelled.value)
+
+def create_table(db: Database):
+    """The history table mirrors appointments, keyed and partitioned by date.
+
+    InnoDB cannot partition a table that has foreign keys, and every
+    unique key must contain the partitioning column – so `appointments`
+    itself stays unpartitioned with its constraints, and only the cold
+    rows (which are never updated) live here, one partition per year.
+    """
+    statuses = ", ".join(f"'{s.value}'" for s in Status)
+    rows = db.execute(f"SELECT MIN(appointment_date) AS first FROM {app.TABLE}", fetch=True)
+    first = (rows[0]['first'] if rows else None) or date.today()
+    db.execute(f"""
+    CREATE TABLE IF NOT EXISTS {HISTORY_TABLE}(
+        appointment_id   INT NOT NULL,
+        patient_id       INT,
+        doctor_id        INT,
+        appointment_date DATE NOT NULL,
+        start_time       TIME NULL,
+        end_time         TIME NULL,
+        reason           VARCHAR(255),
+        status           ENUM({statuses}) DEFAULT 'Pending',
+        PRIMARY KEY (appointment_id, appointment_date),
+        KEY idx_history_patient_date (patient_id, appointment_date),
+        KEY idx_history_doctor_date (doctor_id, appointment_date)
+    )
+    PARTITION BY RANGE (YEAR(appointment_date)) (
+        PARTITION p_old VALUES LESS THAN ({first.year}),
+        PARTITION p_max VALUES LESS THAN MAXVALUE
+    )
+    """)
+    ensure_partitions(db, date.today().year + YEARS_AHEAD)
+
+# ----------------------------- partitions ----------------------------- #
+def partitions(db: Database) -> Dict[str, Optional[int]]:
+    """Partition name -> exclusive upper year (None for MAXVALUE)."""
+    rows = db.execute("""SELECT partition_name AS name, partition_description AS bound
+                        FROM information_schema.partitions
+                        WHERE table_schema=DATABASE() AND table_name=%s
+                        ORDER BY partition_ordinal_position""", (HISTORY_TABLE,), fetch=True)
+    return {r['name']: None if r['bound'] == "MAXVALUE" else int(r['bound']) for r in rows}
+
+def ensure_partitions(db: Database, through_year: int) -> List[str]:
+    """Split p_max so every year up to `through_year` has its own partition.
+
+    p_max is kept empty, so REORGANIZE only rewrites the table definition.
+    Old years can later be dropped in one statement with DROP PARTITION.
+    """
+    bounds = [b for b in partitions(db).values() if b is not None]
+    start = max(bounds) if bounds else through_year
+    years = list(range(start, through_year + 1))
+    if not years:
+        return []
+    parts = [f"PARTITION p{y} VALUES LESS THAN ({y + 1})" for y in years]
+    parts.append("PARTITION p_max VALUES LESS THAN MAXVALUE")
+    db.execute(f"ALTER TABLE {HISTORY_TABLE} REORGANIZE PARTITION p_max INTO ({', '.join(parts)})")
+    return [f"p{y}" for y in years]
+
+# ------------------------------ archival ------------------------------ #
+_COLUMNS = app.COLUMNS
+_marks = ", ".join(["%s"] * len(FINISHED))
+_PICK = f"""SELECT appointment_id, appointment_date FROM {app.TABLE}
+           WHERE appointment_date >= %s AND appointment_date < %s AND status IN ({_marks})
+           ORDER BY appointment_date, appointment_id LIMIT %s FOR UPDATE"""
+
+def archive(db: Database, *, older_than_days: int = ARCHIVE_AFTER_DAYS, batch_size: int = BATCH_SIZE,
+            pause: float = 0.0, echo: Optional[Callable[[str], None]] = None) -> Dict[str, float]:
+    """Move finished appointments dated before today - `older_than_days` to history.
+
+    Each batch is its own short transaction: lock up to `batch_size`
+    rows through the date index, copy them, delete them by primary key,
+    commit. Bookings on recent dates never wait behind the job, and an
+    interrupted run just leaves the remaining rows for the next one.
+    Reporting aggregates count history too, so they are left untouched.
+    `pause` sleeps between batches to spread the load.
+    """
+    cutoff = date.today() - timedelta(days=older_than_days)
+    ensure_partitions(db, max(cutoff.year, date.today().year + YEARS_AHEAD))
+    start = time.perf_counter()
+    moved = batches = 0
+    since = date.min
+    while True:
+        with db.transaction():
+            rows = db.execute(_PICK, (since, cutoff, *FINISHED, batch_size), fetch=True)
+            if rows:
+                ids = tuple(r['appointment_id'] for r in rows)
+                marks = ", ".join(["%s"] * len(ids))
+                db.execute(f"""INSERT INTO {HISTORY_TABLE} ({_COLUMNS})
+                              SELECT {_COLUMNS} FROM {app.TABLE} WHERE appointment_id IN ({marks})""", ids)
+                db.execute(f"DELETE FROM {app.TABLE} WHERE appointment_id IN ({marks})", ids)
+        if not rows:
+            break
+        db.invalidate(app.TABLE)
+        moved += len(rows)
+        batches += 1
+        # finished rows before this date are gone; Pending ones are skipped by the status filter
+        since = rows[-1]['appointment_date']
+        if echo and batches % 100 == 0:
+            echo(f"  … {moved:,} appointments archived (up to {since})")
+        if len(rows) < batch_size:
+            break
+        if pause:
+            time.sleep(pause)
+    return {"moved": moved, "batches": batches, "seconds": time.perf_counter() - start}
+
+def counts(db: Database) -> Dict[str, int]:
+    """Rows in the hot table and in history."""
+    return {name: db.execute(f"SELECT COUNT(*) AS n FROM {table}", fetch=True)[0]['n']
+            for name, table in (("hot", app.TABLE), ("history", HISTORY_TABLE))}
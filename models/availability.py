@@ -0,0 +1,284 @@
+
+"""
+Doctor working hours, per-day interval indexes and slot booking checks
+"""
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime, time, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from utils import validators as val
+from .database import Database, replica_read
+
+HOURS_TABLE = "doctor_hours"
+# models.appointment / models.doctor tables; named here because
+# appointment imports this module for its booking checks
+APPT_TABLE = "appointments"
+DOCTOR_TABLE = "doctors"
+
+SLOT_MINUTES = 15          # free slots start on this grid
+DEFAULT_DURATION = 30
+HORIZON_DAYS = 14
+# doctors with no rows in HOURS_TABLE work 08:00-17:00, Monday to Friday
+DEFAULT_HOURS = {wd: [(8 * 60, 17 * 60)] for wd in range(5)}
+DAY_OFF = ("00:00:00", "00:00:00")  # empty shift stored for a day cleared by set_hours
+
+Interval = Tuple[int, int]  # minutes since midnight, end exclusive
+
+class BookingConflict(Exception):
+    """The requested slot overlaps another booking or falls outside hours."""
+
+def create_table(db: Database):
+    db.execute(f"""
+    CREATE TABLE IF NOT EXISTS {HOURS_TABLE}(
+        doctor_id  INT NOT NULL,
+        weekday    TINYINT NOT NULL,
+        start_time TIME NOT NULL,
+        end_time   TIME NOT NULL,
+        PRIMARY KEY (doctor_id, weekday, start_time),
+        FOREIGN KEY(doctor_id) REFERENCES {DOCTOR_TABLE}(doctor_id) ON DELETE CASCADE
+    )
+    """)
+
+# ------------------------------ helpers ------------------------------- #
+def minutes(value: Any) -> int:
+    """Minutes since midnight from a TIME column (timedelta), time or 'HH:MM'."""
+    if isinstance(value, timedelta):
+        return int(value.total_seconds()) // 60
+    if isinstance(value, time):
+        return value.hour * 60 + value.minute
+    hh, mm = str(value).strip().split(":")[:2]
+    return int(hh) * 60 + int(mm)
+
+DAY_MINUTES = 24 * 60
+
+def clock(mins: int) -> str:
+    """'HH:MM:00' for minutes since midnight; 24:00 is the end of the day.
+    Anything past it raises ValueError – a booking cannot run into the next day."""
+    if not 0 <= mins <= DAY_MINUTES:
+        raise ValueError(f"{mins // 60:02d}:{mins % 60:02d} is outside the day")
+    return f"{mins // 60:02d}:{mins % 60:02d}:00"
+
+def as_date(value: Any) -> date:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    parsed = val.valid_date(str(value))
+    if parsed is None:
+        raise ValueError(f"invalid date {value!r}")
+    return parsed
+
+def set_hours(db: Database, doctor_id: int, weekday: int, shifts: Iterable[Tuple[str, str]]):
+    """Replace a doctor's shifts for one weekday (0 = Monday); no shifts
+    makes it a day off.
+
+    A doctor on DEFAULT_HOURS first gets them written out, so changing
+    one day keeps the other default days, and a cleared day keeps a
+    DAY_OFF row, so the doctor never falls back to the defaults.
+    """
+    rows = [(doctor_id, weekday, clock(minutes(s)), clock(minutes(e))) for s, e in shifts]
+    if any(minutes(e) <= minutes(s) for _, _, s, e in rows):
+        raise ValueError("a shift must end after it starts")
+    with db.transaction():
+        # the doctor lock also serialises this with check_slot
+        if not db.execute(f"SELECT doctor_id FROM {DOCTOR_TABLE} WHERE doctor_id=%s FOR UPDATE",
+                          (doctor_id,), fetch=True):
+            raise ValueError(f"doctor {doctor_id} does not exist")
+        if not db.execute(f"SELECT 1 FROM {HOURS_TABLE} WHERE doctor_id=%s LIMIT 1", (doctor_id,), fetch=True):
+            db.execute(f"INSERT INTO {HOURS_TABLE} VALUES (%s, %s, %s, %s)",
+                       [(doctor_id, wd, clock(s), clock(e))
+                        for wd, day in DEFAULT_HOURS.items() for s, e in day], many=True)
+        db.execute(f"DELETE FROM {HOURS_TABLE} WHERE doctor_id=%s AND weekday=%s", (doctor_id, weekday))
+        db.execute(f"INSERT INTO {HOURS_TABLE} VALUES (%s, %s, %s, %s)",
+                   rows or [(doctor_id, weekday, *DAY_OFF)], many=True)
+
+def working_hours(db: Database, doctor_ids: List[int]) -> Dict[int, Dict[int, List[Interval]]]:
+    """doctor -> weekday -> shifts, in one query for all doctors."""
+    hours: Dict[int, Dict[int, List[Interval]]] = {}
+    if doctor_ids:
+        marks = ", ".join(["%s"] * len(doctor_ids))
+        for r in db.execute(f"""SELECT doctor_id, weekday, start_time, end_time FROM {HOURS_TABLE}
+                              WHERE doctor_id IN ({marks}) ORDER BY start_time""",
+                            tuple(doctor_ids), fetch=True):
+            shifts = hours.setdefault(r['doctor_id'], {}).setdefault(r['weekday'], [])
+            if minutes(r['end_time']) > minutes(r['start_time']):  # not a DAY_OFF row
+                shifts.append((minutes(r['start_time']), minutes(r['end_time'])))
+    return {did: hours.get(did, DEFAULT_HOURS) for did in doctor_ids}
+
+# --------------------------- interval index --------------------------- #
+class DayIndex:
+    """Sorted, merged busy intervals of one doctor on one day."""
+    def __init__(self, busy: Iterable[Interval] = ()):
+        merged: List[List[int]] = []
+        for start, end in sorted(busy):
+            if merged and start <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], end)
+            else:
+                merged.append([start, end])
+        self.starts = [s for s, _ in merged]
+        self.ends = [e for _, e in merged]
+
+    def first_gap(self, shifts: List[Interval], duration: int, not_before: int = 0) -> Optional[int]:
+        """Earliest grid-aligned start of a free `duration` inside a shift."""
+        for shift_start, shift_end in shifts:
+            t = max(shift_start, not_before)
+            t += -t % SLOT_MINUTES
+            while t + duration <= shift_end:
+                i = bisect_right(self.starts, t) - 1
+                if i >= 0 and self.ends[i] > t:
+                    t = self.ends[i] + (-self.ends[i] % SLOT_MINUTES)  # jump past the busy block
+                    continue
+                j = bisect_left(self.starts, t + duration)
+                if j == i + 1:
+                    return t
+                t = self.ends[i + 1] + (-self.ends[i + 1] % SLOT_MINUTES)
+        return None
+
+    def overlaps(self, start: int, end: int) -> bool:
+        i = bisect_left(self.starts, end) - 1
+        return i >= 0 and self.ends[i] > start
+
+def day_indexes(db: Database, doctor_ids: List[int], day: date) -> Dict[int, DayIndex]:
+    """Interval index per doctor for `day`, from one (doctor_id, date) index range scan."""
+    busy: Dict[int, List[Interval]] = {did: [] for did in doctor_ids}
+    if doctor_ids:
+        marks = ", ".join(["%s"] * len(doctor_ids))
+        for r in db.execute(f"""SELECT doctor_id, start_time, end_time FROM {APPT_TABLE}
+                              WHERE doctor_id IN ({marks}) AND appointment_date=%s
+                                AND status<>'Cancelled' AND start_time IS NOT NULL""",
+                            (*doctor_ids, day), fetch=True):
+            busy[r['doctor_id']].append((minutes(r['start_time']), minutes(r['end_time'])))
+    return {did: DayIndex(b) for did, b in busy.items()}
+
+@replica_read
+def next_free_slot(db: Database, specialization: str, *, after: Optional[datetime] = None,
+                   duration: int = DEFAULT_DURATION,
+                   horizon_days: int = HORIZON_DAYS) -> Optional[Dict[str, Any]]:
+    """Earliest slot of `duration` minutes with any doctor of `specialization`.
+
+    Two queries per day examined (hours are loaded once), whatever the
+    number of doctors. Returns doctor id/name, date and times, or None.
+    """
+    after = after or datetime.now()
+    doctors = db.execute(f"SELECT doctor_id, full_name FROM {DOCTOR_TABLE} WHERE specialization=%s",
+                         (specialization,), fetch=True)
+    if not doctors:
+        return None
+    names = {d['doctor_id']: d['full_name'] for d in doctors}
+    ids = list(names)
+    hours = working_hours(db, ids)
+    for offset in range(horizon_days):
+        day = after.date() + timedelta(days=offset)
+        not_before = after.hour * 60 + after.minute if offset == 0 else 0
+        working = [did for did in ids if hours[did].get(day.weekday())]
+        if not working:
+            continue
+        best = None
+        for did, index in day_indexes(db, working, day).items():
+            start = index.first_gap(hours[did][day.weekday()], duration, not_before)
+            if start is not None and (best is None or start < best[1]):
+                best = (did, start)
+        if best:
+            did, start = best
+            return {"doctor_id": did, "doctor_name": names[did], "appointment_date": day,
+                    "start_time": clock(start), "end_time": clock(start + duration)}
+    return None
+
+# ---------------------------- booking check --------------------------- #
+def check_slot(db: Database, doctor_id: int, day: Any, start: Any, end: Any,
+               exclude_id: Optional[int] = None):
+    """Raise BookingConflict unless the doctor is free and working.
+
+    Must run inside db.transaction(): the doctor row is locked FOR UPDATE,
+    which serialises concurrent bookings for that doctor until commit, so
+    two overlapping inserts can never both pass the check.
+    """
+    day = as_date(day)
+    s, e = minutes(start), minutes(end)
+    if e <= s:
+        raise BookingConflict("end time must be after start time")
+    if not db.execute(f"SELECT doctor_id FROM {DOCTOR_TABLE} WHERE doctor_id=%s FOR UPDATE",
+                      (doctor_id,), fetch=True):
+        raise BookingConflict(f"doctor {doctor_id} does not exist")
+    shifts = working_hours(db, [doctor_id])[doctor_id].get(day.weekday(), [])
+    if not any(ss <= s and e <= se for ss, se in shifts):
+        raise BookingConflict("outside the doctor's working hours")
+    sql = f"""SELECT appointment_id FROM {APPT_TABLE}
+             WHERE doctor_id=%s AND appointment_date=%s AND status<>'Cancelled'
+               AND start_time < %s AND end_time > %s"""
+    params: tuple = (doctor_id, day, clock(e), clock(s))
+    if exclude_id is not None:
+        sql += " AND appointment_id<>%s"
+        params += (exclude_id,)
+    clash = db.execute(sql + " LIMIT 1", params, fetch=True)
+    if clash:
+        raise BookingConflict(f"overlaps appointment {clash[0]['appointment_id']}")
+
+def check_slots(db: Database, doctor_id: int, slots: List[Tuple[Any, Any, Any]]):
+    """check_slot for many (day, start, end) bookings at once.
+
+    Same doctor lock and rules, but the existing bookings of all the
+    days come from one (doctor_id, date) index scan, and the new slots
+    are checked against each other too. Also run it with no slots to
+    lock the doctor and check it exists.
+    """
+    if not slots:
+        if not db.execute(f"SELECT doctor_id FROM {DOCTOR_TABLE} WHERE doctor_id=%s FOR UPDATE",
+                          (doctor_id,), fetch=True):
+            raise BookingConflict(f"doctor {doctor_id} does not exist")
+        return
+    errors = slot_errors(db, [(doctor_id, *slot) for slot in slots])
+    if errors:
+        raise BookingConflict(errors[min(errors)])
+
+def slot_errors(db: Database, bookings: List[Tuple[int, Any, Any, Any]]) -> Dict[int, str]:
+    """What is wrong with each (doctor_id, day, start, end) booking, by
+    position; bookings that are fine are left out.
+
+    Must run inside db.transaction(), like check_slot: every doctor is
+    locked, and their hours and the existing bookings of the days
+    involved come from one query each. Bookings are checked against each
+    other too; one that fails does not block the ones after it.
+    """
+    errors: Dict[int, str] = {}
+    wanted: Dict[int, Dict[date, List[Tuple[int, int, int]]]] = {}
+    for i, (did, day, start, end) in enumerate(bookings):
+        s, e = minutes(start), minutes(end)
+        if e <= s:
+            errors[i] = "end time must be after start time"
+        else:
+            wanted.setdefault(did, {}).setdefault(as_date(day), []).append((s, e, i))
+    if not wanted:
+        return errors
+    ids = sorted(wanted)
+    marks = ", ".join(["%s"] * len(ids))
+    found = {r['doctor_id'] for r in db.execute(f"""SELECT doctor_id FROM {DOCTOR_TABLE}
+                                                  WHERE doctor_id IN ({marks}) FOR UPDATE""",
+                                                tuple(ids), fetch=True)}
+    for did in set(ids) - found:
+        errors.update((i, f"doctor {did} does not exist") for days in wanted.pop(did).values()
+                      for _, _, i in days)
+    if not wanted:
+        return errors
+    ids = sorted(wanted)
+    days = sorted({day for did in ids for day in wanted[did]})
+    hours = working_hours(db, ids)
+    busy: Dict[Tuple[int, date], List[Interval]] = {}
+    for r in db.execute(f"""SELECT doctor_id, appointment_date, start_time, end_time FROM {APPT_TABLE}
+                          WHERE doctor_id IN ({', '.join(['%s'] * len(ids))})
+                            AND appointment_date IN ({', '.join(['%s'] * len(days))})
+                            AND status<>'Cancelled' AND start_time IS NOT NULL""",
+                        (*ids, *days), fetch=True):
+        busy.setdefault((r['doctor_id'], as_date(r['appointment_date'])), []).append(
+            (minutes(r['start_time']), minutes(r['end_time'])))
+    for did in ids:
+        for day, intervals in sorted(wanted[did].items()):
+            shifts = hours[did].get(day.weekday(), [])
+            index, reached = DayIndex(busy.get((did, day), [])), -1
+            for s, e, i in sorted(intervals):
+                if not any(ss <= s and e <= se for ss, se in shifts):
+                    errors[i] = f"{day} {clock(s)} is outside the doctor's working hours"
+                elif index.overlaps(s, e) or s < reached:
+                    errors[i] = f"{day} {clock(s)}-{clock(e)} overlaps another booking"
+                else:
+                    reached = max(reached, e)
+    return errors
@@ -0,0 +1,88 @@
+
+"""
+Read-through result cache with LRU + TTL eviction and per-table invalidation
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Tuple
+
+class EntityCache:
+    """Bounded LRU of query results, each tagged with the tables it read.
+
+    Writes call invalidate(table), which bumps that table's generation;
+    entries stamped with an older generation are treated as misses, so
+    invalidation is O(1). Other processes' writes are not seen here, so
+    `ttl` bounds how stale a cross-process read can be – keep it short
+    when several writers share the database.
+
+    `settle` (seconds) stops results for a table from being stored for
+    that long after it is invalidated – with read replicas, a load in
+    that window may come from a replica that has not seen the write.
+    """
+    def __init__(self, maxsize: int = 1024, ttl: float = 5.0, settle: float = 0.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.settle = settle
+        self._settled_at: Dict[str, float] = {}
+        self._data: "OrderedDict[Hashable, Tuple[float, Tuple[int, ...], Tuple[str, ...], Any]]" = OrderedDict()
+        self._generations: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = 0
+
+    def _stamp(self, tables: Iterable[str]) -> Tuple[int, ...]:
+        return tuple(self._generations.get(t, 0) for t in tables)
+
+    def fetch(self, key: Hashable, tables: Tuple[str, ...],
+              loader: Callable[[], List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        """Return the cached rows for `key`, or run `loader` and cache them.
+
+        Callers get fresh dict copies, so mutating a result is safe.
+        """
+        if not self.maxsize:
+            return loader()
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry and entry[0] > now and entry[1] == self._stamp(entry[2]):
+                self._data.move_to_end(key)
+                self.hits += 1
+                return [dict(r) for r in entry[3]]
+            self.misses += 1
+            stamp = self._stamp(tables)
+        rows = loader()
+        with self._lock:
+            # a write that raced with the load has bumped the generation:
+            # storing would resurrect stale rows (as would a replica read
+            # taken while the table is still settling)
+            if stamp == self._stamp(tables) and all(self._settled_at.get(t, 0.0) <= now for t in tables):
+                self._data[key] = (now + self.ttl, stamp, tables, rows)
+                self._data.move_to_end(key)
+                while len(self._data) > self.maxsize:
+                    self._data.popitem(last=False)
+                    self.evictions += 1
+        return [dict(r) for r in rows]
+
+    def invalidate(self, *tables: str):
+        with self._lock:
+            for table in tables:
+                self._generations[table] = self._generations.get(table, 0) + 1
+                if self.settle:
+                    self._settled_at[table] = time.monotonic() + self.settle
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {"size": len(self._data), "hits": self.hits, "misses": self.misses,
+                    "evictions": self.evictions,
+                    "hit_ratio": self.hits / lookups if lookups else 0.0}
+
+def freeze(value: Any) -> Hashable:
+    """Hashable form of a call argument (keyset `after` rows are dicts)."""
+    if isinstance(value, dict):
+        return tuple(sorted(value.items()))
+    return value
@@ -2,51 +2,437 @@
 """
 Database connection handler (MySQL)
 """
-from typing import Sequence, Tuple, Any, Optional
+import re
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from typing import Sequence, Tuple, Any, Optional, Iterator, Dict, List
 import mysql.connector
-from mysql.connector import Error
+from mysql.connector import Error, pooling
+from .cache import EntityCache
+from .metrics import QueryMetrics, estimate_bytes
+from .replicas import REPLICA_CONNECT_TIMEOUT, ReplicaSet, parse_hosts
+
+# client errors that mean the server side of the socket is gone
+_LOST_CONNECTION = {2006, 2013, 2055}
+_GONE_AWAY = 2006  # found dead before the statement was sent
+_DUP_ENTRY = 1062
+_BAD_DB = 1049  # unknown database
+_dup_key_re = re.compile(r"for key '(?:[^.']*\.)?([^']+)'")
+
+class DuplicateError(Exception):
+    """An INSERT hit a unique key; `key` is the index name."""
+    def __init__(self, key: str, message: str = ""):
+        super().__init__(message or f"duplicate entry for {key}")
+        self.key = key
+
+def replica_read(fn):
+    """Mark a model read `fn(db, ...)` as safe to serve from a replica."""
+    @wraps(fn)
+    def wrapper(db, *args, **kwargs):
+        with db.reading():
+            return fn(db, *args, **kwargs)
+    return wrapper
 
 class Database:
-    def __init__(self, host: str, user: str, password: str, database: str):
+    def __init__(self, host: str, user: str, password: str, database: str,
+                 *, port: int = 3306, pool_size: int = 0, pool_recycle: float = 30.0,
+                 cache_size: int = 1024, cache_ttl: float = 5.0, slow_query_ms: float = 200.0,
+                 replicas: Sequence[str] = (), max_replica_lag: float = 5.0,
+                 sticky_seconds: float = 5.0, create: bool = True,
+                 connect_timeout: Optional[int] = None):
+        """pool_size=0 keeps the classic single shared connection; any
+        positive value opens a pool and checks a connection out per call.
+        cache_size=0 disables the model-level result cache. Statements
+        slower than slow_query_ms go to the `hms.sql` log; all of them
+        are counted in `metrics`.
+
+        `replicas` ("host" or "host:port", same credentials) serve the
+        model reads marked with replica_read, round-robin, as long as
+        they lag less than max_replica_lag seconds. After a thread writes
+        (any invalidate()) its reads stay on the primary for
+        sticky_seconds, so it sees its own changes. create=False never
+        issues CREATE DATABASE (used for replicas). connect_timeout
+        (seconds) bounds each connection attempt; None is the driver's."""
         self.host = host
+        self.port = port
         self.user = user
         self.password = password
         self.database = database
+        self.pool_size = pool_size
+        self.pool_recycle = pool_recycle
         self.conn = None
+        self.pool = None
+        self._lock = threading.RLock()
+        self._slots = threading.BoundedSemaphore(pool_size) if pool_size else None
+        self._last_used: dict = {}
+        self._local = threading.local()  # per-thread transaction state
+        self._prepared: Dict[int, Dict[str, Any]] = {}  # connection id -> sql -> cursor
+        self._closed = False
+        self.cache = EntityCache(cache_size, cache_ttl, settle=max_replica_lag if replicas else 0.0)
+        self.metrics = QueryMetrics(slow_query_ms)
+        self.create = create
+        self.connect_timeout = connect_timeout
+        self.sticky_seconds = sticky_seconds
+        self.replicas = ReplicaSet(self._open_replica, parse_hosts(replicas, port), max_replica_lag)
         self._connect()
 
     # ------------------------------------------------------------------ #
     def _connect(self):
+        """Connect straight to the database; only when the server reports
+        it missing (1049) is it created, so a normal start runs no DDL."""
         try:
+            try:
+                self._open()
+            except Error as err:
+                if err.errno != _BAD_DB or not self.create:
+                    raise
+                self._create_db()
+                self._open()
+        except Error as err:
+            raise SystemExit(f"DB connection failed: {err}")
+
+    def _open(self):
+        timeout = {"connection_timeout": self.connect_timeout} if self.connect_timeout else {}
+        if self.pool_size:
+            self.pool = pooling.MySQLConnectionPool(
+                pool_name=f"hms_{id(self)}",
+                pool_size=self.pool_size,
+                host=self.host,
+                port=self.port,
+                user=self.user,
+                password=self.password,
+                database=self.database,
+                autocommit=True,
+                # a session reset would deallocate our prepared statements
+                pool_reset_session=False,
+                **timeout,
+            )
+        else:
             self.conn = mysql.connector.connect(
                 host=self.host,
+                port=self.port,
                 user=self.user,
-                password=self.password
+                password=self.password,
+                database=self.database,
+                # single statements commit on their own; transaction() groups them
+                autocommit=True,
+                **timeout,
             )
-            self.conn.autocommit = False
-            self._ensure_db()
-            self.conn.database = self.database
-        except Error as err:
-            raise SystemExit(f"DB connection failed: {err}")
 
-    def _ensure_db(self):
-        with self.conn.cursor() as cur:
-            cur.execute(f"CREATE DATABASE IF NOT EXISTS {self.database}")
-            self.conn.commit()
+    def _create_db(self):
+        conn = mysql.connector.connect(host=self.host, port=self.port, user=self.user, password=self.password)
+        try:
+            with conn.cursor() as cur:
+                cur.execute(f"CREATE DATABASE IF NOT EXISTS {self.database}")
+        finally:
+            conn.close()
+
+    def _open_replica(self, host: str, port: int) -> "Database":
+        replica = Database(host, self.user, self.password, self.database, port=port,
+                           pool_size=self.pool_size, pool_recycle=self.pool_recycle,
+                           cache_size=0, create=False, connect_timeout=REPLICA_CONNECT_TIMEOUT)
+        replica.metrics = self.metrics
+        return replica
+
+    # ------------------------------ routing ------------------------------ #
+    @contextmanager
+    def reading(self):
+        """Let the block's reads go to a replica (see replica_read)."""
+        depth = getattr(self._local, "reading", 0)
+        self._local.reading = depth + 1
+        try:
+            yield
+        finally:
+            self._local.reading = depth
+
+    def _reader(self) -> Optional["Database"]:
+        """A replica for this read, or None for the primary: writes,
+        transactions, unmarked reads and a thread's reads shortly after
+        its own writes all stay on the primary."""
+        if (not self.replicas or not getattr(self._local, "reading", 0) or self.in_transaction()
+                or time.monotonic() < getattr(self._local, "sticky_until", 0.0)):
+            return None
+        return self.replicas.pick()
 
     # ------------------------------------------------------------------ #
+    @contextmanager
+    def _checkout(self):
+        """Yield a connection for one call.
+
+        Inside transaction() the thread's pinned connection is reused.
+        Single-connection mode serialises callers on a lock; pooled mode
+        blocks until a pool slot is free (the driver's pool raises instead
+        of waiting) and pings connections that sat idle past pool_recycle.
+        """
+        pinned = getattr(self._local, "conn", None)
+        if pinned is not None:
+            yield pinned
+            return
+        if self.pool is None:
+            with self._lock:
+                yield self.conn
+            return
+        with self._slots:
+            cnx = self.pool.get_connection()
+            try:
+                key = cnx.connection_id
+                if time.monotonic() - self._last_used.get(key, 0.0) > self.pool_recycle:
+                    cnx.ping(reconnect=True, attempts=3, delay=0)
+                    if cnx.connection_id != key:
+                        self._forget_connection(key)
+                yield cnx
+            finally:
+                self._last_used[cnx.connection_id] = time.monotonic()
+                cnx.close()  # returns it to the pool
+                if self._closed:
+                    self.pool._remove_connections()
+
+    def _reconnect(self, conn):
+        self._forget_connection(conn.connection_id)
+        conn.reconnect(attempts=3, delay=1)
+        conn.database = self.database
+        conn.autocommit = True
+
+    def in_transaction(self) -> bool:
+        return getattr(self._local, "conn", None) is not None
+
+    @contextmanager
+    def transaction(self, readonly: bool = False):
+        """Group the statements of the block into one commit.
+
+        The thread keeps one connection for the whole block; an exception
+        rolls everything back. Nested blocks join the outer transaction.
+        readonly=True gives a consistent snapshot for multi-query reads.
+        """
+        if self.in_transaction():
+            yield
+            return
+        with self._checkout() as conn:
+            conn.start_transaction(readonly=readonly)
+            self._local.conn = conn
+            self._local.touched = set()
+            try:
+                yield
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+            finally:
+                self._local.conn = None
+                touched, self._local.touched = self._local.touched, set()
+                # again after commit/rollback: readers that loaded between
+                # the write and the commit may have cached old rows
+                self.cache.invalidate(*touched)
+
+    @contextmanager
+    def named_lock(self, name: str, timeout: int):
+        """Hold the server-wide lock GET_LOCK(name) for the block.
+
+        The lock lives on a connection of its own, so it is released on
+        that same session whatever connections the block uses, and even a
+        one-slot pool stays usable. TimeoutError after `timeout` seconds.
+        """
+        extra = {"connection_timeout": self.connect_timeout} if self.connect_timeout else {}
+        conn = mysql.connector.connect(host=self.host, port=self.port, user=self.user, password=self.password,
+                                       database=self.database, autocommit=True, **extra)
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT GET_LOCK(%s, %s)", (name, timeout))
+                granted = cur.fetchone()[0]
+            if granted != 1:
+                raise TimeoutError(f"lock {name!r} not granted within {timeout}s")
+            try:
+                yield
+            finally:
+                with conn.cursor() as cur:
+                    cur.execute("SELECT RELEASE_LOCK(%s)", (name,))
+                    cur.fetchone()
+        finally:
+            conn.close()  # would release the lock anyway
+
+    def invalidate(self, *tables: str):
+        """Drop cached results that read `tables` (call after writing them)."""
+        self.cache.invalidate(*tables)
+        # read-your-writes: this thread's next reads skip the (maybe lagging) replicas
+        self._local.sticky_until = time.monotonic() + self.sticky_seconds
+        if self.in_transaction():
+            self._local.touched.update(tables)
+
+    def _run(self, conn, sql: str, params, *, fetch: bool, many: bool):
+        for attempt in (0, 1):
+            try:
+                with conn.cursor(dictionary=True) as cur:
+                    start = time.perf_counter()
+                    if many:
+                        cur.executemany(sql, params)  # type: ignore
+                    else:
+                        cur.execute(sql, params)  # type: ignore
+                    rows = cur.fetchall() if fetch else None
+                    self.metrics.record(sql, time.perf_counter() - start,
+                                        len(rows) if fetch else max(cur.rowcount, 0),
+                                        estimate_bytes(rows) if fetch else 0)
+                    return rows, cur.lastrowid
+            except Error as err:
+                # a transaction's earlier statements died with the socket;
+                # a write lost mid-flight (2013/2055) may already have
+                # autocommitted, so only reads are retried after those
+                retry = err.errno == _GONE_AWAY or (fetch and err.errno in _LOST_CONNECTION)
+                if attempt or not retry or self.in_transaction():
+                    raise
+                self._reconnect(conn)
+
     def execute(self, sql: str, params: Optional[Tuple | Sequence[Tuple]] = None,
                 *, fetch: bool=False, many: bool=False):
+        """Run one statement. Outside transaction() it autocommits, so
+        reads cost no extra COMMIT round trip; many=True runs the whole
+        batch in one transaction."""
         params = params or ()
-        with self.conn.cursor(dictionary=True) as cur:
-            if many:
-                cur.executemany(sql, params)  # type: ignore
-            else:
-                cur.execute(sql, params)  # type: ignore
-            rows = cur.fetchall() if fetch else None
-        self.conn.commit()
+        if many and not self.in_transaction():
+            with self.transaction():
+                return self.execute(sql, params, fetch=fetch, many=many)
+        replica = self._reader() if fetch and not many else None
+        if replica is not None:
+            try:
+                return replica.execute(sql, params, fetch=True)
+            except Error as err:
+                self.replicas.failed(replica, err)
+        with self._checkout() as conn:
+            rows, _ = self._run(conn, sql, params, fetch=fetch, many=many)
         return rows or []
 
+    def _prepared_cursor(self, conn, sql: str):
+        cursors = self._prepared.setdefault(conn.connection_id, {})
+        cur = cursors.get(sql)
+        if cur is None:
+            cur = cursors[sql] = conn.cursor(prepared=True)
+        return cur
+
+    def _forget_connection(self, conn_id: Optional[int]):
+        """Drop the bookkeeping of a connection that was replaced or closed."""
+        self._last_used.pop(conn_id, None)
+        for cur in self._prepared.pop(conn_id, {}).values():
+            try:
+                cur.close()
+            except Error:
+                pass
+
+    def _forget_prepared(self, conn, sql: Optional[str] = None):
+        cursors = self._prepared.get(conn.connection_id, {})
+        for key in ([sql] if sql else list(cursors)):
+            cur = cursors.pop(key, None)
+            try:
+                if cur is not None:
+                    cur.close()
+            except Error:
+                pass
+
+    def query(self, sql: str, params: Optional[Tuple] = None) -> List[Dict[str, Any]]:
+        """Run a read through a server-side prepared statement.
+
+        One prepared cursor is kept per (connection, statement), so repeat
+        calls skip SQL parsing on client and server; rows come back as
+        dicts like execute(fetch=True).
+        """
+        params = tuple(params or ())
+        replica = self._reader()
+        if replica is not None:
+            try:
+                return replica.query(sql, params)
+            except Error as err:
+                self.replicas.failed(replica, err)
+        with self._checkout() as conn:
+            for attempt in (0, 1):
+                cur = self._prepared_cursor(conn, sql)
+                try:
+                    start = time.perf_counter()
+                    cur.execute(sql, params)
+                    raw = cur.fetchall()
+                    self.metrics.record(sql, time.perf_counter() - start, len(raw), estimate_bytes(raw))
+                    cols = cur.column_names
+                    return [dict(zip(cols, row)) for row in raw]
+                except Error as err:
+                    lost = err.errno in _LOST_CONNECTION
+                    self._forget_prepared(conn, None if lost else sql)
+                    if attempt or not lost or self.in_transaction():
+                        raise
+                    self._reconnect(conn)
+        return []
+
+    def insert(self, sql: str, params: Optional[Tuple | Sequence[Tuple] | dict] = None,
+               *, many: bool=False) -> int:
+        """Run an INSERT and return the first AUTO_INCREMENT id it generated.
+
+        A unique-key violation is raised as DuplicateError naming the index.
+        """
+        if many and not self.in_transaction():
+            with self.transaction():
+                return self.insert(sql, params, many=many)
+        with self._checkout() as conn:
+            try:
+                _, last_id = self._run(conn, sql, params or (), fetch=False, many=many)
+            except Error as err:
+                if err.errno != _DUP_ENTRY:
+                    raise
+                # InnoDB already undid the failed statement; an enclosing
+                # transaction decides about the rest
+                found = _dup_key_re.search(err.msg or "")
+                raise DuplicateError(found.group(1) if found else "", err.msg) from err
+        return last_id
+
+    def stream(self, sql: str, params: Optional[Tuple] = None,
+               *, fetch_size: int = 1000) -> Iterator[Dict[str, Any]]:
+        """Yield rows one by one from an unbuffered cursor, pulling
+        fetch_size rows per round trip so memory stays flat.
+
+        The connection is held until the generator is exhausted or closed;
+        on a single-connection Database don't run other queries meanwhile.
+        """
+        replica = self._reader()
+        if replica is not None:
+            replica_rows = replica.stream(sql, params, fetch_size=fetch_size)
+            try:
+                first = next(replica_rows, None)  # a dead replica fails here, before any row is out
+            except Error as err:
+                self.replicas.failed(replica, err)
+            else:
+                if first is not None:
+                    yield first
+                    yield from replica_rows
+                return
+        with self._checkout() as conn:
+            cur = conn.cursor(dictionary=True, buffered=False)
+            # only time spent on the wire counts, not the consumer's work
+            elapsed, rows, nbytes = 0.0, 0, 0
+            try:
+                start = time.perf_counter()
+                cur.execute(sql, params or ())
+                while True:
+                    chunk = cur.fetchmany(fetch_size)
+                    elapsed += time.perf_counter() - start
+                    if not chunk:
+                        break
+                    rows += len(chunk)
+                    nbytes += estimate_bytes(chunk)
+                    yield from chunk
+                    start = time.perf_counter()
+                self.metrics.record(sql, elapsed, rows, nbytes)
+            finally:
+                # abandoned early: drain the wire so the connection is reusable
+                if conn.unread_result:
+                    conn.consume_results()
+                cur.close()
+
     def close(self):
+        """Close the replicas, the single connection and every idle pooled
+        connection; connections still checked out close when returned."""
+        self._closed = True
+        self.replicas.close()
+        for conn_id in list(self._prepared.keys() | self._last_used.keys()):
+            self._forget_connection(conn_id)
+        if self.pool is not None:
+            # the driver has no public way to empty its queue
+            self.pool._remove_connections()
         if self.conn and self.conn.is_connected():
             self.conn.close()
@@ -0,0 +1,237 @@
+
+"""
+Patient record linkage – blocking, parallel pair scoring and merge proposals
+"""
+import os
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from difflib import SequenceMatcher
+from itertools import combinations
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+from utils.text import fold, trigrams
+from utils import validators as val
+from .database import Database
+from . import search, appointment as app
+
+TABLE = "patients"
+APPT_TABLES = (app.TABLE, app.HISTORY_TABLE)
+
+THRESHOLD = 0.85     # pairs scoring at least this become merge proposals
+MAX_BLOCK = 50       # bigger blocks (very common name + key) are too unspecific to compare
+BLOCKS_PER_TASK = 2000
+PHONE_SUFFIX = 7     # trailing digits compared when full numbers differ
+WEIGHTS = {"name": 0.4, "dob": 0.3, "phone": 0.2, "email": 0.1}
+
+class Record(NamedTuple):
+    patient_id: int
+    name: str              # folded full name
+    dob: Optional[int]     # date ordinal
+    phone: Optional[str]   # normalised, see utils.validators
+    email: Optional[str]
+
+def record(row: Dict[str, Any]) -> Record:
+    dob = row.get("date_of_birth")
+    if dob is not None and not isinstance(dob, date):
+        dob = val.valid_date(str(dob))
+    return Record(row["patient_id"], fold(row.get("full_name") or ""),
+                  dob.toordinal() if dob else None,
+                  val.normalize_phone(row.get("phone_number")), val.normalize_email(row.get("email")))
+
+# ------------------------------ blocking ------------------------------ #
+_CODES = {c: d for d, letters in {"1": "bfpv", "2": "cgjkqsxz", "3": "dt", "4": "l",
+                                   "5": "mn", "6": "r"}.items() for c in letters}
+
+def _soundex(word: str) -> str:
+    """Classic Soundex of one folded word ('nguyen' -> 'n250')."""
+    code, last = word[0], _CODES.get(word[0], "")
+    for ch in word[1:]:
+        digit = _CODES.get(ch, "")
+        if digit and digit != last:
+            code += digit
+        if ch not in "hw":
+            last = digit
+    return (code + "000")[:4]
+
+def _letters(word: str) -> str:
+    return "".join(ch for ch in word if ch.isalpha())
+
+def phonetic(name: str) -> str:
+    """Order-insensitive phonetic key of a folded name, so spacing, accents,
+    small misspellings and swapped name parts give the same key.
+    Apostrophes and hyphens are dropped ("o'brien" keys as "obrien")."""
+    return " ".join(sorted(_soundex(w) for w in map(_letters, name.split()) if w))
+
+def blocking_keys(r: Record) -> Iterator[Tuple[str, Any]]:
+    """Only records sharing a key are compared."""
+    key = phonetic(r.name)
+    if key and r.dob is not None:
+        # a name with no letters at all would otherwise block with every
+        # other such name born that day
+        yield "name+dob", (key, r.dob)
+        # a mistyped family name still shares the given name and birthday
+        given = [w for w in map(_letters, r.name.split()) if w][-1]
+        yield "given+dob", (_soundex(given), r.dob)
+    if r.phone and len(r.phone) >= PHONE_SUFFIX:
+        yield "phone", r.phone[-PHONE_SUFFIX:]
+    if r.email:
+        local, _, domain = r.email.partition("@")
+        yield "email", (local.split("+")[0].replace(".", ""), domain)
+
+def blocks(records: Sequence[Record], max_block: int = MAX_BLOCK) -> Tuple[List[List[int]], int]:
+    """Positions in `records` grouped by blocking key (groups of 2..max_block),
+    plus the number of oversized blocks skipped."""
+    index: Dict[Tuple[str, Any], List[int]] = defaultdict(list)
+    for i, r in enumerate(records):
+        for key in blocking_keys(r):
+            index[key].append(i)
+    groups = [g for g in index.values() if 1 < len(g) <= max_block]
+    return groups, sum(1 for g in index.values() if len(g) > max_block)
+
+# ------------------------------- scoring ------------------------------ #
+def _dob_score(a: int, b: int) -> float:
+    if a == b:
+        return 1.0
+    da, db = date.fromordinal(a), date.fromordinal(b)
+    if da.year == db.year and (da.month, da.day) == (db.day, db.month):
+        return 0.8  # day and month swapped
+    if da.year == db.year and (da.month == db.month or da.day == db.day):
+        return 0.5  # one typo in month or day
+    return 0.0
+
+def score(a: Record, b: Record, grams: Optional[Dict[int, set]] = None) -> Tuple[float, List[str]]:
+    """Weighted similarity in [0, 1] over the fields both records have,
+    plus the fields that matched."""
+    grams = grams if grams is not None else {}
+    ga = grams.get(a.patient_id) or trigrams(a.name)
+    gb = grams.get(b.patient_id) or trigrams(b.name)
+    name = len(ga & gb) / len(ga | gb) if ga and gb else 0.0
+    if 0.0 < name < 1.0:
+        # trigram overlap is harsh on one typo in a short name ("huynh an" /
+        # "haynh an"); an edit ratio of the order-free spellings is not
+        name = max(name, SequenceMatcher(None, " ".join(sorted(a.name.split())),
+                                         " ".join(sorted(b.name.split()))).ratio())
+    parts = {"name": name}
+    if a.dob is not None and b.dob is not None:
+        parts["dob"] = _dob_score(a.dob, b.dob)
+    if a.phone and b.phone:
+        parts["phone"] = 1.0 if a.phone == b.phone else (
+            0.8 if a.phone[-PHONE_SUFFIX:] == b.phone[-PHONE_SUFFIX:] else 0.0)
+    if a.email and b.email:
+        parts["email"] = 1.0 if a.email == b.email else (
+            0.7 if a.email.split("@")[0] == b.email.split("@")[0] else 0.0)
+    total = sum(WEIGHTS[k] for k in parts)
+    value = sum(WEIGHTS[k] * v for k, v in parts.items()) / total
+    return value, [k for k, v in parts.items() if v >= 0.8]
+
+Pair = Tuple[int, int, float, List[str]]
+
+def _score_blocks(groups: List[List[Record]], threshold: float) -> List[Pair]:
+    """Worker: every pair inside each block that scores >= threshold."""
+    grams: Dict[int, set] = {}
+    found = []
+    for group in groups:
+        for r in group:
+            if r.patient_id not in grams:
+                grams[r.patient_id] = trigrams(r.name)
+        for a, b in combinations(sorted(group), 2):
+            value, reasons = score(a, b, grams)
+            if value >= threshold:
+                found.append((a.patient_id, b.patient_id, value, reasons))
+    return found
+
+def find_pairs(records: Sequence[Record], *, threshold: float = THRESHOLD, workers: Optional[int] = None,
+               max_block: int = MAX_BLOCK) -> Tuple[List[Pair], Dict[str, int]]:
+    """Likely duplicate pairs (lower id first, best score per pair) and run stats.
+
+    Blocks are shipped to a process pool in batches of BLOCKS_PER_TASK
+    with their records, so workers need no database connection.
+    workers=1 scores in-process.
+    """
+    groups, skipped = blocks(records, max_block)
+    tasks = [[[records[i] for i in g] for g in groups[k:k + BLOCKS_PER_TASK]]
+             for k in range(0, len(groups), BLOCKS_PER_TASK)]
+    best: Dict[Tuple[int, int], Pair] = {}
+    if workers == 1 or len(tasks) <= 1:
+        results: Iterable[List[Pair]] = (_score_blocks(t, threshold) for t in tasks)
+        pool = None
+    else:
+        pool = ProcessPoolExecutor(max_workers=workers or os.cpu_count())
+        results = pool.map(_score_blocks, tasks, [threshold] * len(tasks))
+    try:
+        for found in results:
+            for pair in found:
+                key = pair[:2]
+                if key not in best or pair[2] > best[key][2]:
+                    best[key] = pair
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    stats = {"records": len(records), "blocks": len(groups), "oversized_blocks": skipped,
+             "comparisons": sum(len(g) * (len(g) - 1) // 2 for g in groups), "pairs": len(best)}
+    return sorted(best.values()), stats
+
+def proposals(pairs: Iterable[Pair]) -> List[Dict[str, Any]]:
+    """Group linked pairs into clusters (union-find); the lowest id is kept
+    and the others are proposed for merging into it."""
+    parent: Dict[int, int] = {}
+
+    def root(x: int) -> int:
+        while parent.setdefault(x, x) != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    links: Dict[int, List[Pair]] = defaultdict(list)
+    for pair in pairs:
+        ra, rb = root(pair[0]), root(pair[1])
+        if ra != rb:
+            parent[max(ra, rb)] = min(ra, rb)
+        links[pair[0]].append(pair)
+    clusters: Dict[int, List[int]] = defaultdict(list)
+    for pid in parent:
+        clusters[root(pid)].append(pid)
+    out = []
+    for keep, members in sorted(clusters.items()):
+        pairs_in = [p for m in members for p in links.get(m, [])]
+        out.append({"keep": keep, "merge": sorted(m for m in members if m != keep),
+                    "score": round(min(p[2] for p in pairs_in), 3),
+                    "reasons": sorted({r for p in pairs_in for r in p[3]})})
+    return out
+
+# ------------------------------ database ------------------------------ #
+def load(db: Database, fetch_size: int = 10_000) -> List[Record]:
+    """Every patient as a compact Record, streamed off the server (about
+    200 bytes each, so a million patients fit comfortably in memory)."""
+    return [record(r) for r in db.stream(f"""SELECT patient_id, full_name, date_of_birth, phone_number, email
+                                            FROM {TABLE}""", fetch_size=fetch_size)]
+
+def scan(db: Database, *, threshold: float = THRESHOLD, workers: Optional[int] = None,
+         max_block: int = MAX_BLOCK) -> Tuple[List[Dict[str, Any]], Dict[str, int]]:
+    """Merge proposals for the whole patients table, plus run stats."""
+    pairs, stats = find_pairs(load(db), threshold=threshold, workers=workers, max_block=max_block)
+    found = proposals(pairs)
+    stats["proposals"] = len(found)
+    return found, stats
+
+def merge(db: Database, keep: int, merge_ids: Sequence[int]) -> int:
+    """Fold duplicates into `keep` in one transaction: their appointments
+    (hot and archived) are reassigned, then the duplicate rows and their
+    name-index entries are deleted. Returns the appointments moved."""
+    merge_ids = sorted({int(m) for m in merge_ids} - {keep})
+    if not merge_ids:
+        return 0
+    marks = ", ".join(["%s"] * len(merge_ids))
+    moved = 0
+    with db.transaction():
+        if not db.execute(f"SELECT patient_id FROM {TABLE} WHERE patient_id=%s FOR UPDATE", (keep,), fetch=True):
+            raise ValueError(f"patient {keep} does not exist")
+        for table in APPT_TABLES:
+            moved += db.execute(f"SELECT COUNT(*) AS n FROM {table} WHERE patient_id IN ({marks})",
+                                tuple(merge_ids), fetch=True)[0]['n']
+            db.execute(f"UPDATE {table} SET patient_id=%s WHERE patient_id IN ({marks})", (keep, *merge_ids))
+        db.execute(f"DELETE FROM {search.TABLE} WHERE entity='patient' AND entity_id IN ({marks})",
+                   tuple(merge_ids))
+        db.execute(f"DELETE FROM {TABLE} WHERE patient_id IN ({marks})", tuple(merge_ids))
+    db.invalidate(TABLE, *APPT_TABLES)
+    return moved
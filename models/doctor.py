@@ -3,11 +3,17 @@
 Doctor CRUD operations
 """
 from typing import List, Dict, Any
-from tabulate import tabulate
-from .database import Database
+from .database import Database, replica_read
+from . import paging, search, identity, queries
 
 TABLE = "doctors"
 
+IDENTITY: identity.Identity = {
+    "uq_doctors_name": ("name", ("name_key",)),
+    "uq_doctors_phone": ("phone", ("phone_key",)),
+    "uq_doctors_email": ("email", ("email_key",)),
+}
+
 def create_table(db: Database):
     db.execute(f"""
     CREATE TABLE IF NOT EXISTS {TABLE}(
@@ -21,25 +27,60 @@ def create_table(db: Database):
     """)
 
 # ---------------------------------------------------------------------- #
-def list_all(db: Database, order: str='ASC') -> List[Dict[str, Any]]:
-    return db.execute(f"SELECT * FROM {TABLE} ORDER BY full_name {order}", fetch=True)
+@replica_read
+def list_all(db: Database, order: str='ASC', *, after=None, limit=None) -> List[Dict[str, Any]]:
+    return paging.fetch(db, f"SELECT * FROM {TABLE}", "full_name", "doctor_id", order,
+                        after=after, limit=limit)
+
+BY_ID = queries.register("doctor.search_by_id", f"SELECT * FROM {TABLE} WHERE doctor_id=%s")
 
+@replica_read
 def search_by_id(db: Database, did: int):
-    return db.execute(f"SELECT * FROM {TABLE} WHERE doctor_id=%s", (did,), fetch=True)
+    return db.cache.fetch((BY_ID, did), (TABLE,), lambda: queries.run(db, BY_ID, (did,)))
+
+@replica_read
+def search_by_name(db: Database, name: str, order: str='ASC', limit: int = search.TOP_N):
+    """Best `limit` matches, most relevant first (typos and accents tolerated)."""
+    return search.search(db, "doctor", name, limit=limit, order=order)
+
+@replica_read
+def sort_by_experience(db: Database, order: str='ASC', *, after=None, limit=None):
+    return paging.fetch(db, f"SELECT * FROM {TABLE}", "year_of_experience", "doctor_id", order,
+                        after=after, limit=limit)
+
+def exists(db: Database, full_name: str) -> bool:
+    """Unique-index lookup on the normalised name."""
+    rows = db.execute(f"SELECT 1 FROM {TABLE} WHERE name_key=%s LIMIT 1",
+                      (identity.keys({'full_name': full_name})['name_key'],), fetch=True)
+    return bool(rows)
+
+def find_conflicts(db: Database, data: dict) -> List[str]:
+    """Labels of the identities (see IDENTITY) `data` shares with a stored doctor."""
+    return identity.conflicts(db, TABLE, IDENTITY, [identity.keys(data)]).get(0, [])
 
-def search_by_name(db: Database, name: str, order: str='ASC'):
-    like = f"%{name}%"
-    return db.execute(f"SELECT * FROM {TABLE} WHERE full_name LIKE %s ORDER BY full_name {order}", (like,), fetch=True)
+def conflicts(db: Database, rows: List[dict]) -> Dict[int, List[str]]:
+    """Batch form of find_conflicts, keyed by position in `rows`."""
+    return identity.conflicts(db, TABLE, IDENTITY, [identity.keys(r) for r in rows])
 
-def sort_by_experience(db: Database, order: str='ASC'):
-    return db.execute(f"SELECT * FROM {TABLE} ORDER BY year_of_experience {order}", fetch=True)
+INSERT_SQL = f"""INSERT INTO {TABLE}
+            (full_name, specialization, phone_number, email, year_of_experience,
+             name_key, phone_key, email_key)
+            VALUES (%(full_name)s, %(specialization)s, %(phone_number)s, %(email)s, %(year_of_experience)s,
+                    %(name_key)s, %(phone_key)s, %(email_key)s)"""
 
-def existing_names(db: Database):
-    rows = db.execute(f"SELECT full_name FROM {TABLE}", fetch=True)
-    return [r['full_name'] for r in rows]
+def add_doctor(db: Database, data: dict) -> int:
+    """Insert one doctor; raises DuplicateError (key in IDENTITY) on a clash."""
+    with db.transaction():
+        did = db.insert(INSERT_SQL, identity.keys(data))
+        search.index_name(db, "doctor", did, data['full_name'])
+    db.invalidate(TABLE)
+    return did
 
-def add_doctor(db: Database, data: dict):
-    sql = f"""INSERT INTO {TABLE}
-            (full_name, specialization, phone_number, email, year_of_experience)
-            VALUES (%(full_name)s, %(specialization)s, %(phone_number)s, %(email)s, %(year_of_experience)s)"""
-    db.execute(sql, data)
+def add_doctors(db: Database, rows: List[dict]):
+    """Insert a batch as one multi-row INSERT and index the new names,
+    all in one transaction."""
+    if rows:
+        with db.transaction():
+            first_id = db.insert(INSERT_SQL, [identity.keys(r) for r in rows], many=True)
+            search.reindex(db, "doctor", since_id=first_id - 1)
+        db.invalidate(TABLE)
@@ -0,0 +1,48 @@
+
+"""
+Normalised identity keys and unique-key conflict checks for people tables
+"""
+from typing import Any, Dict, List, Tuple
+from utils.text import fold
+from utils import validators as val
+from .database import Database
+
+KEY_COLUMNS = ("name_key", "phone_key", "email_key")
+
+# unique index name -> (label shown to users, key columns)
+Identity = Dict[str, Tuple[str, Tuple[str, ...]]]
+
+def keys(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Return `data` plus its normalised name/phone/email keys."""
+    return {**data,
+            "name_key": fold(data.get("full_name") or "") or None,
+            "phone_key": val.normalize_phone(data.get("phone_number")),
+            "email_key": val.normalize_email(data.get("email"))}
+
+def _values(row: Dict[str, Any], cols: Tuple[str, ...]):
+    values = tuple(None if row.get(c) is None else str(row[c]) for c in cols)
+    return None if None in values else values
+
+def conflicts(db: Database, table: str, identity: Identity,
+              rows: List[Dict[str, Any]]) -> Dict[int, List[str]]:
+    """Map the position of every row in `rows` (already passed through
+    keys()) that clashes with a stored row, or an earlier row of the same
+    batch, to the labels of the clashing identities. One indexed lookup
+    per unique key, whatever the batch size."""
+    found: Dict[int, List[str]] = {}
+    for label, cols in identity.values():
+        wanted = {i: v for i, r in enumerate(rows) if (v := _values(r, cols))}
+        if not wanted:
+            continue
+        distinct = list(set(wanted.values()))
+        col_list = ", ".join(cols)
+        group = "(" + ", ".join(["%s"] * len(cols)) + ")"
+        sql = (f"SELECT {col_list} FROM {table} WHERE ({col_list}) IN "
+               f"({', '.join([group] * len(distinct))})")
+        taken = {_values(r, cols) for r in
+                 db.execute(sql, tuple(x for v in distinct for x in v), fetch=True)}
+        for i, v in wanted.items():
+            if v in taken:
+                found.setdefault(i, []).append(label)
+            taken.add(v)  # later rows in the batch clash with this one
+    return found
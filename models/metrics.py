@@ -0,0 +1,173 @@
+
+"""
+Query instrumentation – latency histograms per statement fingerprint and a slow-query log
+"""
+import logging
+import math
+import re
+import threading
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Any, Dict, Iterator, List, Sequence
+
+log = logging.getLogger("hms.sql")
+
+# latency buckets grow by sqrt(2) from 50 µs, so a percentile read off the
+# histogram is at most ~41% high; the last bucket catches everything above ~3 min
+_BASE_MS = 0.05
+_GROWTH = math.sqrt(2)
+_BUCKETS = 44
+BOUNDS_MS = [_BASE_MS * _GROWTH ** i for i in range(_BUCKETS)]
+PERCENTILES = (50, 95, 99)
+SAMPLE_ROWS = 16  # rows measured per result set to estimate bytes fetched
+
+_space_re = re.compile(r"\s+")
+_literal_re = re.compile(r"'(?:[^'\\]|\\.|'')*'|\b\d+(?:\.\d+)?\b|%\(\w+\)s|%s")
+_list_re = re.compile(r"\?(?:\s*,\s*\?)+")
+_groups_re = re.compile(r"\(\?\+?\)(?:\s*,\s*\(\?\+?\))+")
+
+@lru_cache(maxsize=4096)
+def fingerprint(sql: str) -> str:
+    """Normalise a statement so calls differing only in values group together:
+    literals and placeholders become ?, lists of them ?+, whitespace is collapsed."""
+    sql = _literal_re.sub("?", _space_re.sub(" ", sql).strip())
+    sql = _list_re.sub("?+", sql)
+    return _groups_re.sub("(?+)+", sql)
+
+def estimate_bytes(rows: Sequence[Any]) -> int:
+    """Approximate payload size of `rows` from an evenly spaced sample."""
+    if not rows:
+        return 0
+    step = max(1, len(rows) // SAMPLE_ROWS)
+    sample = rows[::step][:SAMPLE_ROWS]
+    size = 0
+    for row in sample:
+        for value in (row.values() if isinstance(row, dict) else row):
+            size += len(value) if isinstance(value, (str, bytes, bytearray)) else 8
+    return size * len(rows) // len(sample)
+
+class _Histogram:
+    __slots__ = ("count", "total_ms", "max_ms", "rows", "bytes", "buckets")
+
+    def __init__(self):
+        self.count = self.rows = self.bytes = 0
+        self.total_ms = self.max_ms = 0.0
+        self.buckets = [0] * _BUCKETS
+
+    def add(self, ms: float, rows: int = 0, nbytes: int = 0):
+        self.count += 1
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+        self.rows += rows
+        self.bytes += nbytes
+        i = 0 if ms <= _BASE_MS else 1 + int(math.log(ms / _BASE_MS, _GROWTH))
+        self.buckets[min(i, _BUCKETS - 1)] += 1
+
+    def percentile(self, p: float) -> float:
+        """Upper bound of the bucket holding the p-th percentile (capped at max)."""
+        rank = math.ceil(self.count * p / 100)
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if n and seen >= rank:
+                return min(BOUNDS_MS[i], self.max_ms)
+        return self.max_ms
+
+    def summary(self) -> Dict[str, Any]:
+        return {"count": self.count, "total_ms": self.total_ms, "mean_ms": self.total_ms / self.count,
+                **{f"p{p}_ms": self.percentile(p) for p in PERCENTILES},
+                "max_ms": self.max_ms, "rows": self.rows, "bytes": self.bytes}
+
+class QueryMetrics:
+    """Statement and action statistics for one Database.
+
+    record() costs a cached fingerprint lookup, a log() and a few adds
+    under a lock – microseconds against a round trip measured in
+    milliseconds, so it is meant to stay on. Statements slower than
+    slow_ms are logged to the `hms.sql` logger with their fingerprint
+    (never the parameters, which hold patient data).
+    """
+    def __init__(self, slow_ms: float = 200.0, enabled: bool = True):
+        self.slow_ms = slow_ms
+        self.enabled = enabled
+        self._queries: Dict[str, _Histogram] = {}
+        self._actions: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()  # per-thread SQL time, for action()
+
+    def record(self, sql: str, seconds: float, rows: int = 0, nbytes: int = 0):
+        if not self.enabled:
+            return
+        ms = seconds * 1000
+        key = fingerprint(sql)
+        with self._lock:
+            hist = self._queries.get(key)
+            if hist is None:
+                hist = self._queries[key] = _Histogram()
+            hist.add(ms, rows, nbytes)
+        local = self._local
+        local.sql_ms = getattr(local, "sql_ms", 0.0) + ms
+        local.statements = getattr(local, "statements", 0) + 1
+        if ms >= self.slow_ms:
+            log.warning("slow query %.1f ms, %d rows: %s", ms, rows, key)
+
+    @contextmanager
+    def action(self, label: str) -> Iterator[None]:
+        """Time a user-level action: wall time plus the SQL it ran on this thread."""
+        local = self._local
+        sql_before, stmts_before = getattr(local, "sql_ms", 0.0), getattr(local, "statements", 0)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            wall = (time.perf_counter() - start) * 1000
+            sql = getattr(local, "sql_ms", 0.0) - sql_before
+            stmts = getattr(local, "statements", 0) - stmts_before
+            if self.enabled:
+                with self._lock:
+                    entry = self._actions.setdefault(label, {"wall": _Histogram(), "sql_ms": 0.0,
+                                                             "statements": 0})
+                    entry["wall"].add(wall)
+                    entry["sql_ms"] += sql
+                    entry["statements"] += stmts
+
+    # ----------------------------- reporting ------------------------------ #
+    def queries(self) -> List[Dict[str, Any]]:
+        """Per-fingerprint summaries, most total time first."""
+        with self._lock:
+            rows = [{"query": q, **h.summary()} for q, h in self._queries.items()]
+        return sorted(rows, key=lambda r: r["total_ms"], reverse=True)
+
+    def actions(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = [{"action": label, **e["wall"].summary(), "sql_ms": e["sql_ms"],
+                     "statements": e["statements"]} for label, e in self._actions.items()]
+        for r in rows:
+            del r["rows"], r["bytes"]
+        return sorted(rows, key=lambda r: r["total_ms"], reverse=True)
+
+    def report(self, top: int = 15, width: int = 90) -> str:
+        """Plain-text tables of the heaviest queries and of the actions."""
+        lines = [f"{'queries by total time':<{width}} {'calls':>7} {'total ms':>10} {'p50':>8} "
+                 f"{'p95':>8} {'p99':>8} {'max':>8} {'rows':>9} {'KiB':>8}"]
+        for q in self.queries()[:top]:
+            text = q["query"] if len(q["query"]) <= width else q["query"][:width - 1] + "…"
+            lines.append(f"{text:<{width}} {q['count']:>7} {q['total_ms']:>10.1f} {q['p50_ms']:>8.2f} "
+                         f"{q['p95_ms']:>8.2f} {q['p99_ms']:>8.2f} {q['max_ms']:>8.2f} "
+                         f"{q['rows']:>9} {q['bytes'] / 1024:>8.1f}")
+        acts = self.actions()
+        if acts:
+            lines.append("")
+            lines.append(f"{'actions':<40} {'runs':>6} {'p50 ms':>9} {'p95 ms':>9} {'max ms':>9} "
+                         f"{'sql ms':>9} {'stmts':>7}")
+            for a in acts:
+                lines.append(f"{a['action'][:40]:<40} {a['count']:>6} {a['p50_ms']:>9.1f} "
+                             f"{a['p95_ms']:>9.1f} {a['max_ms']:>9.1f} {a['sql_ms']:>9.1f} "
+                             f"{a['statements']:>7}")
+        return "\n".join(lines)
+
+    def reset(self):
+        with self._lock:
+            self._queries.clear()
+            self._actions.clear()
@@ -0,0 +1,268 @@
+
+"""
+Versioned schema migrations and query-plan checks
+"""
+from contextlib import nullcontext
+from datetime import date
+from typing import Any, Callable, Dict, List, Tuple
+from .database import Database, Error
+from .cache import EntityCache
+from . import patient as pat, doctor as doc, appointment as app, search, identity, availability, reports, archive
+
+SCHEMA_TABLE = "schema_version"
+IDENTITY_CHUNK = 5000
+LOCK_TIMEOUT = 600  # seconds to wait for another process's migration
+_NO_SUCH_TABLE = 1146
+
+def create_table(db: Database):
+    db.execute(f"""
+    CREATE TABLE IF NOT EXISTS {SCHEMA_TABLE}(
+        version     INT PRIMARY KEY,
+        description VARCHAR(255) NOT NULL,
+        applied_at  TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """)
+
+# ------------------------------ helpers ------------------------------- #
+def index_exists(db: Database, table: str, name: str) -> bool:
+    rows = db.execute("""SELECT 1 FROM information_schema.statistics
+                        WHERE table_schema=DATABASE() AND table_name=%s AND index_name=%s
+                        LIMIT 1""", (table, name), fetch=True)
+    return bool(rows)
+
+def add_index(db: Database, table: str, name: str, columns: str, *, unique: bool = False):
+    """CREATE INDEX unless it is already there (MySQL has no IF NOT EXISTS)."""
+    if not index_exists(db, table, name):
+        kind = "UNIQUE INDEX" if unique else "INDEX"
+        db.execute(f"CREATE {kind} {name} ON {table} ({columns})")
+
+def column_exists(db: Database, table: str, name: str) -> bool:
+    rows = db.execute("""SELECT 1 FROM information_schema.columns
+                        WHERE table_schema=DATABASE() AND table_name=%s AND column_name=%s
+                        LIMIT 1""", (table, name), fetch=True)
+    return bool(rows)
+
+def add_column(db: Database, table: str, name: str, definition: str):
+    if not column_exists(db, table, name):
+        db.execute(f"ALTER TABLE {table} ADD COLUMN {name} {definition}")
+
+# ----------------------------- migrations ----------------------------- #
+def _m001_listing_indexes(db: Database):
+    add_index(db, pat.TABLE, "idx_patients_name", "full_name")
+    add_index(db, pat.TABLE, "idx_patients_dob", "date_of_birth")
+    add_index(db, doc.TABLE, "idx_doctors_name", "full_name")
+    add_index(db, doc.TABLE, "idx_doctors_experience", "year_of_experience")
+    # these supersede the implicit foreign-key indexes on the same columns
+    add_index(db, app.TABLE, "idx_appt_doctor_date", "doctor_id, appointment_date")
+    add_index(db, app.TABLE, "idx_appt_patient_date", "patient_id, appointment_date")
+    # (date) alone keeps the (date, id) order used by keyset pages;
+    # (date, status) serves per-day status filters
+    add_index(db, app.TABLE, "idx_appt_date", "appointment_date")
+    add_index(db, app.TABLE, "idx_appt_date_status", "appointment_date, status")
+
+def _m002_name_search(db: Database):
+    search.create_table(db)
+    search.reindex(db, "patient")
+    search.reindex(db, "doctor")
+
+def _backfill_identity(db: Database, table: str, id_col: str, ident: identity.Identity):
+    """Add and fill the key columns, then the unique indexes.
+
+    Keys are computed in Python (folding needs unicodedata), staged with
+    multi-row INSERTs and applied with a single UPDATE ... JOIN. Rows that
+    already collide keep the key on the lowest id only; the others get
+    NULL so the index can be built and are left for de-duplication.
+    """
+    add_column(db, table, "name_key", "VARCHAR(100)")
+    add_column(db, table, "phone_key", "VARCHAR(20)")
+    add_column(db, table, "email_key", "VARCHAR(100)")
+    stage = f"{table}_identity_stage"
+    db.execute(f"DROP TABLE IF EXISTS {stage}")
+    db.execute(f"""CREATE TABLE {stage}(
+                    id INT PRIMARY KEY, name_key VARCHAR(100),
+                    phone_key VARCHAR(20), email_key VARCHAR(100))""")
+    last = 0
+    while True:
+        rows = db.execute(f"""SELECT {id_col}, full_name, phone_number, email FROM {table}
+                            WHERE {id_col} > %s ORDER BY {id_col} LIMIT %s""",
+                          (last, IDENTITY_CHUNK), fetch=True)
+        if not rows:
+            break
+        staged = [(r[id_col], *(identity.keys(r)[c] for c in identity.KEY_COLUMNS)) for r in rows]
+        db.execute(f"INSERT INTO {stage} VALUES (%s, %s, %s, %s)", staged, many=True)
+        last = rows[-1][id_col]
+    db.execute(f"""UPDATE {table} t JOIN {stage} s ON t.{id_col}=s.id
+                  SET t.name_key=s.name_key, t.phone_key=s.phone_key, t.email_key=s.email_key""")
+    db.execute(f"DROP TABLE {stage}")
+    for index, (_, cols) in ident.items():
+        col_list = ", ".join(cols)
+        match = " AND ".join(f"t.{c}=d.{c}" for c in cols)
+        db.execute(f"""UPDATE {table} t JOIN (
+                          SELECT {col_list}, MIN({id_col}) AS keep FROM {table}
+                          WHERE {' AND '.join(f'{c} IS NOT NULL' for c in cols)}
+                          GROUP BY {col_list} HAVING COUNT(*) > 1) d ON {match}
+                      SET t.{cols[0]}=NULL WHERE t.{id_col} <> d.keep""")
+        add_index(db, table, index, col_list, unique=True)
+
+def _m003_identity_keys(db: Database):
+    _backfill_identity(db, pat.TABLE, "patient_id", pat.IDENTITY)
+    _backfill_identity(db, doc.TABLE, "doctor_id", doc.IDENTITY)
+
+def _m004_time_slots(db: Database):
+    add_column(db, app.TABLE, "start_time", "TIME NULL AFTER appointment_date")
+    add_column(db, app.TABLE, "end_time", "TIME NULL AFTER start_time")
+    availability.create_table(db)
+    add_index(db, doc.TABLE, "idx_doctors_specialization", "specialization")
+
+def _m005_report_aggregates(db: Database):
+    reports.create_table(db)
+    reports.rebuild(db)
+
+def _m006_appointment_history(db: Database):
+    archive.create_table(db)
+
+MIGRATIONS: List[Tuple[int, str, Callable[[Database], None]]] = [
+    (1, "indexes for sorted listings and appointment lookups", _m001_listing_indexes),
+    (2, "trigram index for fuzzy name search", _m002_name_search),
+    (3, "normalised identity keys with unique indexes", _m003_identity_keys),
+    (4, "appointment time slots and doctor working hours", _m004_time_slots),
+    (5, "appointment reporting aggregates", _m005_report_aggregates),
+    (6, "year-partitioned appointment history for archival", _m006_appointment_history),
+]
+
+LATEST = MIGRATIONS[-1][0]
+
+def current_version(db: Database) -> int:
+    rows = db.execute(f"SELECT MAX(version) AS v FROM {SCHEMA_TABLE}", fetch=True)
+    return (rows[0]['v'] if rows else None) or 0
+
+def migrate(db: Database) -> List[int]:
+    """Apply pending migrations in order and return their versions.
+
+    One process at a time migrates a database: the others wait on a
+    named lock (up to LOCK_TIMEOUT), then re-read the version and find
+    nothing left to do. Steps are written to be idempotent, so a run
+    interrupted half-way simply redoes the remaining work.
+    """
+    with db.named_lock(f"hms_migrate_{db.database}", LOCK_TIMEOUT):
+        create_table(db)
+        version = current_version(db)
+        applied = []
+        for number, description, step in MIGRATIONS:
+            if number <= version:
+                continue
+            step(db)
+            db.execute(f"INSERT IGNORE INTO {SCHEMA_TABLE} (version, description) VALUES (%s, %s)",
+                       (number, description))
+            applied.append(number)
+    return applied
+
+def stored_version(db: Database) -> int:
+    """current_version(), or 0 on a database that has never been migrated."""
+    try:
+        return current_version(db)
+    except Error as err:
+        if err.errno != _NO_SUCH_TABLE:
+            raise
+        return 0
+
+def ensure_schema(db: Database) -> List[int]:
+    """Create the base tables if needed and bring them up to LATEST.
+
+    A schema already at LATEST costs one indexed SELECT – no DDL, which
+    matters for scripted runs started many times a day.
+    """
+    if stored_version(db) >= LATEST:
+        return []
+    pat.create_table(db)
+    doc.create_table(db)
+    app.create_table(db)
+    return migrate(db)
+
+# ---------------------------- plan checks ----------------------------- #
+class _Recorder:
+    """Stand-in for Database that captures the SQL a model function sends."""
+    def __init__(self):
+        self.calls: List[Tuple[str, tuple]] = []
+        self.cache = EntityCache(0)
+
+    def execute(self, sql, params=None, *, fetch=False, many=False):
+        self.calls.append((sql, tuple(params or ())))
+        return []
+
+    def query(self, sql, params=None):
+        return self.execute(sql, params, fetch=True)
+
+    def reading(self):
+        return nullcontext()
+
+def _hot_queries() -> Dict[str, Callable[[Any], Any]]:
+    """The interactive and per-write queries, called the way the CLI,
+    the service and the writers call them."""
+    page = {"limit": 21}
+    today = date.today()
+    person = {"full_name": "An Nguyen", "phone_number": "0901234567", "email": "an@example.com"}
+    return {
+        "patient.search_by_id": lambda db: pat.search_by_id(db, 1),
+        "patient.exists": lambda db: pat.exists(db, "An Nguyen", today),
+        "patient.conflicts": lambda db: pat.conflicts(db, [{**person, "date_of_birth": today}]),
+        "patient.list_all": lambda db: pat.list_all(db, 'ASC', **page),
+        "patient.list_all(after)": lambda db: pat.list_all(
+            db, 'DESC', after={"full_name": "M", "patient_id": 1}, **page),
+        "patient.sort_by_dob": lambda db: pat.sort_by_dob(db, 'ASC', **page),
+        "doctor.search_by_id": lambda db: doc.search_by_id(db, 1),
+        "doctor.list_all": lambda db: doc.list_all(db, 'ASC', **page),
+        "doctor.sort_by_experience": lambda db: doc.sort_by_experience(db, 'DESC', **page),
+        "doctor.exists": lambda db: doc.exists(db, "An Nguyen"),
+        "doctor.conflicts": lambda db: doc.conflicts(db, [person]),
+        "appointment.search_by_id": lambda db: app.search_by_id(db, 1),
+        "appointment.list_all": lambda db: app.list_all(db, 'ASC', **page),
+        "appointment.list_all(after)": lambda db: app.list_all(
+            db, 'ASC', after={"appointment_date": today, "appointment_id": 1}, **page),
+        "appointment.search_by_patient": lambda db: app.search_by_patient(db, 1, **page),
+        "appointment.search_by_doctor": lambda db: app.search_by_doctor(db, 1, **page),
+        "appointment.list_today": lambda db: app.list_today(db, **page),
+        "appointment.search_by_id(history)": lambda db: app.search_by_id(db, 1, include_history=True),
+        "appointment.search_by_patient(history)": lambda db: app.search_by_patient(
+            db, 1, include_history=True, **page),
+        "appointment.search_by_doctor(history)": lambda db: app.search_by_doctor(
+            db, 1, include_history=True, **page),
+        "availability.next_free_slot": lambda db: availability.next_free_slot(db, "Cardiology"),
+        "availability.working_hours": lambda db: availability.working_hours(db, [1, 2]),
+        "availability.day_indexes": lambda db: availability.day_indexes(db, [1, 2], today),
+        "reports.doctor_day": lambda db: reports.doctor_day(db, today),
+        "reports.specialization_month": lambda db: reports.specialization_month(db, today),
+        "reports.monthly": lambda db: reports.monthly(db, today.year),
+        "reports.status_breakdown": lambda db: reports.status_breakdown(db),
+        # search_by_name is left out: it always sorts its (small) trigram
+        # hit counts, which EXPLAIN reports as a filesort. reports.rebuild
+        # and verify aggregate whole tables by design.
+    }
+
+# query -> problems EXPLAIN rightly reports: sorting a few aggregated
+# rows, or reading the (specializations x months x statuses) table whole
+_EXPECTED = {
+    "reports.doctor_day": {"filesort"},
+    "reports.specialization_month": {"filesort"},
+    "reports.status_breakdown": {"full scan", "filesort"},
+}
+
+def check_plans(db: Database) -> List[str]:
+    """EXPLAIN every hot model query and report full scans and filesorts.
+
+    Run it against a database with realistic volumes – on near-empty
+    tables the optimizer legitimately prefers scans.
+    """
+    problems = []
+    for name, call in _hot_queries().items():
+        rec = _Recorder()
+        call(rec)
+        expected = _EXPECTED.get(name, set())
+        for sql, params in rec.calls:
+            for row in db.execute(f"EXPLAIN {sql}", params, fetch=True):
+                extra = row.get('Extra') or ''
+                if row.get('type') == 'ALL' and "full scan" not in expected:
+                    problems.append(f"{name}: full scan of {row.get('table')}")
+                if 'Using filesort' in extra and "filesort" not in expected:
+                    problems.append(f"{name}: filesort on {row.get('table')}")
+    return problems
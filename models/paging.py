@@ -0,0 +1,62 @@
+
+"""
+Keyset pagination helpers shared by the model list/sort functions
+"""
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+from .database import Database
+from . import queries
+
+PAGE_SIZE = 20
+
+def _field(col: str) -> str:
+    return col.split('.')[-1]
+
+@lru_cache(maxsize=256)
+def _after_clause(sort: str, key: str, order: str, after_is_null: bool) -> str:
+    """WHERE fragment selecting rows strictly after the previous page's
+    last row in ORDER BY sort, key. MySQL sorts NULLs first ASC and last DESC."""
+    if order == 'ASC':
+        if after_is_null:
+            return f"(({sort} IS NULL AND {key} > %s) OR {sort} IS NOT NULL)"
+        return f"({sort} > %s OR ({sort} = %s AND {key} > %s))"
+    if after_is_null:
+        return f"({sort} IS NULL AND {key} < %s)"
+    return f"({sort} < %s OR ({sort} = %s AND {key} < %s) OR {sort} IS NULL)"
+
+@lru_cache(maxsize=256)
+def _build(select: str, sort: str, key: str, order: str, where: str,
+           after_is_null: Optional[bool], limited: bool) -> str:
+    """SQL text for one page shape (after_is_null=None: first page);
+    built once, then reused and prepared."""
+    conds = [where] if where else []
+    if after_is_null is not None:
+        conds.append(_after_clause(sort, key, order, after_is_null))
+    sql = select
+    if conds:
+        sql += " WHERE " + " AND ".join(conds)
+    sql += f" ORDER BY {sort} {order}, {key} {order}"
+    if limited:
+        sql += " LIMIT %s"
+    return sql
+
+def fetch(db: Database, select: str, sort: str, key: str, order: str = 'ASC', *,
+          where: str = "", params: tuple = (), after: Optional[Dict[str, Any]] = None,
+          limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Run `select` ordered by (sort, key).
+
+    `after` is the last row of the previous page (as returned by this
+    function); with `limit` that gives an index-friendly keyset page
+    instead of an OFFSET scan. Without `limit` every row is returned.
+    `order` is whitelisted, never interpolated as given.
+    """
+    order = queries.order(order)
+    after_is_null = None
+    if after is not None:
+        value, last_id = after[_field(sort)], after[_field(key)]
+        after_is_null = value is None
+        params = (*params, last_id) if after_is_null else (*params, value, value, last_id)
+    if limit is not None:
+        params = (*params, limit)
+    sql = _build(select, sort, key, order, where, after_is_null, limit is not None)
+    return db.query(sql, params)
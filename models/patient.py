@@ -2,13 +2,18 @@
 """
 Patient CRUD operations
 """
-from datetime import date
 from typing import List, Dict, Any
-from tabulate import tabulate
-from .database import Database
+from .database import Database, replica_read
+from . import paging, search, identity, queries
 
 TABLE = "patients"
 
+IDENTITY: identity.Identity = {
+    "uq_patients_identity": ("name and date of birth", ("name_key", "date_of_birth")),
+    "uq_patients_phone": ("phone", ("phone_key",)),
+    "uq_patients_email": ("email", ("email_key",)),
+}
+
 def create_table(db: Database):
     db.execute(f"""
     CREATE TABLE IF NOT EXISTS {TABLE}(
@@ -23,22 +28,60 @@ def create_table(db: Database):
     """)
 
 # ---------------------------------------------------------------------- #
-def list_all(db: Database, order: str = 'ASC') -> List[Dict[str, Any]]:
-    return db.execute(f"SELECT * FROM {TABLE} ORDER BY full_name {order}", fetch=True)
+@replica_read
+def list_all(db: Database, order: str = 'ASC', *, after=None, limit=None) -> List[Dict[str, Any]]:
+    return paging.fetch(db, f"SELECT * FROM {TABLE}", "full_name", "patient_id", order,
+                        after=after, limit=limit)
+
+@replica_read
+def sort_by_dob(db: Database, order: str = 'ASC', *, after=None, limit=None) -> List[Dict[str, Any]]:
+    return paging.fetch(db, f"SELECT * FROM {TABLE}", "date_of_birth", "patient_id", order,
+                        after=after, limit=limit)
 
+BY_ID = queries.register("patient.search_by_id", f"SELECT * FROM {TABLE} WHERE patient_id=%s")
+
+@replica_read
 def search_by_id(db: Database, pid: int):
-    return db.execute(f"SELECT * FROM {TABLE} WHERE patient_id=%s", (pid,), fetch=True)
+    return db.cache.fetch((BY_ID, pid), (TABLE,), lambda: queries.run(db, BY_ID, (pid,)))
+
+@replica_read
+def search_by_name(db: Database, name: str, order: str='ASC', limit: int = search.TOP_N):
+    """Best `limit` matches, most relevant first (typos and accents tolerated)."""
+    return search.search(db, "patient", name, limit=limit, order=order)
+
+def exists(db: Database, full_name: str, date_of_birth) -> bool:
+    """Unique-index lookup on the normalised name + date of birth."""
+    rows = db.execute(f"SELECT 1 FROM {TABLE} WHERE name_key=%s AND date_of_birth=%s LIMIT 1",
+                      (identity.keys({'full_name': full_name})['name_key'], date_of_birth), fetch=True)
+    return bool(rows)
+
+def find_conflicts(db: Database, data: dict) -> List[str]:
+    """Labels of the identities (see IDENTITY) `data` shares with a stored patient."""
+    return identity.conflicts(db, TABLE, IDENTITY, [identity.keys(data)]).get(0, [])
+
+def conflicts(db: Database, rows: List[dict]) -> Dict[int, List[str]]:
+    """Batch form of find_conflicts, keyed by position in `rows`."""
+    return identity.conflicts(db, TABLE, IDENTITY, [identity.keys(r) for r in rows])
 
-def search_by_name(db: Database, name: str, order: str='ASC'):
-    like = f"%{name}%"
-    return db.execute(f"SELECT * FROM {TABLE} WHERE full_name LIKE %s ORDER BY full_name {order}", (like,), fetch=True)
+INSERT_SQL = f"""INSERT INTO {TABLE}
+            (full_name, date_of_birth, gender, address, phone_number, email,
+             name_key, phone_key, email_key)
+            VALUES (%(full_name)s, %(date_of_birth)s, %(gender)s, %(address)s, %(phone_number)s, %(email)s,
+                    %(name_key)s, %(phone_key)s, %(email_key)s)"""
 
-def existing_names(db: Database):
-    rows = db.execute(f"SELECT full_name FROM {TABLE}", fetch=True)
-    return [r['full_name'] for r in rows]
+def add_patient(db: Database, data: dict) -> int:
+    """Insert one patient; raises DuplicateError (key in IDENTITY) on a clash."""
+    with db.transaction():
+        pid = db.insert(INSERT_SQL, identity.keys(data))
+        search.index_name(db, "patient", pid, data['full_name'])
+    db.invalidate(TABLE)
+    return pid
 
-def add_patient(db: Database, data: dict):
-    sql = f"""INSERT INTO {TABLE}
-            (full_name, date_of_birth, gender, address, phone_number, email)
-            VALUES (%(full_name)s, %(date_of_birth)s, %(gender)s, %(address)s, %(phone_number)s, %(email)s)"""
-    db.execute(sql, data)
+def add_patients(db: Database, rows: List[dict]):
+    """Insert a batch as one multi-row INSERT and index the new names,
+    all in one transaction."""
+    if rows:
+        with db.transaction():
+            first_id = db.insert(INSERT_SQL, [identity.keys(r) for r in rows], many=True)
+            search.reindex(db, "patient", since_id=first_id - 1)
+        db.invalidate(TABLE)
@@ -0,0 +1,31 @@
+
+"""
+Query registry – model statements are built once and run as prepared statements
+"""
+from typing import Any, Dict, List
+from .database import Database
+
+ORDERS = ("ASC", "DESC")
+
+_REGISTRY: Dict[str, str] = {}
+
+def register(name: str, sql: str) -> str:
+    """Record `sql` under `name` (at import time) and return the name."""
+    _REGISTRY[name] = sql
+    return name
+
+def get(name: str) -> str:
+    return _REGISTRY[name]
+
+def registered() -> Dict[str, str]:
+    return dict(_REGISTRY)
+
+def run(db: Database, name: str, params: tuple = ()) -> List[Dict[str, Any]]:
+    return db.query(_REGISTRY[name], params)
+
+def order(value: str) -> str:
+    """Whitelist a sort direction before it is put into SQL text."""
+    direction = (value or "ASC").strip().upper()
+    if direction not in ORDERS:
+        raise ValueError(f"order must be ASC or DESC, not {value!r}")
+    return direction
@@ -0,0 +1,139 @@
+
+"""
+Read replicas – round-robin routing with lag checks and failover to the primary
+"""
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+log = logging.getLogger("hms.db")
+
+LAG_CHECK_EVERY = 1.0   # seconds between replication-lag probes of one replica
+RETRY_AFTER = 10.0      # a replica that failed sits out this long
+REPLICA_CONNECT_TIMEOUT = 2  # seconds; an unreachable replica must fail fast
+
+def parse_hosts(specs: Sequence[str], default_port: int = 3306) -> List[Tuple[str, int]]:
+    """"host" / "host:port" strings -> (host, port) pairs."""
+    hosts = []
+    for spec in specs:
+        host, _, port = spec.strip().partition(":")
+        hosts.append((host, int(port) if port else default_port))
+    return hosts
+
+class _Replica:
+    __slots__ = ("name", "host", "port", "db", "down_until", "lag", "checked_at", "probe")
+
+    def __init__(self, host: str, port: int):
+        self.name = f"{host}:{port}"
+        self.host, self.port = host, port
+        self.db = None
+        self.down_until = 0.0
+        self.lag: Optional[float] = None
+        self.checked_at = 0.0
+        self.probe = threading.Lock()  # held while (re)connecting or measuring lag
+
+class ReplicaSet:
+    """Replica connections behind one primary Database.
+
+    `connect(host, port)` opens a replica's Database; it is called lazily
+    and again after a failure, so a replica that is down at start-up
+    joins once it comes back. A replica is skipped while it is marked
+    down or while SHOW REPLICA STATUS reports more than `max_lag`
+    seconds of lag (or stopped replication); with none left, pick()
+    returns None and the caller reads from the primary. A server that
+    is not replicating at all (e.g. a local stand-in) counts as lag 0.
+    """
+    def __init__(self, connect: Callable[[str, int], Any], hosts: Sequence[Tuple[str, int]],
+                 max_lag: float = 5.0):
+        self._connect = connect
+        self._replicas = [_Replica(h, p) for h, p in hosts]
+        self.max_lag = max_lag
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def __bool__(self):
+        return bool(self._replicas)
+
+    def pick(self):
+        """The next usable replica's Database in round-robin order, or None."""
+        with self._lock:
+            start = self._next
+            self._next = (self._next + 1) % len(self._replicas)
+        for i in range(len(self._replicas)):
+            replica = self._replicas[(start + i) % len(self._replicas)]
+            if self._usable(replica):
+                return replica.db
+        return None
+
+    def _usable(self, replica: _Replica) -> bool:
+        now = time.monotonic()
+        if now < replica.down_until:
+            return False
+        if replica.db is None or now - replica.checked_at >= LAG_CHECK_EVERY:
+            # one thread (re)connects or probes; the others don't queue
+            # behind a slow connect but use the last lag reading, or the
+            # primary while there is no connection yet
+            if replica.probe.acquire(blocking=False):
+                try:
+                    if time.monotonic() < replica.down_until:
+                        return False  # marked down while we got here
+                    if replica.db is None:
+                        replica.db = self._connect(replica.host, replica.port)
+                    if now - replica.checked_at >= LAG_CHECK_EVERY:
+                        replica.lag, replica.checked_at = self._lag(replica.db), now
+                # Database reports a failed connect as SystemExit
+                except (Exception, SystemExit) as err:
+                    self._mark_down(replica, err)
+                    return False
+                finally:
+                    replica.probe.release()
+            elif replica.db is None:
+                return False
+        if replica.lag is None or replica.lag > self.max_lag:
+            replica.down_until = now + LAG_CHECK_EVERY
+            log.warning("replica %s lagging (%s s), reading from the primary", replica.name, replica.lag)
+            return False
+        return True
+
+    @staticmethod
+    def _lag(db) -> Optional[float]:
+        """Seconds behind the source; 0 for a server that is not a replica,
+        None when replication is stopped."""
+        try:
+            rows = db.execute("SHOW REPLICA STATUS", fetch=True)
+        except Exception:
+            rows = db.execute("SHOW SLAVE STATUS", fetch=True)  # MySQL < 8.0.22, MariaDB
+        if not rows:
+            return 0.0
+        row = rows[0]
+        lag = row.get("Seconds_Behind_Source", row.get("Seconds_Behind_Master"))
+        return None if lag is None else float(lag)
+
+    def _mark_down(self, replica: _Replica, err: BaseException):
+        log.warning("replica %s unavailable (%s), reading from the primary", replica.name, err)
+        replica.down_until = time.monotonic() + RETRY_AFTER
+        replica.checked_at = 0.0
+        if replica.db is not None:
+            try:
+                replica.db.close()
+            except Exception:
+                pass
+            replica.db = None
+
+    def failed(self, db, err: BaseException):
+        """Take the replica serving `db` out of rotation after a failed read."""
+        for replica in self._replicas:
+            if replica.db is db:
+                self._mark_down(replica, err)
+
+    def status(self) -> List[Dict[str, Any]]:
+        now = time.monotonic()
+        return [{"replica": r.name, "connected": r.db is not None, "lag": r.lag,
+                 "down_for": max(0.0, r.down_until - now)} for r in self._replicas]
+
+    def close(self):
+        for replica in self._replicas:
+            if replica.db is not None:
+                replica.db.close()
+                replica.db = None
@@ -0,0 +1,159 @@
+
+"""
+Appointment reporting backed by incrementally maintained summary tables
+"""
+from collections import Counter
+from datetime import date
+from typing import Any, Dict, Iterable, List, Tuple
+from utils.enums import Status
+from .database import Database, replica_read
+from .availability import as_date
+
+DAILY_TABLE = "appt_daily_stats"      # doctor x day x status
+MONTHLY_TABLE = "appt_monthly_stats"  # specialization x month x status
+# models.appointment / models.doctor tables; appointment imports us
+APPT_TABLE = "appointments"
+HISTORY_TABLE = "appointments_history"
+DOCTOR_TABLE = "doctors"
+
+NO_DOCTOR = 0          # doctor_id of appointments whose doctor was removed
+NO_SPECIALIZATION = ""
+
+def create_table(db: Database):
+    statuses = ", ".join(f"'{s.value}'" for s in Status)
+    db.execute(f"""
+    CREATE TABLE IF NOT EXISTS {DAILY_TABLE}(
+        doctor_id INT NOT NULL,
+        day       DATE NOT NULL,
+        status    ENUM({statuses}) NOT NULL,
+        n         INT NOT NULL DEFAULT 0,
+        PRIMARY KEY (day, doctor_id, status)
+    )
+    """)
+    db.execute(f"""
+    CREATE TABLE IF NOT EXISTS {MONTHLY_TABLE}(
+        specialization VARCHAR(100) NOT NULL,
+        month          DATE NOT NULL,
+        status         ENUM({statuses}) NOT NULL,
+        n              INT NOT NULL DEFAULT 0,
+        PRIMARY KEY (month, specialization, status)
+    )
+    """)
+
+# ------------------------- incremental upkeep ------------------------- #
+def _specializations(db: Database, doctor_ids: Iterable[int]) -> Dict[int, str]:
+    ids = sorted({d for d in doctor_ids if d})
+    if not ids:
+        return {}
+    rows = db.execute(f"""SELECT doctor_id, specialization FROM {DOCTOR_TABLE}
+                        WHERE doctor_id IN ({', '.join(['%s'] * len(ids))})""", tuple(ids), fetch=True)
+    return {r['doctor_id']: r['specialization'] or NO_SPECIALIZATION for r in rows}
+
+def _upsert(db: Database, table: str, cols: str, deltas: Counter):
+    rows = [(*key, n) for key, n in deltas.items() if n]
+    if rows:
+        marks = ", ".join(["%s"] * (len(rows[0])))
+        db.execute(f"""INSERT INTO {table} ({cols}, n) VALUES ({marks})
+                      ON DUPLICATE KEY UPDATE n = n + VALUES(n)""", rows, many=True)
+
+def record(db: Database, changes: Iterable[Tuple[Dict[str, Any], int]]):
+    """Apply (+1 / -1, appointment) changes to the summary tables.
+
+    Call it in the transaction that writes the appointments so reports
+    and rows commit together. Each appointment needs doctor_id,
+    appointment_date and status; undated appointments are not counted.
+    """
+    changes = [(a, sign) for a, sign in changes if a.get("appointment_date")]
+    if not changes:
+        return
+    specs = _specializations(db, (a.get("doctor_id") for a, _ in changes))
+    daily, monthly = Counter(), Counter()
+    for a, sign in changes:
+        day = as_date(a["appointment_date"])
+        status = a.get("status") or Status.Pending.value
+        doctor = a.get("doctor_id") or NO_DOCTOR
+        daily[(doctor, day, status)] += sign
+        monthly[(specs.get(doctor, NO_SPECIALIZATION), day.replace(day=1), status)] += sign
+    _upsert(db, DAILY_TABLE, "doctor_id, day, status", daily)
+    _upsert(db, MONTHLY_TABLE, "specialization, month, status", monthly)
+
+# ------------------------------ rebuild ------------------------------- #
+# archiving moves rows without touching the counts, so sources span both
+# tables – once the history table exists (migration 6; 5 rebuilds before it)
+_HOT_APPTS = f"(SELECT doctor_id, appointment_date, status FROM {APPT_TABLE})"
+_ALL_APPTS = f"""(SELECT doctor_id, appointment_date, status FROM {APPT_TABLE}
+                 UNION ALL SELECT doctor_id, appointment_date, status FROM {HISTORY_TABLE})"""
+_FIRST_OF_MONTH = "DATE_SUB(a.appointment_date, INTERVAL DAYOFMONTH(a.appointment_date) - 1 DAY)"
+
+def _sources(db: Database) -> Tuple[str, str]:
+    """Daily and monthly aggregation queries over every appointment."""
+    has_history = db.execute("""SELECT 1 FROM information_schema.tables
+                               WHERE table_schema=DATABASE() AND table_name=%s""",
+                             (HISTORY_TABLE,), fetch=True)
+    appts = _ALL_APPTS if has_history else _HOT_APPTS
+    daily = f"""SELECT COALESCE(a.doctor_id, {NO_DOCTOR}) AS doctor_id, a.appointment_date AS day,
+                       a.status, COUNT(*) AS n
+                FROM {appts} a WHERE a.appointment_date IS NOT NULL
+                GROUP BY COALESCE(a.doctor_id, {NO_DOCTOR}), a.appointment_date, a.status"""
+    monthly = f"""SELECT COALESCE(d.specialization, '') AS specialization,
+                         {_FIRST_OF_MONTH} AS month, a.status, COUNT(*) AS n
+                  FROM {appts} a LEFT JOIN {DOCTOR_TABLE} d ON a.doctor_id=d.doctor_id
+                  WHERE a.appointment_date IS NOT NULL
+                  GROUP BY COALESCE(d.specialization, ''), {_FIRST_OF_MONTH}, a.status"""
+    return daily, monthly
+
+def rebuild(db: Database):
+    """Recompute both summary tables from the appointments (hot and archived) in one transaction."""
+    daily, monthly = _sources(db)
+    with db.transaction():
+        db.execute(f"DELETE FROM {DAILY_TABLE}")
+        db.execute(f"INSERT INTO {DAILY_TABLE} (doctor_id, day, status, n) {daily}")
+        db.execute(f"DELETE FROM {MONTHLY_TABLE}")
+        db.execute(f"INSERT INTO {MONTHLY_TABLE} (specialization, month, status, n) {monthly}")
+
+def verify(db: Database) -> List[str]:
+    """Compare the summary tables with a from-scratch aggregation."""
+    problems = []
+    daily, monthly = _sources(db)
+    for table, source, keys in ((DAILY_TABLE, daily, ("doctor_id", "day", "status")),
+                                (MONTHLY_TABLE, monthly, ("specialization", "month", "status"))):
+        with db.transaction(readonly=True):
+            stored = {tuple(str(r[k]) for k in keys): r['n'] for r in
+                      db.execute(f"SELECT {', '.join(keys)}, n FROM {table} WHERE n<>0", fetch=True)}
+            fresh = {tuple(str(r[k]) for k in keys): r['n'] for r in db.execute(source, fetch=True)}
+        for key in sorted(stored.keys() | fresh.keys()):
+            if stored.get(key, 0) != fresh.get(key, 0):
+                problems.append(f"{table} {key}: stored {stored.get(key, 0)}, actual {fresh.get(key, 0)}")
+    return problems
+
+# ------------------------------ reports ------------------------------- #
+_PIVOT = ", ".join(f"SUM(CASE WHEN s.status='{st.value}' THEN s.n ELSE 0 END) AS {st.value}"
+                   for st in Status) + ", SUM(s.n) AS Total"
+
+@replica_read
+def doctor_day(db: Database, day: date) -> List[Dict[str, Any]]:
+    """Appointments per doctor on `day`, split by status."""
+    return db.execute(f"""SELECT s.doctor_id, COALESCE(d.full_name, '(removed)') AS doctor_name, {_PIVOT}
+                        FROM {DAILY_TABLE} s LEFT JOIN {DOCTOR_TABLE} d ON s.doctor_id=d.doctor_id
+                        WHERE s.day=%s GROUP BY s.doctor_id, d.full_name HAVING Total<>0
+                        ORDER BY Total DESC""", (day,), fetch=True)
+
+@replica_read
+def specialization_month(db: Database, month: date) -> List[Dict[str, Any]]:
+    """Appointments per specialization in the month containing `month`."""
+    return db.execute(f"""SELECT s.specialization, {_PIVOT} FROM {MONTHLY_TABLE} s
+                        WHERE s.month=%s GROUP BY s.specialization HAVING Total<>0
+                        ORDER BY Total DESC""", (month.replace(day=1),), fetch=True)
+
+@replica_read
+def monthly(db: Database, year: int) -> List[Dict[str, Any]]:
+    """Appointments per month of `year`, split by status."""
+    return db.execute(f"""SELECT s.month, {_PIVOT} FROM {MONTHLY_TABLE} s
+                        WHERE s.month BETWEEN %s AND %s GROUP BY s.month ORDER BY s.month""",
+                      (date(year, 1, 1), date(year, 12, 1)), fetch=True)
+
+@replica_read
+def status_breakdown(db: Database) -> List[Dict[str, Any]]:
+    """All-time totals per status."""
+    return db.execute(f"""SELECT status, SUM(n) AS total FROM {MONTHLY_TABLE}
+                        GROUP BY status ORDER BY status""", fetch=True)
@@ -0,0 +1,135 @@
+
+"""
+Fuzzy name search backed by a trigram index table
+"""
+import math
+import time
+from typing import Any, Dict, Iterable, List, Tuple
+from utils.text import fold, trigrams
+from .database import Database
+from . import queries
+
+TABLE = "name_trigrams"
+TOP_N = 20
+MIN_SCORE = 0.5      # share of the query's trigrams a name must contain
+CANDIDATES = 10      # candidate rows fetched per requested result
+REINDEX_CHUNK = 5000
+DF_CAP = 50_000          # postings counted per trigram; more means "very common"
+DF_TTL = 600.0           # seconds a trigram's document frequency is cached
+
+# entity -> (table, id column); kept here so the models can import us
+ENTITIES = {
+    "patient": ("patients", "patient_id"),
+    "doctor": ("doctors", "doctor_id"),
+}
+
+def create_table(db: Database):
+    db.execute(f"""
+    CREATE TABLE IF NOT EXISTS {TABLE}(
+        entity    VARCHAR(10) NOT NULL,
+        trigram   CHAR(3) CHARACTER SET utf8mb4 COLLATE utf8mb4_bin NOT NULL,
+        entity_id INT NOT NULL,
+        PRIMARY KEY (entity, trigram, entity_id),
+        KEY idx_trigrams_entity (entity, entity_id)
+    )
+    """)
+
+# ------------------------------ indexing ------------------------------ #
+def index_names(db: Database, entity: str, rows: Iterable[Tuple[int, str]]):
+    """(Re)index the given (id, name) pairs; one DELETE and one INSERT."""
+    rows = list(rows)
+    if not rows:
+        return
+    ids = [rid for rid, _ in rows]
+    marks = ", ".join(["%s"] * len(ids))
+    db.execute(f"DELETE FROM {TABLE} WHERE entity=%s AND entity_id IN ({marks})", (entity, *ids))
+    grams = [(entity, gram, rid) for rid, name in rows for gram in trigrams(name)]
+    if grams:
+        db.execute(f"INSERT INTO {TABLE} (entity, trigram, entity_id) VALUES (%s, %s, %s)",
+                   grams, many=True)
+
+def index_name(db: Database, entity: str, entity_id: int, name: str):
+    index_names(db, entity, [(entity_id, name)])
+
+def reindex(db: Database, entity: str, since_id: int = 0):
+    """Index every row with id > since_id, walking the table in id order."""
+    table, key = ENTITIES[entity]
+    last = since_id
+    while True:
+        rows = db.execute(f"SELECT {key}, full_name FROM {table} WHERE {key} > %s ORDER BY {key} LIMIT %s",
+                          (last, REINDEX_CHUNK), fetch=True)
+        if not rows:
+            break
+        index_names(db, entity, [(r[key], r['full_name']) for r in rows])
+        last = rows[-1][key]
+
+# ------------------------------ querying ------------------------------ #
+def _score(query_grams: set, name: str) -> Tuple[float, float]:
+    grams = trigrams(name)
+    common = len(query_grams & grams)
+    # containment first (the old LIKE was a substring match), then Jaccard
+    return common / len(query_grams), common / len(query_grams | grams)
+
+_df_cache: Dict[Tuple[str, str, str], Tuple[int, float]] = {}
+
+def _frequencies(db: Database, entity: str, grams: Iterable[str]) -> Dict[str, int]:
+    """Names containing each trigram, capped at DF_CAP; one round trip for
+    the ones not cached in the last DF_TTL seconds."""
+    now = time.monotonic()
+    found, missing = {}, []
+    for gram in grams:
+        hit = _df_cache.get((db.database, entity, gram))
+        if hit and hit[1] > now:
+            found[gram] = hit[0]
+        else:
+            missing.append(gram)
+    if missing:
+        one = f"""SELECT %s AS trigram, COUNT(*) AS n FROM
+                  (SELECT 1 FROM {TABLE} WHERE entity=%s AND trigram=%s LIMIT {DF_CAP}) x"""
+        params = tuple(p for gram in missing for p in (gram, entity, gram))
+        for r in db.execute(" UNION ALL ".join([one] * len(missing)), params, fetch=True):
+            gram = r['trigram'].decode() if isinstance(r['trigram'], bytes) else r['trigram']
+            found[gram] = r['n']
+            _df_cache[(db.database, entity, gram)] = (r['n'], now + DF_TTL)
+    return found
+
+def search(db: Database, entity: str, query: str, *, limit: int = TOP_N,
+           order: str = 'ASC') -> List[Dict[str, Any]]:
+    """Rows of `entity` whose names best match `query`.
+
+    A match must contain MIN_SCORE of the query's trigrams, so it contains
+    at least one of the rarest n - ceil(MIN_SCORE * n) + 1 of them; only
+    those are looked up to find candidates, which leaves out very common
+    ones like "ngu". Candidates are then ranked in SQL on their hits over
+    all the query's trigrams and their own trigram count – the same
+    containment-then-Jaccard order _score gives – and the best are
+    re-scored in Python; ties are broken by name in `order`. Diacritics
+    and case are ignored and a typo or two still matches.
+    """
+    table, key = ENTITIES[entity]
+    query_grams = trigrams(query)
+    if not query_grams:
+        return []
+    n = len(query_grams)
+    df = _frequencies(db, entity, query_grams)
+    probe = sorted(query_grams, key=lambda g: (df.get(g, 0), g))[:n - math.ceil(MIN_SCORE * n) + 1]
+    all_marks, probe_marks = ", ".join(["%s"] * n), ", ".join(["%s"] * len(probe))
+    # at equal hits, fewer own trigrams means a higher Jaccard score
+    hits = db.execute(f"""SELECT c.entity_id, SUM(g.trigram IN ({all_marks})) AS hits, COUNT(*) AS grams
+                          FROM (SELECT DISTINCT entity_id FROM {TABLE}
+                                WHERE entity=%s AND trigram IN ({probe_marks})) c
+                          JOIN {TABLE} g ON g.entity=%s AND g.entity_id=c.entity_id
+                        GROUP BY c.entity_id HAVING hits >= %s
+                        ORDER BY hits DESC, grams, c.entity_id LIMIT %s""",
+                      (*sorted(query_grams), entity, *probe, entity, math.ceil(MIN_SCORE * n),
+                       limit * CANDIDATES), fetch=True)
+    if not hits:
+        return []
+    ids = [h['entity_id'] for h in hits]
+    rows = db.execute(f"SELECT * FROM {table} WHERE {key} IN ({', '.join(['%s'] * len(ids))})",
+                      tuple(ids), fetch=True)
+    scored = [(_score(query_grams, r['full_name']), r) for r in rows]
+    scored = [(s, r) for s, r in scored if s[0] >= MIN_SCORE]
+    scored.sort(key=lambda sr: fold(sr[1]['full_name']), reverse=(queries.order(order) == 'DESC'))
+    scored.sort(key=lambda sr: sr[0], reverse=True)  # stable: keeps the name order on ties
+    return [r for _, r in scored[:limit]]
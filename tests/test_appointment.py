@@ -0,0 +1,53 @@
+"""
+Appointment model – slot updates against a scripted fake Database
+"""
+from contextlib import contextmanager
+from datetime import date, timedelta
+import pytest
+
+pytest.importorskip("mysql.connector")
+from models import appointment as app  # noqa: E402
+
+MONDAY = date(2026, 10, 19)
+
+class FakeDB:
+    """Answers the SELECTs update_appointment issues; records the UPDATEs."""
+    def __init__(self, row):
+        self.row = row
+        self.updates = []
+
+    @contextmanager
+    def transaction(self, readonly=False):
+        yield
+
+    def invalidate(self, *tables):
+        pass
+
+    def execute(self, sql, params=None, fetch=False, many=False):
+        if sql.lstrip().startswith("UPDATE"):
+            self.updates.append((sql, params))
+            return 1
+        if "FOR UPDATE" in sql and "appointment_id" in sql:
+            return [dict(self.row)]
+        if "FROM doctors" in sql:
+            return [{"doctor_id": self.row["doctor_id"]}]
+        return []  # no custom hours, no clashing bookings
+
+def _stored(db):
+    sql, params = db.updates[-1]
+    fields = [f.split("=")[0].strip() for f in sql.split(" SET ")[1].split(" WHERE ")[0].split(",")]
+    return dict(zip(fields, params))
+
+def test_start_only_update_writes_end_time():
+    db = FakeDB({"doctor_id": 1, "appointment_date": MONDAY, "status": "Pending",
+                 "start_time": timedelta(hours=9), "end_time": timedelta(hours=9, minutes=45)})
+    app.update_appointment(db, 7, {"start_time": "10:00"})
+    stored = _stored(db)
+    assert stored["start_time"] == "10:00"
+    assert stored["end_time"] == "10:45:00"  # the booking keeps its length
+
+def test_start_on_untimed_booking_gets_default_length():
+    db = FakeDB({"doctor_id": 1, "appointment_date": MONDAY, "status": "Pending",
+                 "start_time": None, "end_time": None})
+    app.update_appointment(db, 7, {"start_time": "10:00"})
+    assert _stored(db)["end_time"] == "10:30:00"
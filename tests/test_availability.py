@@ -0,0 +1,46 @@
+"""
+Availability – time helpers and the per-day busy index
+"""
+from datetime import time, timedelta
+import pytest
+
+pytest.importorskip("mysql.connector")
+from models.availability import DayIndex, clock, minutes  # noqa: E402
+
+def test_minutes_accepts_column_types():
+    assert minutes(timedelta(hours=9, minutes=30)) == minutes(time(9, 30)) == minutes("09:30:00") == 570
+
+@pytest.mark.parametrize("mins, text", [(0, "00:00:00"), (570, "09:30:00"), (24 * 60, "24:00:00")])
+def test_clock(mins, text):
+    assert clock(mins) == text
+
+@pytest.mark.parametrize("mins", [-15, 24 * 60 + 20])
+def test_clock_rejects_times_outside_the_day(mins):
+    with pytest.raises(ValueError):
+        clock(mins)
+
+def test_busy_intervals_are_merged():
+    index = DayIndex([(600, 630), (540, 600), (620, 660), (700, 720)])
+    assert (index.starts, index.ends) == ([540, 700], [660, 720])
+
+@pytest.mark.parametrize("busy, shifts, duration, not_before, expected", [
+    ([], [(480, 720)], 30, 0, 480),
+    ([(480, 510)], [(480, 720)], 30, 0, 510),
+    ([(480, 500)], [(480, 720)], 30, 0, 510),            # busy end is rounded up to the grid
+    ([(480, 510), (525, 600)], [(480, 720)], 30, 0, 600),  # 510-525 is too short
+    ([(480, 720)], [(480, 720), (780, 900)], 30, 0, 780),  # falls through to the next shift
+    ([(480, 700)], [(480, 720)], 30, 0, None),
+    ([], [(480, 720)], 30, 487, 495),                     # not_before is rounded up too
+    ([], [(480, 500)], 30, 0, None),
+])
+def test_first_gap(busy, shifts, duration, not_before, expected):
+    assert DayIndex(busy).first_gap(shifts, duration, not_before) == expected
+
+def test_first_gap_is_free():
+    busy = [(540, 560), (575, 600), (615, 690), (700, 705)]
+    index = DayIndex(busy)
+    t = index.first_gap([(480, 1020)], 45, 500)
+    assert t is not None and t % 15 == 0 and t >= 500
+    assert not index.overlaps(t, t + 45)
+    # nothing earlier on the grid would have fitted
+    assert all(index.overlaps(s, s + 45) for s in range(510, t, 15))
@@ -0,0 +1,89 @@
+"""
+EntityCache – LRU, TTL and per-table generations
+"""
+import pytest
+from models import cache as cache_mod
+from models.cache import EntityCache, freeze
+
+class Loader:
+    def __init__(self, rows=None):
+        self.calls = 0
+        self.rows = rows or [{"id": 1}]
+
+    def __call__(self):
+        self.calls += 1
+        return [dict(r) for r in self.rows]
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache_mod.time, "monotonic", lambda: now[0])
+    return now
+
+def test_hit_returns_a_copy(clock):
+    cache, load = EntityCache(), Loader()
+    cache.fetch("k", ("t",), load)[0]["id"] = 99
+    assert cache.fetch("k", ("t",), load) == [{"id": 1}]
+    assert load.calls == 1
+    assert cache.stats()["hits"] == 1
+
+def test_entries_expire_after_ttl(clock):
+    cache, load = EntityCache(ttl=5), Loader()
+    cache.fetch("k", ("t",), load)
+    clock[0] += 4.9
+    cache.fetch("k", ("t",), load)
+    assert load.calls == 1
+    clock[0] += 0.2
+    cache.fetch("k", ("t",), load)
+    assert load.calls == 2
+
+def test_invalidate_only_drops_readers_of_that_table(clock):
+    cache, a, b = EntityCache(), Loader(), Loader()
+    cache.fetch("a", ("patients", "appointments"), a)
+    cache.fetch("b", ("doctors",), b)
+    cache.invalidate("appointments")
+    cache.fetch("a", ("patients", "appointments"), a)
+    cache.fetch("b", ("doctors",), b)
+    assert (a.calls, b.calls) == (2, 1)
+
+def test_write_during_load_is_not_cached(clock):
+    cache = EntityCache()
+
+    def racing():
+        cache.invalidate("t")  # another thread writes while we read
+        return [{"id": 1}]
+    cache.fetch("k", ("t",), racing)
+    assert cache.stats()["size"] == 0
+
+def test_settle_window_skips_storing(clock):
+    cache, load = EntityCache(settle=2), Loader()
+    cache.invalidate("t")
+    cache.fetch("k", ("t",), load)
+    cache.fetch("k", ("t",), load)
+    assert load.calls == 2
+    clock[0] += 2.5
+    cache.fetch("k", ("t",), load)
+    cache.fetch("k", ("t",), load)
+    assert load.calls == 3
+
+def test_lru_eviction(clock):
+    cache, load = EntityCache(maxsize=2), Loader()
+    cache.fetch("a", ("t",), load)
+    cache.fetch("b", ("t",), load)
+    cache.fetch("a", ("t",), load)   # a is now the most recent
+    cache.fetch("c", ("t",), load)   # evicts b
+    assert cache.stats()["evictions"] == 1
+    calls = load.calls
+    cache.fetch("a", ("t",), load)
+    cache.fetch("b", ("t",), load)
+    assert load.calls == calls + 1
+
+def test_disabled_cache_always_loads(clock):
+    cache, load = EntityCache(maxsize=0), Loader()
+    cache.fetch("k", ("t",), load)
+    cache.fetch("k", ("t",), load)
+    assert load.calls == 2
+
+def test_freeze_makes_keyset_rows_hashable():
+    assert freeze({"b": 2, "a": 1}) == freeze({"a": 1, "b": 2})
+    assert freeze(5) == 5
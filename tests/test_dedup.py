@@ -0,0 +1,79 @@
+"""
+Record linkage – phonetic keys, blocking, pair scores and merge clusters
+"""
+from datetime import date
+import pytest
+
+pytest.importorskip("mysql.connector")
+from models import dedup  # noqa: E402
+
+DOB = date(1980, 5, 17)
+
+def rec(pid, name, dob=DOB, phone=None, email=None):
+    return dedup.record({"patient_id": pid, "full_name": name, "date_of_birth": dob,
+                         "phone_number": phone, "email": email})
+
+@pytest.mark.parametrize("a, b", [
+    ("nguyen van an", "an nguyen van"),
+    ("huynh an", "huyn an"),
+    ("o'brien pat", "obrien pat"),
+    ("smith-jones ann", "smithjones ann"),
+])
+def test_phonetic_matches_variants(a, b):
+    assert dedup.phonetic(a) == dedup.phonetic(b) != ""
+
+def test_phonetic_differs_for_different_names():
+    assert dedup.phonetic("o'brien pat") != dedup.phonetic("o'neill pat")
+    assert dedup.phonetic("123") == ""
+
+def test_names_without_letters_are_not_blocked_together():
+    keys = list(dedup.blocking_keys(rec(1, "123")))
+    assert not any(kind in ("name+dob", "given+dob") for kind, _ in keys)
+
+def test_blocks_group_shared_keys():
+    records = [rec(1, "O'Brien Pat"), rec(2, "OBrien Pat"), rec(3, "O'Neill Kim"),
+               rec(4, "Someone Else", dob=None, phone="0901234567"),
+               rec(5, "Another Person", dob=None, phone="+84 901 234 567")]
+    groups, skipped = dedup.blocks(records)
+    assert sorted(sorted(g) for g in {tuple(g) for g in groups}) == [[0, 1], [3, 4]]
+    assert skipped == 0
+
+def test_blocks_skip_oversized_groups():
+    groups, skipped = dedup.blocks([rec(i, "Le An") for i in range(5)], max_block=3)
+    assert groups == [] and skipped == 2
+
+def test_score_identical_records():
+    a = rec(1, "Lê Văn An", phone="0901234567", email="an@example.com")
+    b = rec(2, "Le Van An", phone="0901234567", email="an@example.com")
+    value, reasons = dedup.score(a, b)
+    assert value == pytest.approx(1.0)
+    assert reasons == ["name", "dob", "phone", "email"]
+
+def test_score_only_weighs_shared_fields():
+    value, reasons = dedup.score(rec(1, "Le Van An", dob=None), rec(2, "Le Van An", dob=None, email="x@y.z"))
+    assert value == pytest.approx(1.0) and reasons == ["name"]
+
+def test_score_tolerates_a_name_typo():
+    value, reasons = dedup.score(rec(1, "Huynh An"), rec(2, "Haynh An"))
+    assert value >= dedup.THRESHOLD
+    assert reasons == ["name", "dob"]
+
+def test_score_tolerates_swapped_day_and_month():
+    value, reasons = dedup.score(rec(1, "Huynh An", dob=date(1980, 5, 7)), rec(2, "Huynh An", dob=date(1980, 7, 5)))
+    assert value >= dedup.THRESHOLD
+    assert reasons == ["name", "dob"]
+
+def test_score_rejects_different_people():
+    value, _ = dedup.score(rec(1, "Tran Thi Mai"), rec(2, "Pham Minh Long", dob=date(1991, 1, 2)))
+    assert value < dedup.THRESHOLD
+
+def test_proposals_cluster_transitively():
+    pairs = [(3, 7, 0.9, ["name"]), (7, 9, 0.95, ["phone"]), (2, 5, 0.88, ["name", "dob"])]
+    assert dedup.proposals(pairs) == [
+        {"keep": 2, "merge": [5], "score": 0.88, "reasons": ["dob", "name"]},
+        {"keep": 3, "merge": [7, 9], "score": 0.9, "reasons": ["name", "phone"]},
+    ]
+
+def test_proposals_keep_the_lowest_id_when_joining_clusters():
+    pairs = [(5, 6, 0.9, []), (1, 2, 0.9, []), (2, 6, 0.9, [])]
+    assert [(p["keep"], p["merge"]) for p in dedup.proposals(pairs)] == [(1, [2, 5, 6])]
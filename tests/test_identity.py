@@ -0,0 +1,57 @@
+"""
+Identity keys – batch conflict checks against a fake Database
+"""
+import pytest
+
+pytest.importorskip("mysql.connector")
+from models import identity  # noqa: E402
+
+IDENTITY = {"uq_name_phone": ("name and phone", ("name_key", "phone_key")),
+            "uq_email": ("email", ("email_key",))}
+
+class FakeDB:
+    """Stores rows; answers the (cols) IN ((..), ..) lookups conflicts() issues."""
+    def __init__(self, stored):
+        self.stored = [identity.keys(r) for r in stored]
+        self.statements = []
+
+    def execute(self, sql, params=None, fetch=False, many=False):
+        self.statements.append((sql, params))
+        cols = [c.strip() for c in sql.split("SELECT", 1)[1].split("FROM", 1)[0].split(",")]
+        wanted = {tuple(params[i:i + len(cols)]) for i in range(0, len(params), len(cols))}
+        return [{c: r[c] for c in cols} for r in self.stored
+                if tuple(None if r[c] is None else str(r[c]) for c in cols) in wanted]
+
+def batch(*rows):
+    return [identity.keys(r) for r in rows]
+
+def test_keys_normalise():
+    keys = identity.keys({"full_name": " Nguyễn  Văn An ", "phone_number": None, "email": " An@Example.COM "})
+    assert keys["name_key"] == "nguyen van an"
+    assert keys["phone_key"] is None
+    assert keys["email_key"] == "an@example.com"
+
+def test_clash_with_stored_rows():
+    db = FakeDB([{"full_name": "Le An", "phone_number": "0901234567", "email": "an@example.com"}])
+    rows = batch({"full_name": "Lê  An", "phone_number": "0901234567", "email": "other@example.com"},
+                 {"full_name": "Mai", "phone_number": None, "email": "AN@example.com"},
+                 {"full_name": "Le An", "phone_number": "0907654321", "email": None})
+    assert identity.conflicts(db, "patients", IDENTITY, rows) == {0: ["name and phone"], 1: ["email"]}
+
+def test_clash_within_the_batch():
+    rows = batch({"full_name": "Le An", "phone_number": None, "email": "a@b.co"},
+                 {"full_name": "Mai", "phone_number": None, "email": "A@b.co"})
+    assert identity.conflicts(FakeDB([]), "patients", IDENTITY, rows) == {1: ["email"]}
+
+def test_one_lookup_per_key():
+    db = FakeDB([])
+    rows = batch(*({"full_name": f"P{i}", "phone_number": "0901234567", "email": f"p{i}@x.io"}
+                   for i in range(50)))
+    assert identity.conflicts(db, "patients", IDENTITY, rows) == {}
+    assert len(db.statements) == 2
+
+def test_rows_missing_a_key_column_are_not_checked():
+    db = FakeDB([])
+    rows = batch({"full_name": "Le An", "phone_number": None, "email": None})
+    assert identity.conflicts(db, "patients", IDENTITY, rows) == {}
+    assert db.statements == []
@@ -0,0 +1,22 @@
+"""
+Query metrics – statement fingerprints
+"""
+import pytest
+from models.metrics import fingerprint
+
+@pytest.mark.parametrize("sql, expected", [
+    ("SELECT * FROM t WHERE id=42", "SELECT * FROM t WHERE id=?"),
+    ("SELECT *  FROM t\n  WHERE name='O''Brien' AND x=%s", "SELECT * FROM t WHERE name=? AND x=?"),
+    ("SELECT * FROM t WHERE id IN (1, 2, 3)", "SELECT * FROM t WHERE id IN (?+)"),
+    ("SELECT * FROM t WHERE id IN (%s,%s)", "SELECT * FROM t WHERE id IN (?+)"),
+    ("INSERT INTO t VALUES (%s, %s), (%s, %s)", "INSERT INTO t VALUES (?+)+"),
+    ("SELECT price FROM t WHERE price > 1.5", "SELECT price FROM t WHERE price > ?"),
+    ("SELECT * FROM t2 WHERE v=%(v)s", "SELECT * FROM t2 WHERE v=?"),
+])
+def test_fingerprint(sql, expected):
+    assert fingerprint(sql) == expected
+
+def test_batch_sizes_share_a_fingerprint():
+    assert fingerprint("SELECT 1 FROM t WHERE id IN (%s)") != fingerprint("SELECT 1 FROM t WHERE id IN (%s, %s)")
+    assert (fingerprint("INSERT INTO t VALUES (%s, %s), (%s, %s)")
+            == fingerprint("INSERT INTO t VALUES (%s, %s), (%s, %s), (%s, %s)"))
@@ -0,0 +1,29 @@
+"""
+Plan-check query list – every hot model query is collected and well formed
+"""
+import re
+import pytest
+
+pytest.importorskip("mysql.connector")
+from models import migrations  # noqa: E402
+
+HOT = migrations._hot_queries()
+
+@pytest.mark.parametrize("name", sorted(HOT))
+def test_hot_query_is_recorded(name):
+    rec = migrations._Recorder()
+    HOT[name](rec)
+    assert rec.calls, f"{name} sent no SQL"
+    for sql, params in rec.calls:
+        assert re.match(r"\s*\(?\s*SELECT\b", sql, re.I), sql  # EXPLAIN-able
+        assert sql.count("%s") == len(params), sql
+
+def test_expected_problems_name_hot_queries():
+    assert set(migrations._EXPECTED) <= set(HOT)
+
+def test_plan_targets_are_covered():
+    # the indexes added for these must keep being checked
+    for name in ("patient.exists", "doctor.exists", "patient.conflicts", "doctor.conflicts",
+                 "availability.next_free_slot", "availability.day_indexes",
+                 "appointment.search_by_doctor(history)", "reports.doctor_day"):
+        assert name in HOT
@@ -0,0 +1,54 @@
+"""
+Keyset pagination – page walks against a full sort, on SQLite (which
+orders NULLs like MySQL: first ASC, last DESC)
+"""
+import sqlite3
+import pytest
+
+pytest.importorskip("mysql.connector")
+from models import paging  # noqa: E402
+
+class SqliteDB:
+    def __init__(self):
+        self.conn = sqlite3.connect(":memory:")
+        self.conn.row_factory = sqlite3.Row
+
+    def query(self, sql, params=None):
+        return [dict(r) for r in self.conn.execute(sql.replace("%s", "?"), params or ())]
+
+@pytest.fixture(scope="module")
+def db():
+    db = SqliteDB()
+    db.conn.execute("CREATE TABLE t (id INTEGER PRIMARY KEY, v INT)")
+    # duplicate and NULL sort values, so ties are broken by id
+    db.conn.executemany("INSERT INTO t VALUES (?, ?)",
+                        [(i, None if i % 7 == 0 else i % 5) for i in range(1, 61)])
+    return db
+
+@pytest.mark.parametrize("order", ["ASC", "DESC"])
+@pytest.mark.parametrize("limit", [1, 4, 7])
+def test_pages_cover_the_full_sort(db, order, limit):
+    everything = paging.fetch(db, "SELECT id, v FROM t", "v", "id", order)
+    pages, after = [], None
+    while True:
+        page = paging.fetch(db, "SELECT id, v FROM t", "v", "id", order, after=after, limit=limit)
+        if not page:
+            break
+        pages += page
+        after = page[-1]
+    assert pages == everything
+    assert len(everything) == 60
+
+def test_where_is_combined_with_the_keyset(db):
+    first = paging.fetch(db, "SELECT id, v FROM t", "v", "id", where="v=%s", params=(2,), limit=3)
+    rest = paging.fetch(db, "SELECT id, v FROM t", "v", "id", where="v=%s", params=(2,), after=first[-1])
+    assert [r["id"] for r in first + rest] == [i for i in range(1, 61) if i % 5 == 2 and i % 7]
+
+@pytest.mark.parametrize("order, after_is_null, marks", [
+    ("ASC", False, 3), ("ASC", True, 1), ("DESC", False, 3), ("DESC", True, 1)])
+def test_after_clause_placeholders(order, after_is_null, marks):
+    assert paging._after_clause("a.v", "a.id", order, after_is_null).count("%s") == marks
+
+def test_order_is_whitelisted(db):
+    with pytest.raises(ValueError):
+        paging.fetch(db, "SELECT id, v FROM t", "v", "id", "DESC; DROP TABLE t")
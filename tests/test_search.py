@@ -0,0 +1,65 @@
+"""
+Trigram name search – recall against a brute-force ranking, on SQLite
+"""
+import random
+import sqlite3
+import pytest
+
+pytest.importorskip("mysql.connector")
+from models import search  # noqa: E402
+from utils.text import fold, trigrams  # noqa: E402
+
+SURNAMES = ["Nguyễn", "Trần", "Lê", "Phạm", "Hoàng", "Huỳnh", "Trịnh", "Hồ", "Ngô", "Đặng"]
+MIDDLE = ["Văn", "Thị", "Minh", "Ngọc", "Thanh", "Hữu", ""]
+GIVEN = ["Lan", "Loan", "Hùng", "Dũng", "Hà", "Hải", "An", "Anh", "Long", "Linh", "Nam", "Mai"]
+
+class SqliteDB:
+    """Just enough of Database for search(): %s placeholders, dict rows."""
+    database = "test"
+
+    def __init__(self):
+        self.conn = sqlite3.connect(":memory:")
+        self.conn.row_factory = sqlite3.Row
+
+    def execute(self, sql, params=None, fetch=False, many=False):
+        sql = sql.replace("%s", "?")
+        if many:
+            self.conn.executemany(sql, params)
+            return None
+        cursor = self.conn.execute(sql, params or ())
+        return [dict(r) for r in cursor.fetchall()] if fetch else cursor.rowcount
+
+@pytest.fixture(scope="module")
+def db():
+    rnd = random.Random(5)
+    db = SqliteDB()
+    db.execute("CREATE TABLE patients (patient_id INTEGER PRIMARY KEY, full_name TEXT)")
+    db.execute(f"CREATE TABLE {search.TABLE} (entity TEXT, trigram TEXT, entity_id INT, "
+               "PRIMARY KEY (entity, trigram, entity_id))")
+    # an InnoDB secondary key carries the primary key, so it covers trigram too
+    db.execute(f"CREATE INDEX idx_trigrams_entity ON {search.TABLE} (entity, entity_id, trigram)")
+    names = [(i, " ".join(w for w in (rnd.choice(SURNAMES), rnd.choice(MIDDLE), rnd.choice(GIVEN)) if w))
+             for i in range(1, 5001)]
+    db.execute("INSERT INTO patients VALUES (%s, %s)", names, many=True)
+    search.index_names(db, "patient", names)
+    db.execute("ANALYZE")
+    search._df_cache.clear()
+    db.names = dict(names)
+    return db
+
+def _brute_force(names, query, limit):
+    grams = trigrams(query)
+    scored = [(search._score(grams, name), fold(name)) for name in names.values()]
+    scored = sorted((s for s in scored if s[0][0] >= search.MIN_SCORE), key=lambda s: (-s[0][0], -s[0][1], s[1]))
+    return scored[:limit]
+
+@pytest.mark.parametrize("query", ["Trần Thị Lan", "Lê Minh Hùng", "Hồ Dũng", "nguyen van an", "Tran Thi Loam"])
+@pytest.mark.parametrize("limit", [3, 20])
+def test_search_matches_brute_force(db, query, limit):
+    rows = search.search(db, "patient", query, limit=limit)
+    got = [(search._score(trigrams(query), r["full_name"]), fold(r["full_name"])) for r in rows]
+    assert got == _brute_force(db.names, query, limit)
+
+def test_exact_name_ranks_first(db):
+    name = db.names[1]
+    assert fold(search.search(db, "patient", name, limit=5)[0]["full_name"]) == fold(name)
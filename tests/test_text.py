@@ -0,0 +1,23 @@
+"""
+Text folding and trigrams used by name search and record linkage
+"""
+import pytest
+from utils.text import fold, trigrams
+
+@pytest.mark.parametrize("text, expected", [
+    ("Nguyễn  Văn Đức", "nguyen van duc"),
+    ("  José\tÁlvarez ", "jose alvarez"),
+    ("Łukasz Søren", "lukasz soren"),
+    ("", ""),
+    (None, ""),
+])
+def test_fold(text, expected):
+    assert fold(text) == expected
+
+def test_trigrams_are_padded_per_word():
+    assert trigrams("An") == {"  a", " an", "an "}
+    assert trigrams("Lê An") == {"  l", " le", "le ", "  a", " an", "an "}
+
+def test_trigrams_ignore_accents_case_and_spacing():
+    assert trigrams("Trần  THỊ") == trigrams("tran thi")
+    assert trigrams("   ") == set()
@@ -0,0 +1,22 @@
+
+import re
+import unicodedata
+
+_space_re = re.compile(r"\s+")
+# letters NFKD does not decompose into base + combining mark
+_special = str.maketrans({"đ": "d", "Đ": "d", "ø": "o", "Ø": "o", "ł": "l", "Ł": "l"})
+
+def fold(text: str) -> str:
+    """Lower-case, strip diacritics and collapse whitespace: 'Nguyễn  Văn Đức' -> 'nguyen van duc'."""
+    text = unicodedata.normalize("NFKD", (text or "").translate(_special))
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return _space_re.sub(" ", text).strip().lower()
+
+def trigrams(text: str) -> set:
+    """Padded per-word trigrams of the folded text (pg_trgm style)."""
+    grams = set()
+    for word in fold(text).split(" "):
+        if word:
+            padded = f"  {word} "
+            grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
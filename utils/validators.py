@@ -17,3 +17,33 @@ def future_date(input_str: str):
         return dt if dt >= date.today() else None
     except ValueError:
         return None
+
+def valid_date(input_str: str):
+    try:
+        return datetime.strptime(input_str, "%Y-%m-%d").date()
+    except (TypeError, ValueError):
+        return None
+
+_phone_junk_re = re.compile(r"[\s\-\.\(\)]")
+
+def normalize_phone(phone: str):
+    """Canonical phone for duplicate checks: separators dropped and the
+    Vietnamese country code folded to the trunk prefix (+84 / 0084 -> 0)."""
+    phone = _phone_junk_re.sub("", phone or "")
+    if phone.startswith("00"):
+        phone = "+" + phone[2:]
+    if phone.startswith("+84"):
+        phone = "0" + phone[3:]
+    return phone or None
+
+def normalize_email(email: str):
+    email = (email or "").strip().lower()
+    return email or None
+
+def valid_time(input_str: str):
+    for fmt in ("%H:%M", "%H:%M:%S"):
+        try:
+            return datetime.strptime(input_str, fmt).time()
+        except (TypeError, ValueError):
+            continue
+    return None